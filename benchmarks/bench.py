@@ -0,0 +1,234 @@
+"""
+Offline benchmark suite for the parsers and the main() decision flow.
+
+Runs entirely on the recorded fixtures (no network) and reports time per call,
+throughput, peak memory (tracemalloc) and the change against the stored baseline.
+
+    python benchmarks/bench.py                   # run and compare with baseline.json
+    python benchmarks/bench.py --quick           # fewer repetitions
+    python benchmarks/bench.py --update-baseline # store the current numbers as baseline
+
+Exits with 1 if a benchmark is slower than baseline * (1 + tolerance).
+Timings are machine dependent; refresh the baseline when moving to another machine.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from argparse import Namespace
+from datetime import time as clock, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+from benchmarks import fixtures # noqa: E402
+from booking import check_pre # noqa: E402
+from cache import AsyncWeekplanCache # noqa: E402
+from lessons import LessonQuery, index_parser # noqa: E402
+from metrics import NO_METRICS # noqa: E402
+from parser import parse_available_lessons, parse_available_lessons_stream, parse_checkin, parse_participants, parse_participants_soup # noqa: E402
+from rules import Rule, RuleMatcher, default_rules # noqa: E402
+import runner # noqa: E402
+from status import fetch_statuses # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+WEEKPLAN_SIZES = (1, 6, 26)
+
+
+class FixtureClient:
+    """Stands in for AsyncReitbuchClient, answering every request from the fixtures."""
+
+    def __init__(self, pages, pre, evbk, details):
+        self.pages = pages
+        self.pre = pre
+        self.evbk = evbk
+        self.details = details
+        self.loginuid = "4711"
+        self.metrics = NO_METRICS
+
+    async def get_weekly_plan(self, week_offset=0):
+        return self.pages[week_offset]
+
+    async def ajax_request(self, command, params, boxid="chkinbox"):
+        return self.pre if params["step"] == "PRE" else self.evbk
+
+    async def get_event_details_ajax(self, event_id, login_uid):
+        return self.details
+
+
+def decision_flow_case():
+    """--batch's per-date evaluation (check_date) for six Saturdays, with --book and --status."""
+    today = fixtures.WEEK_START - timedelta(days=14)
+    pages = {week: fixtures.weekplan(1, first_week=week - 2) for week in range(2, 8)}
+    client = FixtureClient(pages, fixtures.load("pre_book_t.html"), fixtures.load("evbk_success.html"), fixtures.load("eventdetails.html"))
+    target_dates = [fixtures.WEEK_START + timedelta(days=5, weeks=i) for i in range(6)]
+    args = Namespace(book=True, status=True, report=None)
+
+    async def flow():
+        weekplans = AsyncWeekplanCache(client, index_parser(parse_available_lessons_stream))
+        semaphore = asyncio.Semaphore(6)
+        results = await asyncio.gather(*(runner.check_date(client, weekplans, d, today, args, semaphore) for d in target_dates))
+        assert all(any("SUCCESSFUL" in line for line in lines) for lines, _ in results), results
+        # --status: one bulk fetch for all evaluated lessons
+        event_ids = [lesson.event_id for _, lessons in results for lesson in lessons]
+        statuses = [status async for status in fetch_statuses(client, event_ids, client.loginuid, 6)]
+        assert len(statuses) == len(event_ids) and not any(status.error for status in statuses)
+        return results
+
+    return lambda: asyncio.run(flow())
+
+
+def rules_flow_case():
+    """main()'s rule-based evaluation (check_week with a RuleMatcher) over all target weeks, with --book."""
+    today = fixtures.WEEK_START - timedelta(days=14)
+    rules = default_rules() + [Rule(re.compile("Springen"), frozenset([1, 2, 3]), clock(9), clock(10), priority=1, name="Springen")]
+    matcher = RuleMatcher(rules)
+    targets = matcher.targets(today)
+    weeks = matcher.by_week(targets, today)
+    pages = {week: fixtures.weekplan(1, first_week=week - 2) for week in weeks}
+    client = FixtureClient(pages, fixtures.load("pre_book_t.html"), fixtures.load("evbk_success.html"), fixtures.load("eventdetails.html"))
+    parse = index_parser(functools.partial(parse_available_lessons_stream, query=matcher.query(targets)))
+    args = Namespace(book=True, race=False, status=False, report=None)
+
+    async def flow():
+        weekplans = AsyncWeekplanCache(client, parse)
+        semaphore = asyncio.Semaphore(6)
+        results = await asyncio.gather(*(runner.check_week(client, weekplans, w, matcher, days, args, semaphore) for w, days in weeks.items()))
+        assert all(any("SUCCESSFUL" in line for line in lines) for lines, _ in results), results
+        return results
+
+    return lambda: asyncio.run(flow()), len(targets)
+
+
+def cases():
+    """(name, callable, items per call, bytes per call)"""
+    result = []
+    for weeks in WEEKPLAN_SIZES:
+        page = fixtures.weekplan(weeks)
+        events = len(parse_available_lessons_stream(page))
+        result.append((f"parse_soup[{weeks}w]", lambda page=page: parse_available_lessons(page), events, len(page)))
+        result.append((f"parse_stream[{weeks}w]", lambda page=page: parse_available_lessons_stream(page), events, len(page)))
+
+    # The "one lesson per week" lookup of main(), pushed down into the parser
+    page = fixtures.weekplan(1)
+    query = LessonQuery.for_lesson(fixtures.WEEK_START + timedelta(days=5), "Dressur Standard", "09:00")
+    result.append(("parse_query[1w]", lambda: parse_available_lessons_stream(page, query), 1, len(page)))
+
+    details = fixtures.load("eventdetails.html")
+    result.append(("parse_participants", lambda: parse_participants(details), 1, len(details)))
+    result.append(("parse_participants_soup", lambda: parse_participants_soup(details), 1, len(details)))
+
+    pre_pages = [fixtures.load(name) for name in fixtures.PRE_RESPONSES.values()]
+    result.append(("check_pre", lambda: [check_pre(p) for p in pre_pages], len(pre_pages), sum(map(len, pre_pages))))
+    dialogs = [(p, "PRE") for p in pre_pages] + [(fixtures.load(name), "EVBK") for name in ("evbk_success.html", "evbk_failure.html")]
+    result.append(("parse_checkin", lambda: [parse_checkin(d, step) for d, step in dialogs], len(dialogs), sum(len(d) for d, _ in dialogs)))
+
+    result.append(("decision_flow[6 dates]", decision_flow_case(), 6, 0))
+    flow, dates = rules_flow_case()
+    result.append((f"rules_flow[{dates} dates]", flow, dates, 0))
+    return result
+
+
+def measure(func, repeat, min_time=0.05):
+    # Calibrate the loop count so one sample takes at least min_time
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(samples), min(samples), peak
+
+
+def run(repeat):
+    results = {}
+    for name, func, items, size in cases():
+        median, best, peak = measure(func, repeat)
+        results[name] = {
+            "median": median,
+            "min": best,
+            "items_per_s": items / median,
+            "mb_per_s": size / median / 1e6,
+            "peak_kib": peak / 1024,
+        }
+    return results
+
+
+def report(results, baseline, tolerance):
+    regressions = []
+    print(f"{'Benchmark':<24} | {'Median':>10} | {'Items/s':>10} | {'MB/s':>7} | {'Peak':>9} | vs baseline")
+    print("-" * 86)
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base:
+            change = r["median"] / base["median"] - 1
+            verdict = f"{change:+.0%}"
+            if change > tolerance:
+                verdict += " REGRESSION"
+                regressions.append(name)
+        else:
+            verdict = "(new)"
+        mb = f"{r['mb_per_s']:.1f}" if r["mb_per_s"] else "-"
+        print(f"{name:<24} | {r['median'] * 1000:>8.3f}ms | {r['items_per_s']:>10.0f} | {mb:>7} | {r['peak_kib']:>6.0f}KiB | {verdict}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Reitbuch benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="Fewer repetitions")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline (default: 0.25)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline file")
+    args = parser.parse_args(argv)
+
+    # The decision flow logs booking details, keep the report readable
+    logging.getLogger().setLevel(logging.ERROR)
+    runner.logger.setLevel(logging.ERROR)
+
+    results = run(repeat=3 if args.quick else 7)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({name: {"median": r["median"], "peak_kib": r["peak_kib"]} for name, r in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Anonymized Reitbuch responses used by the benchmarks (and tests).
+
+The files in fixtures/ mirror real pages: one weekplan week, the PRE/EVBK checkin
+dialogs and an ax.event.showeventdetails payload. Larger weekplans are built by
+tiling the recorded week with shifted dates and event ids.
+"""
+import os
+import re
+from datetime import date, timedelta
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Monday of the recorded week
+WEEK_START = date(2025, 12, 15)
+
+_ACCORDION_START = '<div class="accordion" id="wpaccordion">\n'
+_ACCORDION_END = '</div>\n</div>\n<footer'
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}|\d{2}\.\d{2}\.\d{4}")
+_EVENT_RE = re.compile(r"event\.php\?e=(\d+)")
+
+
+def load(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _shift_dates(text, days):
+    def shift(match):
+        value = match.group(0)
+        if '-' in value:
+            return (date.fromisoformat(value) + timedelta(days=days)).isoformat()
+        d, m, y = value.split('.')
+        return (date(int(y), int(m), int(d)) + timedelta(days=days)).strftime("%d.%m.%Y")
+    return _DATE_RE.sub(shift, text)
+
+
+def weekplan(weeks=1, first_week=0):
+    """
+    Weekplan page with `weeks` consecutive weeks of lessons, starting `first_week`
+    weeks after the recorded one. Event ids stay unique across weeks.
+    """
+    page = load("weekplan_week.html")
+    head, rest = page.split(_ACCORDION_START, 1)
+    body, tail = rest.split(_ACCORDION_END, 1)
+
+    blocks = []
+    for week in range(first_week, first_week + weeks):
+        block = _shift_dates(body, week * 7)
+        block = _EVENT_RE.sub(lambda m: f"event.php?e={int(m.group(1)) + week * 1000}", block)
+        blocks.append(block)
+    return head + _ACCORDION_START + "".join(blocks) + _ACCORDION_END + tail
+
+
+PRE_RESPONSES = {
+    "BOOK_T": "pre_book_t.html",
+    "BOOK_W": "pre_book_w.html",
+    "STORN": "pre_storn.html",
+    "DEADLINE": "pre_deadline.html",
+}
+
+
+_DAY_RE = re.compile(r'<div id="collapse(\d{4}-\d{2}-\d{2})"(.*?)</div>\n</div>\n</div>', re.S)
+_SLOT_RE = re.compile(
+    r'<div class="wp_text">([^<]*)</div>\s*<div class="wp_date">(\d{2}:\d{2}) - (\d{2}:\d{2})</div>\s*'
+    r'<div class="wp_info"><span class="wp_place">([^<]*)</span> &middot; <span class="wp_trainer">([^<]*)</span>'
+)
+
+
+def recorded_schedule():
+    """
+    The lessons of the recorded week as (weekday, start, end, title, place, trainer) tuples,
+    used by the stand-in server to generate any number of weeks.
+    """
+    schedule = []
+    for day, block in _DAY_RE.findall(load("weekplan_week.html")):
+        weekday = date.fromisoformat(day).weekday()
+        for title, start, end, place, trainer in _SLOT_RE.findall(block):
+            schedule.append((weekday, start, end, title, place, trainer))
+    return schedule
@@ -0,0 +1,98 @@
+"""
+Booking load test against the local stand-in server.
+
+Starts benchmarks/standin.py in-process, lets --users accounts log in concurrently and
+then race for the same contested lesson (PRE + EVBK), and reports request latencies,
+throughput and who got a place.
+
+    python benchmarks/loadtest.py --users 20 --latency 0.05 --jitter 0.02 --capacity 6
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+from benchmarks.standin import StandinServer # noqa: E402
+from booking import CHECKIN_COMMAND, booking_params, check_pre, classify_evbk, pre_params # noqa: E402
+from client import AsyncReitbuchClient # noqa: E402
+
+
+async def timed(latencies, coro):
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        latencies.append(time.perf_counter() - start)
+
+
+async def book(client, event_id, latencies):
+    try:
+        pre = check_pre(await timed(latencies, client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, event_id))))
+        if not pre.next_param:
+            return pre.status_msg
+        response = await timed(latencies, client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, event_id, pre.next_param)))
+        return f"{pre.next_param} {classify_evbk(response)}"
+    except Exception as e:
+        return f"error ({type(e).__name__})"
+
+
+async def race(server, users, week):
+    with server.state.lock:
+        event_id = str(next(e.id for e in server.state.week(week) if e.title == server.state.contested_title))
+
+    clients = [AsyncReitbuchClient(base_url=server.url) for _ in range(users)]
+    try:
+        # Everybody logs in first, then all riders go for the lesson at the same moment
+        login_latencies = []
+        await asyncio.gather(*(timed(login_latencies, c.login(f"rider{n:02d}", "pw")) for n, c in enumerate(clients)))
+
+        latencies = []
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(book(c, event_id, latencies) for c in clients))
+        return event_id, outcomes, login_latencies, latencies, time.perf_counter() - started
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clients))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Booking race load test against the stand-in server.")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--capacity", type=int, default=6)
+    parser.add_argument("--waitlist-capacity", type=int, default=3)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--week", type=int, default=2, help="Week offset of the contested lesson")
+    args = parser.parse_args(argv)
+
+    with StandinServer(latency=args.latency, jitter=args.jitter, capacity=args.capacity,
+                       waitlist_capacity=args.waitlist_capacity, failure_rate=args.failure_rate) as server:
+        event_id, outcomes, login_latencies, latencies, elapsed = asyncio.run(race(server, args.users, args.week))
+
+    print(f"Event {event_id}: {args.users} riders, capacity {args.capacity} + {args.waitlist_capacity} waiting")
+    print(f"Race took {elapsed * 1000:.0f}ms, {len(latencies) / elapsed:.0f} requests/s")
+    for label, values in (("login", login_latencies), ("PRE/EVBK", latencies)):
+        if values:
+            print(f"{label:<9} latency p50 {statistics.median(values) * 1000:.1f}ms, "
+                  f"p95 {percentile(values, 0.95) * 1000:.1f}ms, max {max(values) * 1000:.1f}ms")
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome] = summary.get(outcome, 0) + 1
+    for outcome, count in sorted(summary.items(), key=lambda item: -item[1]):
+        print(f"  {count:>3} x {outcome}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
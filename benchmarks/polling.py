@@ -0,0 +1,77 @@
+"""
+Weekplan polling benchmark against the local stand-in server.
+
+Polls the same weeks over and over like --watch does (fetch every week, get its lessons)
+and reports the bytes the server sent and the time to decision per round, for:
+
+    plain        uncompressed responses, unconditional requests
+    gzip         compressed responses
+    gzip+etag    compressed responses and conditional requests (--lean), unchanged pages are 304s
+    gzip+hash    conditional requests against a server without validators: every page is
+                 downloaded, unchanged ones are recognized by their content hash and not parsed
+
+    python benchmarks/polling.py --rounds 20 --weeks 6 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, ROOT)
+
+from benchmarks.standin import StandinServer # noqa: E402
+from cache import AsyncWeekplanCache # noqa: E402
+from client import AsyncReitbuchClient # noqa: E402
+from lessons import index_parser # noqa: E402
+from parser import parse_available_lessons_stream # noqa: E402
+
+# name: (server compresses, server sends validators, client makes conditional requests)
+MODES = {
+    "plain": (False, False, False),
+    "gzip": (True, False, False),
+    "gzip+etag": (True, True, True),
+    "gzip+hash": (True, False, True),
+}
+
+
+async def poll(server, weeks, rounds, conditional, http2):
+    async with AsyncReitbuchClient(server.url, conditional=conditional, http2=http2) as client:
+        await client.login("alice", "pw")
+        weekplans = AsyncWeekplanCache(client, index_parser(parse_available_lessons_stream), ttl=None)
+        durations = []
+        sent = server.bytes_sent
+        for _ in range(rounds):
+            start = time.perf_counter()
+            weekplans.invalidate()
+            await asyncio.gather(*(weekplans.get_lessons(week) for week in range(weeks)))
+            durations.append(time.perf_counter() - start)
+        return durations, server.bytes_sent - sent, weekplans.parses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Weekplan polling: bytes and time per round.")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--weeks", type=int, default=6, help="Weeks fetched per round")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stand-in response latency in seconds")
+    parser.add_argument("--http2", action="store_true", help="Ask for HTTP/2 (the stand-in speaks HTTP/1.1 only, so this checks the fallback)")
+    args = parser.parse_args(argv)
+
+    print(f"{args.rounds} rounds over {args.weeks} weeks, {args.latency * 1000:.0f}ms latency\n")
+    print(f"{'Mode':<10} | {'KiB/round':>9} | {'Median round':>12} | {'p95 round':>9} | {'Parses':>6}")
+    print("-" * 58)
+    for name, (compress, validators, conditional) in MODES.items():
+        with StandinServer(latency=args.latency, compress=compress, validators=validators) as server:
+            durations, sent, parses = asyncio.run(poll(server, args.weeks, args.rounds, conditional, args.http2))
+        durations.sort()
+        p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+        print(f"{name:<10} | {sent / args.rounds / 1024:>9.1f} | {statistics.median(durations) * 1000:>10.1f}ms | "
+              f"{p95 * 1000:>7.1f}ms | {parses:>6}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,555 @@
+"""
+Local stand-in for the Reitbuch server, for load and latency tests without network.
+
+Implements the parts of the site ReitbuchClient talks to:
+
+    GET/HEAD /                  login page, hands out a PHPSESSID cookie
+    POST /weekplan.php          login (loginuser/loginpwd)
+    GET  /weekplan.php?w=&p=    weekplan of the week offset, generated from the recorded week
+    GET  /event.php?e=          event page
+    POST /ajax.php              ax.checkin.showcheckin (PRE/EVBK) and ax.event.showeventdetails
+
+Knobs: response latency and jitter, slot and waiting list capacity, simulated competing
+users that book contested lessons right after the booking window opens, failure injection
+(HTTP 503, hung responses, dropped connections), a skewed server clock, gzip compressed
+responses and weekplan ETags (answering If-None-Match with 304 Not Modified).
+
+    python benchmarks/standin.py --port 8080 --latency 0.05 --competitors 5
+"""
+import argparse
+import email.utils
+import gzip
+import hashlib
+import html
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+if __package__:
+    from . import fixtures
+else: # Running as a script
+    import fixtures
+
+
+class Event:
+    __slots__ = ("id", "date", "start", "end", "title", "place", "trainer", "participants", "waiting_list", "competitors")
+
+    def __init__(self, event_id, day, start, end, title, place, trainer):
+        self.id = event_id
+        self.date = day
+        self.start = start
+        self.end = end
+        self.title = title
+        self.place = place
+        self.trainer = trainer
+        self.participants = []
+        self.waiting_list = []
+        self.competitors = None # Pending (time, name) bookings of simulated users
+
+    @property
+    def starts_at(self):
+        hour, minute = map(int, self.start.split(':'))
+        return datetime.combine(self.date, datetime.min.time()).replace(hour=hour, minute=minute).timestamp()
+
+
+class ReitbuchState:
+    """Events, sessions and bookings of the stand-in. All access goes through self.lock."""
+
+    def __init__(self, today=None, capacity=6, waitlist_capacity=3, window_days=21, window_opens_at=None,
+                 competitors=0, competitor_spread=1.0, contested_title="Dressur Standard", accounts=None,
+                 clock=time.time, seed=0):
+        self.today = today or date.today()
+        self.capacity = capacity
+        self.waitlist_capacity = waitlist_capacity
+        self.window_days = window_days
+        self.window_opens_at = window_opens_at
+        self.competitors = competitors
+        self.competitor_spread = competitor_spread
+        self.contested_title = contested_title
+        self.accounts = accounts
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.schedule = fixtures.recorded_schedule()
+        self.events = {}
+        self.weeks = {}
+        self.sessions = {} # PHPSESSID -> username or None (not logged in)
+        self.loginuids = {}
+        self._session_ids = itertools.count(1)
+
+    # Events
+
+    def week(self, offset):
+        """Events of the week `offset` weeks from the current one, created on first access."""
+        if offset not in self.weeks:
+            monday = self.today - timedelta(days=self.today.weekday()) + timedelta(weeks=offset)
+            events = []
+            for index, (weekday, start, end, title, place, trainer) in enumerate(self.schedule):
+                event_id = 30000 + (offset + 100) * 100 + index
+                event = Event(event_id, monday + timedelta(days=weekday), start, end, title, place, trainer)
+                self.events[event_id] = event
+                events.append(event)
+            self.weeks[offset] = events
+        return self.weeks[offset]
+
+    def event(self, event_id):
+        event = self.events.get(event_id)
+        if event is None:
+            # Unknown id: materialize the week it belongs to
+            offset = (event_id - 30000) // 100 - 100
+            if -100 < offset < 100:
+                self.week(offset)
+                event = self.events.get(event_id)
+        return event
+
+    def opens_at(self, event):
+        if self.window_opens_at is not None:
+            return self.window_opens_at
+        day = event.date - timedelta(days=self.window_days)
+        return datetime.combine(day, datetime.min.time()).timestamp()
+
+    def _apply_competitors(self, event, now):
+        """Simulated users book contested lessons at random moments right after the window opens."""
+        if not self.competitors or self.contested_title not in event.title:
+            return
+        if event.competitors is None:
+            opens = self.opens_at(event)
+            event.competitors = sorted(
+                (opens + self.random.uniform(0, self.competitor_spread), f"Mitbewerber {n + 1}")
+                for n in range(self.competitors)
+            )
+        while event.competitors and event.competitors[0][0] <= now:
+            _, name = event.competitors.pop(0)
+            self._book(event, name, "BOOK_T") or self._book(event, name, "BOOK_W")
+
+    def _book(self, event, user, action):
+        if user in event.participants or user in event.waiting_list:
+            return False
+        if action == "BOOK_T" and len(event.participants) < self.capacity:
+            event.participants.append(user)
+            return True
+        if action == "BOOK_W" and len(event.waiting_list) < self.waitlist_capacity:
+            event.waiting_list.append(user)
+            return True
+        return False
+
+    def _cancel(self, event, user):
+        if user in event.participants:
+            event.participants.remove(user)
+            if event.waiting_list:
+                event.participants.append(event.waiting_list.pop(0))
+            return True
+        if user in event.waiting_list:
+            event.waiting_list.remove(user)
+            return True
+        return False
+
+    # Sessions
+
+    def new_session(self):
+        sid = f"standin{next(self._session_ids):012d}"
+        self.sessions[sid] = None
+        return sid
+
+    def login(self, sid, username, password):
+        if self.accounts is not None and self.accounts.get(username) != password:
+            return False
+        self.sessions[sid] = username
+        self.loginuids.setdefault(username, str(1000 + len(self.loginuids)))
+        return True
+
+    # Checkin
+
+    def checkin(self, user, params):
+        """Returns the dialog HTML for a PRE or EVBK step."""
+        now = self.clock()
+        event = self.event(int(params.get("eventid", 0)))
+        if event is None:
+            return '<div class="alert alert-danger">Termin nicht gefunden.</div>'
+        self._apply_competitors(event, now)
+
+        if now >= event.starts_at:
+            return _dialog(event, '<div class="alert alert-warning">Termin ist vergangen.</div>', "")
+
+        step = params.get("step")
+        action = params.get("next", "")
+        if step == "EVBK":
+            if action.startswith("STORN"):
+                if self._cancel(event, user):
+                    return _dialog(event, '<div class="alert alert-success">Die Stornierung war erfolgreich.</div>', "")
+                return _dialog(event, '<div class="alert alert-danger">Keine Buchung vorhanden.</div>', "")
+            if now < self.opens_at(event):
+                return _dialog(event, '<div class="alert alert-info">Eine Buchung ist noch nicht m&ouml;glich.</div>', "")
+            if self._book(event, user, action):
+                if action == "BOOK_W":
+                    return _dialog(event, '<div class="alert alert-success">Sie wurden erfolgreich auf die Warteliste gesetzt.</div>', "")
+                return _dialog(event, '<div class="alert alert-success">Die Buchung war erfolgreich. Sie sind Teilnehmer dieses Termins.</div>', "")
+            return _dialog(event, '<div class="alert alert-danger">Kein freier Platz mehr vorhanden.</div>', "")
+
+        # PRE
+        if user in event.participants:
+            return _dialog(event, "<p>Sie sind Teilnehmer dieses Termins.</p>", _button("STORN_TN", "Teilnahme am Termin stornieren", "danger"))
+        if user in event.waiting_list:
+            return _dialog(event, "<p>Sie sind auf der Warteliste.</p>", _button("STORN_WT", "Wartelistenplatz stornieren", "danger"))
+        if now < self.opens_at(event):
+            opens = datetime.fromtimestamp(self.opens_at(event)).strftime("%d.%m.%Y %H:%M")
+            return _dialog(event, f"<p>Buchung ab {opens} m&ouml;glich.</p>", "")
+        if len(event.participants) < self.capacity:
+            return _dialog(event, "", _button("BOOK_T", "Verbindlich buchen", "primary"))
+        if len(event.waiting_list) < self.waitlist_capacity:
+            return _dialog(event, "", _button("BOOK_W", "Auf die Warteliste setzen", "primary"))
+        return _dialog(event, '<div class="alert alert-warning">Buchungsfrist beendet.</div>', "")
+
+    def details(self, params):
+        event = self.event(int(params.get("eventid", 0)))
+        if event is None:
+            return '<div class="alert alert-danger">Termin nicht gefunden.</div>'
+        self._apply_competitors(event, self.clock())
+        return "\n".join([
+            '<div class="evt_detail">',
+            f"<h5>{html.escape(event.title)}</h5>",
+            f"<p>{event.date.strftime('%d.%m.%Y')} {event.start} - {event.end} &middot; {html.escape(event.place)}</p>",
+            _people_table(f"Teilnehmer ({len(event.participants)}/{self.capacity})", event.participants, self.capacity),
+            _people_table(f"Warteplätze ({len(event.waiting_list)})", event.waiting_list, self.waitlist_capacity),
+            "</div>",
+        ])
+
+    # Pages
+
+    def weekplan(self, offset, user):
+        events = self.week(offset)
+        days = {}
+        for event in events:
+            days.setdefault(event.date, []).append(event)
+
+        now = self.clock()
+        out = [_PAGE_HEAD, f'<input type="hidden" id="loginuid" name="loginuid" value="{self.loginuids[user]}">\n',
+               '<div class="accordion" id="wpaccordion">\n']
+        for day in sorted(days):
+            iso = day.isoformat()
+            out.append(f'<div class="card">\n<div class="card-header" id="heading{iso}"><h5 class="mb-0">{day.strftime("%d.%m.%Y")}</h5></div>\n'
+                       f'<div id="collapse{iso}" class="collapse show" aria-labelledby="heading{iso}">\n<div class="card-body">\n')
+            for event in days[day]:
+                self._apply_competitors(event, now)
+                past = " wp_event_past" if now >= event.starts_at else ""
+                free = self.capacity - len(event.participants)
+                out.append(f'  <div class="wp_event{past}" onclick="window.location.href=\'event.php?e={event.id}\';">\n'
+                           f'    <div class="wp_time">{event.start}</div>\n'
+                           f'    <div class="wp_text">{html.escape(event.title)}</div>\n'
+                           f'    <div class="wp_date">{event.start} - {event.end}</div>\n'
+                           f'    <div class="wp_info"><span class="wp_place">{html.escape(event.place)}</span> &middot; '
+                           f'<span class="wp_trainer">{html.escape(event.trainer)}</span></div>\n'
+                           f'    <div class="wp_free"><span class="badge">{free} frei</span></div>\n  </div>\n')
+            out.append('</div>\n</div>\n</div>\n')
+        out.append('</div>\n</div>\n</body>\n</html>\n')
+        return "".join(out)
+
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>Reitbuch - Wochenplan</title></head>
+<body>
+<nav class="navbar"><a class="nav-link" href="weekplan.php">Wochenplan</a> <a class="nav-link" href="logout.php">Abmelden</a></nav>
+<div class="container-fluid">
+"""
+
+_LOGIN_PAGE = """<!DOCTYPE html>
+<html lang="de">
+<head><meta charset="utf-8"><title>Reitbuch - Anmeldung</title></head>
+<body>
+<form id="loginform" name="loginform" method="post" action="weekplan.php">
+<input type="text" name="loginuser"><input type="password" name="loginpwd">
+<input type="hidden" name="loginuid" value="0"><input type="submit" name="loginsubmit" value="X">
+</form>
+</body>
+</html>
+"""
+
+
+def _button(action, label, style):
+    return f'<button type="button" class="btn btn-{style}" onClick="ShowCheckin(\'EVBK\',\'{action}\')">{label}</button>'
+
+
+def _dialog(event, body, buttons):
+    return (f'<div class="modal-header"><h5 class="modal-title">{html.escape(event.title)}</h5></div>\n'
+            f'<div class="modal-body">\n<p>{event.date.strftime("%d.%m.%Y")} {event.start} - {event.end}</p>\n{body}\n</div>\n'
+            f'<div class="modal-footer"><button type="button" class="btn btn-secondary" onClick="CloseCheckin()">Abbrechen</button>{buttons}</div>\n')
+
+
+def _people_table(header, people, capacity):
+    rows = []
+    for i in range(max(capacity, len(people))):
+        name = html.escape(people[i]) if i < len(people) else "<i>(frei)</i>"
+        rows.append(f'<tr><td><span class="badge">{i + 1}</span> {name}</td><td></td></tr>')
+    return f'<table class="table table-sm">\n<thead><tr><th colspan="2">{html.escape(header)}</th></tr></thead>\n<tbody>\n' + "\n".join(rows) + "\n</tbody>\n</table>"
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real server
+    server_version = "ReitbuchStandin/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def date_time_string(self, timestamp=None):
+        # Skewed server clock
+        return email.utils.formatdate(self.server.standin.clock(), usegmt=True)
+
+    # Plumbing
+
+    def _session(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        sid = cookie["PHPSESSID"].value if "PHPSESSID" in cookie else None
+        state = self.server.standin.state
+        if sid not in state.sessions:
+            return None, None
+        return sid, state.sessions[sid]
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True).items()}
+
+    def _inject(self):
+        """Latency and failure injection. Returns False if the request was answered (or dropped) already."""
+        standin = self.server.standin
+        standin.count(self.command, urlsplit(self.path).path)
+        delay = standin.latency + (standin.random_uniform(0, standin.jitter) if standin.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        roll = standin.random_uniform(0, 1)
+        if roll < standin.drop_rate:
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return False
+        roll -= standin.drop_rate
+        if roll < standin.hang_rate:
+            time.sleep(standin.hang_time)
+        roll -= standin.hang_rate
+        if roll < standin.failure_rate:
+            self._send(503, "<h1>Service Unavailable</h1>")
+            return False
+        return True
+
+    def _send(self, status, body, cookie=None, head=False, validate=False):
+        standin = self.server.standin
+        data = body.encode("utf-8")
+        etag = None
+        if validate and standin.validators:
+            etag = f'"{hashlib.blake2b(data, digest_size=8).hexdigest()}"'
+            if etag in self.headers.get("If-None-Match", ""):
+                status, data = 304, b""
+        encoding = None
+        if data and standin.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=6)
+            encoding = "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        if status != 304:
+            self.send_header("Content-Length", str(len(data)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if etag:
+            self.send_header("ETag", etag)
+        if cookie:
+            self.send_header("Set-Cookie", f"PHPSESSID={cookie}; path=/")
+        self.end_headers()
+        if not head:
+            self.wfile.write(data)
+            standin.count_bytes(len(data))
+
+    # Endpoints
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        if not self._inject():
+            return
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        state = self.server.standin.state
+        with state.lock:
+            sid, user = self._session()
+            new_sid = None
+            if sid is None:
+                sid = new_sid = state.new_session()
+
+            validate = False
+            if url.path in ("/", "/index.php"):
+                body = _LOGIN_PAGE
+            elif url.path == "/weekplan.php" and user:
+                body = state.weekplan(int(query.get("w", 0)), user)
+                validate = True
+            elif url.path == "/event.php" and user:
+                event = state.event(int(query.get("e", 0)))
+                body = f"<h5>{html.escape(event.title)}</h5>" if event else "Termin nicht gefunden."
+            elif url.path in ("/weekplan.php", "/event.php"):
+                body = _LOGIN_PAGE
+            else:
+                self._send(404, "Not Found", new_sid, head)
+                return
+        self._send(200, body, new_sid, head, validate)
+
+    def do_POST(self):
+        # Read the body first so an injected error leaves the keep-alive connection usable
+        form = self._form()
+        if not self._inject():
+            return
+        url = urlsplit(self.path)
+        state = self.server.standin.state
+        with state.lock:
+            sid, user = self._session()
+            new_sid = None
+            if sid is None:
+                sid = new_sid = state.new_session()
+
+            if url.path == "/weekplan.php":
+                if "loginuser" in form and state.login(sid, form["loginuser"], form.get("loginpwd")):
+                    user = form["loginuser"]
+                    body = state.weekplan(0, user)
+                elif user:
+                    body = state.weekplan(0, user)
+                else:
+                    body = _LOGIN_PAGE.replace("<form", '<div class="alert-danger">Falsches Passwort</div><form', 1)
+            elif url.path == "/ajax.php":
+                if not user:
+                    body = '<div class="alert alert-danger">Bitte melden Sie sich an.</div>'
+                else:
+                    params = json.loads(form.get("params") or "{}")
+                    command = form.get("command")
+                    if command == "ax.checkin.showcheckin":
+                        body = state.checkin(user, params)
+                    elif command == "ax.event.showeventdetails":
+                        body = state.details(params)
+                    else:
+                        body = f"Unbekanntes Kommando {html.escape(command or '')}"
+            else:
+                self._send(404, "Not Found", new_sid)
+                return
+        self._send(200, body, new_sid)
+
+
+class StandinServer:
+    """
+    Runs the stand-in on a background thread.
+
+        with StandinServer(latency=0.02, competitors=3) as server:
+            client = AsyncReitbuchClient(base_url=server.url)
+
+    latency/jitter: seconds added to every response. failure_rate/hang_rate/drop_rate:
+    probability of a 503, a response delayed by hang_time, or a closed connection.
+    clock_offset: how far the server clock (Date header, booking window) is ahead of local time.
+    compress: gzip the bodies for clients that accept it. validators: send an ETag with the
+    weekplan pages and answer a matching If-None-Match with 304 Not Modified.
+    bytes_sent counts the body bytes written. Everything else is passed to ReitbuchState.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, failure_rate=0.0, hang_rate=0.0,
+                 hang_time=30.0, drop_rate=0.0, clock_offset=0.0, compress=False, validators=False, seed=0, **state_options):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.hang_rate = hang_rate
+        self.hang_time = hang_time
+        self.drop_rate = drop_rate
+        self.clock_offset = clock_offset
+        self.compress = compress
+        self.validators = validators
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.requests = {}
+        self.state = ReitbuchState(clock=self.clock, seed=seed, **state_options)
+
+        self.httpd = ThreadingHTTPServer((host, port), StandinHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.standin = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def clock(self):
+        return time.time() + self.clock_offset
+
+    def random_uniform(self, low, high):
+        with self._random_lock:
+            return self._random.uniform(low, high)
+
+    def count(self, method, path):
+        with self._random_lock:
+            key = f"{method} {path}"
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def count_bytes(self, size):
+        with self._random_lock:
+            self.bytes_sent += size
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, name="reitbuch-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in Reitbuch server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency up to this many seconds")
+    parser.add_argument("--capacity", type=int, default=6, help="Participants per lesson")
+    parser.add_argument("--waitlist-capacity", type=int, default=3, help="Waiting list places per lesson")
+    parser.add_argument("--competitors", type=int, default=0, help="Simulated users booking each contested lesson when its window opens")
+    parser.add_argument("--competitor-spread", type=float, default=1.0, help="Seconds after the window opens within which competitors book")
+    parser.add_argument("--window-days", type=int, default=21, help="Booking window opens at midnight this many days before the lesson")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an HTTP 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Probability of a response delayed by --hang-time")
+    parser.add_argument("--hang-time", type=float, default=30.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probability of closing the connection without response")
+    parser.add_argument("--clock-offset", type=float, default=0.0, help="Server clock skew in seconds")
+    parser.add_argument("--compress", action="store_true", help="gzip responses for clients that accept it")
+    parser.add_argument("--validators", action="store_true", help="Send weekplan ETags and answer If-None-Match with 304")
+    args = parser.parse_args(argv)
+
+    server = StandinServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+        hang_rate=args.hang_rate, hang_time=args.hang_time, drop_rate=args.drop_rate, clock_offset=args.clock_offset,
+        compress=args.compress, validators=args.validators,
+        capacity=args.capacity, waitlist_capacity=args.waitlist_capacity, competitors=args.competitors,
+        competitor_spread=args.competitor_spread, window_days=args.window_days
+    )
+    print(f"Reitbuch stand-in listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
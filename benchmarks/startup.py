@@ -0,0 +1,141 @@
+"""
+Startup benchmark of the command line entry point (src/main.py).
+
+A cron or sniper invocation should spend its time on the network, not on importing
+modules it does not need. Every case runs in fresh interpreters and is measured as the
+overhead over a bare interpreter start (python -c pass), so the numbers stay comparable
+between machines:
+
+    help           --help
+    bad-date       --date with an invalid date, exits before any I/O
+    first-request  process start until the first request reaches a local listener
+
+    python benchmarks/startup.py           # report, check the budgets
+    python benchmarks/startup.py --runs 10
+
+Besides the time budgets (BUDGETS), the early exits must not import the modules of the
+network side at all (DEFERRED). Exits with 1 if a case is over budget or imports one.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "src", "main.py")
+
+# Allowed overhead over a bare interpreter start, in seconds
+BUDGETS = {
+    "help": 0.15,
+    "bad-date": 0.15,
+    "first-request": 0.4,
+}
+
+# Modules a case must not import
+DEFERRED = {
+    "help": ("httpx", "bs4", "asyncio", "sqlite3"),
+    "bad-date": ("httpx", "bs4", "asyncio", "sqlite3"),
+    "first-request": ("bs4", "sqlite3"),
+}
+
+CASES = {
+    "help": ["--help"],
+    "bad-date": ["--date", "31.02.2026"],
+    "first-request": ["--no-session-cache"],
+}
+
+
+def _env(base_url=None):
+    env = dict(os.environ, REITBUCH_USER="startup", REITBUCH_PASSWORD="startup")
+    env.pop("REITBUCH_URL", None)
+    if base_url is not None:
+        env["REITBUCH_URL"] = base_url
+    return env
+
+
+def _run(command, env, python_args=()):
+    """Runs command to completion, returns (seconds, stderr)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *python_args, *command], env=env, capture_output=True, text=True, timeout=60)
+    return time.perf_counter() - start, result.stderr
+
+
+def _run_until_request(command, python_args=(), timeout=30.0):
+    """
+    Runs command against a listener that never answers and returns (seconds until the first
+    connection arrived, stderr). The process is killed once it connected.
+    """
+    with socket.create_server(("127.0.0.1", 0)) as listener:
+        listener.settimeout(timeout)
+        env = _env(f"http://127.0.0.1:{listener.getsockname()[1]}")
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, *python_args, *command], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        try:
+            connection, _ = listener.accept()
+            elapsed = time.perf_counter() - start
+            connection.close()
+        finally:
+            process.kill()
+            _, stderr = process.communicate()
+    return elapsed, stderr
+
+
+def measure(case, runs=5):
+    """Best-of-runs seconds of case (the least disturbed run)."""
+    command = [MAIN, *CASES[case]]
+    if case == "first-request":
+        return min(_run_until_request(command)[0] for _ in range(runs))
+    return min(_run(command, _env())[0] for _ in range(runs))
+
+
+def interpreter_start(runs=5):
+    return min(_run(["-c", "pass"], _env())[0] for _ in range(runs))
+
+
+def imported_modules(case):
+    """Names of all modules case imports (python -X importtime)."""
+    command = [MAIN, *CASES[case]]
+    if case == "first-request":
+        _, stderr = _run_until_request(command, ("-X", "importtime"))
+    else:
+        _, stderr = _run(command, _env(), ("-X", "importtime"))
+    return {line.rsplit("|", 1)[1].strip() for line in stderr.splitlines() if line.startswith("import time:")}
+
+
+def deferred_imports(case):
+    """The modules of DEFERRED[case] that case imports anyway (top-level packages)."""
+    top_level = {name.split(".")[0] for name in imported_modules(case)}
+    return sorted(top_level.intersection(DEFERRED[case]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup time of the Reitbuch command line.")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per case, the best one counts (default: 5)")
+    args = parser.parse_args(argv)
+
+    base = interpreter_start(args.runs)
+    print(f"Interpreter start: {base * 1000:.0f}ms\n")
+    print(f"{'Case':<15} | {'Total':>8} | {'Overhead':>8} | {'Budget':>8} | Deferred modules imported")
+    print("-" * 80)
+    failures = []
+    for case in CASES:
+        total = measure(case, args.runs)
+        overhead = total - base
+        leaked = deferred_imports(case)
+        verdict = ", ".join(leaked) or "-"
+        if overhead > BUDGETS[case] or leaked:
+            failures.append(case)
+            verdict += " OVER BUDGET" if overhead > BUDGETS[case] else ""
+        print(f"{case:<15} | {total * 1000:>6.0f}ms | {overhead * 1000:>6.0f}ms | {BUDGETS[case] * 1000:>6.0f}ms | {verdict}")
+
+    if failures:
+        print(f"Failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import json
+import os
+import tomllib
+from collections import namedtuple
+from datetime import datetime
+
+try:
+    from .booking import DEFAULT_TIME, DEFAULT_TITLE
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import DEFAULT_TIME, DEFAULT_TITLE
+
+# One rider of a batch run. dates is None to use the default target dates.
+Account = namedtuple("Account", ["user", "password", "title", "time", "dates"])
+
+
+def load_accounts(path):
+    """
+    Reads the accounts of a batch run from a TOML or JSON file:
+
+        [[account]]
+        user = "anna"
+        password_env = "ANNA_PASSWORD"  # or: password = "..."
+        title = "Dressur Standard"      # optional, default "Dressur Standard"
+        time = "09:00"                  # optional, default "09:00"
+        dates = ["20.12.2025"]          # optional, default: the next Saturdays > 14 days ahead
+
+    JSON files use the same keys: {"account": [{...}, ...]}.
+    Raises ValueError with a readable message on invalid entries.
+    """
+    with open(path, "rb") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+        else:
+            data = tomllib.load(f)
+
+    entries = data.get("account") if isinstance(data, dict) else None
+    if not entries:
+        raise ValueError(f"{path}: no [[account]] entries found")
+
+    accounts = []
+    for number, entry in enumerate(entries, 1):
+        user = entry.get("user")
+        if not user:
+            raise ValueError(f"{path}: account {number} has no user")
+
+        password = entry.get("password")
+        if password is None and entry.get("password_env"):
+            password = os.environ.get(entry["password_env"])
+        if not password:
+            raise ValueError(f"{path}: no password for {user} (set password or password_env)")
+
+        dates = entry.get("dates")
+        if dates is not None:
+            try:
+                dates = [datetime.strptime(d, "%d.%m.%Y").date() for d in dates]
+            except (TypeError, ValueError):
+                raise ValueError(f"{path}: invalid dates for {user}, use DD.MM.YYYY")
+
+        accounts.append(Account(user, password, entry.get("title", DEFAULT_TITLE), entry.get("time", DEFAULT_TIME), dates))
+    return accounts
@@ -0,0 +1,125 @@
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+try:
+    from .parser import CheckinState, parse_checkin
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from parser import CheckinState, parse_checkin
+
+logger = logging.getLogger(__name__)
+
+CHECKIN_COMMAND = "ax.checkin.showcheckin"
+
+# Outcome of a PRE checkin request.
+# next_param is the EVBK action to book with ('BOOK_T'/'BOOK_W') or None if there is nothing to book,
+# booked is True if a STORN (cancel) action shows we already hold a place.
+PreStatus = namedtuple("PreStatus", ["status_msg", "next_param", "action_desc", "booked"])
+
+
+def week_offset(target_date, today):
+    """Week offset of target_date relative to the current week, as used by weekplan.php?w=."""
+    # Get Monday of current week
+    start_of_current_week = today - timedelta(days=today.weekday())
+    # Get Monday of target week
+    start_of_target_week = target_date - timedelta(days=target_date.weekday())
+    return (start_of_target_week - start_of_current_week).days // 7
+
+
+# The lesson booked when nothing else is configured
+DEFAULT_TITLE = "Dressur Standard"
+DEFAULT_TIME = "09:00"
+
+# Booking windows open at midnight this many days before the lesson
+DEFAULT_WINDOW_DAYS = 21
+
+
+def pre_params(loginuid, event_id):
+    return {"loginuid": loginuid, "step": "PRE", "next": "", "eventid": event_id, "courseid": "0"}
+
+
+def booking_params(loginuid, event_id, next_param):
+    return {
+        "loginuid": loginuid, "step": "EVBK", "next": next_param, "eventid": event_id, "courseid": "0",
+        "selanicls": "S", "selanimal": "S:0", "note": "", "selpayopt": "BILL"
+    }
+
+
+def pre_status(checkin):
+    """The PreStatus of a classified PRE checkin response (parser.parse_checkin(response, "PRE"))."""
+    state = checkin.state
+    if state is CheckinState.DEADLINE_PASSED:
+        return PreStatus("Deadline passed", None, None, False)
+    if state is CheckinState.WAITLISTED:
+        return PreStatus("Already Booked/Waitlisted (Waitlist detected)", None, None, True)
+    if state is CheckinState.BOOKED:
+        return PreStatus(f"Already Booked/Waitlisted ({checkin.storn})", None, None, True)
+    if state is CheckinState.BOOKABLE:
+        return PreStatus("AVAILABLE (Booking)", "BOOK_T", "Booking", False)
+    if state is CheckinState.WAITLIST_OPEN:
+        return PreStatus("AVAILABLE (Waitlisting)", "BOOK_W", "Waitlisting", False)
+    if state is CheckinState.NOT_OPEN:
+        return PreStatus("Booking not open yet", None, None, False)
+    if state is CheckinState.UNCLEAR:
+        return PreStatus("Status unclear (Manual check required)", None, None, False)
+    return PreStatus("Unknown Status", None, None, False)
+
+
+def check_pre(response_pre):
+    """Classifies the response of a PRE checkin request."""
+    return pre_status(parse_checkin(response_pre, "PRE"))
+
+
+def storn_action(response_pre):
+    """The EVBK action that cancels our place or waiting list entry (e.g. 'STORN_WT'), or None."""
+    return parse_checkin(response_pre, "PRE").storn
+
+
+# The outcome classify_evbk reports for each checkin state; states not listed are 'pending'
+_EVBK_OUTCOMES = {
+    CheckinState.SUCCESS: "success",
+    CheckinState.BOOKED: "success",
+    CheckinState.WAITLISTED: "waitlisted",
+    CheckinState.DEADLINE_PASSED: "closed",
+    CheckinState.FULL: "full",
+    CheckinState.CANCELLED: "cancelled",
+    CheckinState.FAILED: "failed",
+}
+
+
+def evbk_outcome(checkin):
+    """The classify_evbk outcome of a classified EVBK response."""
+    return _EVBK_OUTCOMES.get(checkin.state, "pending")
+
+
+def classify_evbk(response_evbk):
+    """
+    Classifies an EVBK response as 'success', 'waitlisted', 'closed', 'full', 'cancelled',
+    'failed' (definitive answers) or 'pending' when the response does not tell yet (e.g.
+    booking window not open).
+    """
+    return evbk_outcome(parse_checkin(response_evbk))
+
+
+async def send_booking(client, loginuid, event_id, next_param):
+    """
+    Sends the EVBK request for next_param and returns (response, Checkin).
+
+    EVBK is never retried, and its deadline may pass after the server made the booking. Then
+    a PRE tells whether we hold a place now: if so, its dialog and Checkin are returned, if
+    not the DeadlineExceeded is raised.
+    """
+    try:
+        from .retry import DeadlineExceeded
+    except ImportError: # Running as a script from src/ (python src/main.py)
+        from retry import DeadlineExceeded
+    try:
+        response = await client.ajax_request(CHECKIN_COMMAND, booking_params(loginuid, event_id, next_param))
+    except DeadlineExceeded as e:
+        logger.warning(f"{e}, checking whether event {event_id} was booked anyway")
+        response = await client.ajax_request(CHECKIN_COMMAND, pre_params(loginuid, event_id))
+        checkin = parse_checkin(response, "PRE")
+        if not checkin.holds_place:
+            raise
+        return response, checkin
+    return response, parse_checkin(response)
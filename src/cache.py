@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300.0
+
+
+def content_digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class _Entry:
+    __slots__ = ("fetched_at", "html", "lessons", "digest")
+
+    def __init__(self, html, fetched_at):
+        self.html = html
+        self.fetched_at = fetched_at
+        self.digest = content_digest(html)
+        self.lessons = None # Parsed lazily, at most once per fetch
+
+
+class _WeekplanCacheBase:
+    def __init__(self, client, parse, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.client = client
+        self.parse = parse
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}
+        self._parsed = {} # week_offset -> (digest, lessons) of the last parse, survives invalidate()
+        self.fetches = 0
+        self.parses = 0
+
+    def _fresh_entry(self, week_offset):
+        entry = self._entries.get(week_offset)
+        if entry is None:
+            return None
+        if self.ttl is not None and self.clock() - entry.fetched_at > self.ttl:
+            del self._entries[week_offset]
+            return None
+        return entry
+
+    def _store(self, week_offset, html):
+        self.fetches += 1
+        entry = _Entry(html, self.clock())
+        # A re-fetched page with unchanged content keeps its parsed lessons
+        digest, lessons = self._parsed.get(week_offset, (None, None))
+        if digest == entry.digest:
+            entry.lessons = lessons
+        self._entries[week_offset] = entry
+        return entry
+
+    def _lessons(self, week_offset, entry):
+        if entry.lessons is None:
+            self.parses += 1
+            entry.lessons = self.parse(entry.html)
+            self._parsed[week_offset] = (entry.digest, entry.lessons)
+        return entry.lessons
+
+    def invalidate(self, week_offset=None):
+        """
+        Drops the cached page for week_offset (or all weeks if None).
+        Must be called after a booking call, since the booking changes the page.
+        The next fetch is only parsed again if the page content actually changed.
+        """
+        if week_offset is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(week_offset, None)
+        logger.debug(f"Invalidated weekplan cache for week {'all' if week_offset is None else week_offset}")
+
+
+class WeekplanCache(_WeekplanCacheBase):
+    """
+    Memoizes the raw weekplan HTML and the parsed lesson list per week offset
+    around a ReitbuchClient, so every week is downloaded and parsed at most once
+    per TTL no matter how many target dates/rules ask for it.
+
+    The returned lesson lists are shared between callers and must not be modified.
+    """
+
+    def get_html(self, week_offset=0):
+        entry = self._fresh_entry(week_offset)
+        if entry is None:
+            entry = self._store(week_offset, self.client.get_weekly_plan(week_offset))
+        return entry.html
+
+    def get_lessons(self, week_offset=0):
+        self.get_html(week_offset)
+        return self._lessons(week_offset, self._entries[week_offset])
+
+
+class AsyncWeekplanCache(_WeekplanCacheBase):
+    """
+    WeekplanCache for AsyncReitbuchClient. Concurrent requests for the same week
+    share one in-flight fetch instead of downloading the page several times.
+    """
+
+    def __init__(self, client, parse, ttl=DEFAULT_TTL, clock=time.monotonic):
+        super().__init__(client, parse, ttl=ttl, clock=clock)
+        self._pending = {}
+
+    async def _entry(self, week_offset):
+        entry = self._fresh_entry(week_offset)
+        if entry is not None:
+            return entry
+
+        task = self._pending.get(week_offset)
+        if task is None:
+            task = asyncio.ensure_future(self.client.get_weekly_plan(week_offset))
+            self._pending[week_offset] = task
+            try:
+                html = await task
+            finally:
+                del self._pending[week_offset]
+            return self._store(week_offset, html)
+
+        await asyncio.shield(task)
+        # The fetching coroutine stores the entry; fall back to the result if it was invalidated meanwhile
+        return self._entries.get(week_offset) or _Entry(task.result(), self.clock())
+
+    async def get_html(self, week_offset=0):
+        return (await self._entry(week_offset)).html
+
+    async def get_lessons(self, week_offset=0):
+        return self._lessons(week_offset, await self._entry(week_offset))
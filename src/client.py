@@ -1,21 +1,344 @@
+import asyncio
 import httpx
+import importlib.util
+import json
 import logging
+import math
+import re
+import statistics
+import time
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+
+try:
+    from .metrics import NO_METRICS
+    from .retry import RequestPolicy
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from metrics import NO_METRICS
+    from retry import RequestPolicy
 
 logger = logging.getLogger(__name__)
 
-class ReitbuchClient:
-    def __init__(self, base_url="https://rfv-leonberg.reitbuch.com"):
+DEFAULT_BASE_URL = "https://rfv-leonberg.reitbuch.com"
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Start-In-Task-Automation": "true" # Custom header to be nice
+}
+
+
+LOGINUID_RE = re.compile(r'id="loginuid" name="loginuid" value="(\d+)"')
+
+
+def extract_loginuid(html):
+    """Returns the loginuid embedded in a logged-in page, or None."""
+    match = LOGINUID_RE.search(html)
+    return match.group(1) if match else None
+
+
+def _is_logged_in(text):
+    text_lower = text.lower()
+    return "logout" in text_lower or "abmelden" in text_lower
+
+
+def _login_data(username, password, phpsessid):
+    return {
+        "loginuser": username,
+        "loginpwd": password,
+        "loginsubmit": "X",
+        "loginscrwidth": "1920",
+        "loginscrheight": "1080",
+        "loginuid": "0",
+        "loginsid": phpsessid, # Reflecting the session ID if we have it
+        "loginconfirm": ""
+    }
+
+
+def _check_login_response(response):
+    """Interprets the response of the login POST. Shared by the sync and async client."""
+    if response.status_code != 200:
+        logger.error(f"Login request failed with status code: {response.status_code}")
+        return False
+
+    # Basic verification: Check if we are still on the login page or redirected/content changed.
+    # usually successful login will show the week plan or "Logout" button.
+    text_lower = response.text.lower()
+    if _is_logged_in(response.text):
+        logger.info("Login successful (detected 'logout'/'abmelden' text).")
+        return True
+    elif 'id="loginform"' in text_lower or 'name="loginform"' in text_lower:
+         logger.error("Login failed: Login form still present.")
+         return False
+    elif "falsches passwort" in text_lower or "user unknown" in text_lower:
+         logger.error("Login failed: Invalid credentials.")
+         return False
+
+    # Fallback check
+    logger.warning("Login status uncertain. Could not find explicit success/failure markers.")
+    return True # Tentative success if no explicit failure
+
+
+def _weekplan_params(week_offset):
+    params = {}
+    if week_offset != 0:
+        params['w'] = week_offset
+        params['p'] = 1 # Seems to be required or standard
+    return params
+
+
+def _use_http2(requested):
+    """HTTP/2 needs the optional h2 package (pip install 'httpx[http2]'); without it the client stays on HTTP/1.1."""
+    if requested and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested, but the h2 package is not installed. Using HTTP/1.1.")
+        return False
+    return requested
+
+
+# Validators and text of a weekplan page, as last received
+_Page = namedtuple("_Page", ["etag", "last_modified", "text"])
+
+
+class WeekplanValidators:
+    """
+    Conditional weekplan requests. Remembers ETag/Last-Modified and the text of the last
+    page per week offset, sends them as If-None-Match/If-Modified-Since and answers a
+    304 Not Modified with the remembered text: an unchanged page costs no body, and as the
+    text is the very same the weekplan caches do not parse it again either.
+
+    Pages the server sends without validators are downloaded as before; the caches still
+    recognize them as unchanged by their content hash (cache.content_digest) and skip the parse.
+    A booking (EVBK) changes the pages, so it drops all validators.
+    """
+
+    def __init__(self):
+        self._pages = {}
+        self.not_modified = 0
+
+    def page(self, week_offset):
+        return self._pages.get(week_offset)
+
+    def headers(self, page):
+        """Request headers for a conditional request of page (None: unconditional)."""
+        if page is None:
+            return None
+        headers = {}
+        if page.etag:
+            headers["If-None-Match"] = page.etag
+        if page.last_modified:
+            headers["If-Modified-Since"] = page.last_modified
+        return headers
+
+    def text(self, week_offset, page, response):
+        """The page text of response to a request made with headers(page). Raises on HTTP errors."""
+        if response.status_code == 304 and page is not None:
+            self.not_modified += 1
+            return page.text
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._pages[week_offset] = _Page(etag, last_modified, response.text)
+        else:
+            self._pages.pop(week_offset, None)
+        return response.text
+
+    def sent_ajax(self, payload):
+        if _ajax_phase(payload) == "checkin.evbk":
+            self._pages.clear()
+
+    def clear(self):
+        self._pages.clear()
+
+
+def _ajax_payload(command, params, boxid):
+    return {
+        "command": command,
+        "boxid": boxid,
+        "params": json.dumps(params),
+        "longtxt": ""
+    }
+
+
+def _ajax_phase(payload):
+    """Metrics phase of an AJAX request: 'checkin.pre', 'checkin.evbk', 'details', ..."""
+    if payload["command"] == "ax.event.showeventdetails":
+        return "details"
+    step = json.loads(payload["params"]).get("step")
+    return f"checkin.{step.lower()}" if step else payload["command"]
+
+
+def _event_details_params(event_id, login_uid):
+    return {
+        "loginuid": str(login_uid),
+        "eventid": str(event_id),
+        "checkin": 0
+    }
+
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _server_date(response):
+    """Epoch seconds of the response Date header (1 s resolution), or None."""
+    value = response.headers.get("Date")
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class ClockCalibration:
+    """
+    Server clock offset and round-trip time estimated from timed requests.
+
+    Each sample is (sent, received, server_date) in epoch seconds. The server produced its
+    Date header somewhere between sent and received and truncated it to the second, so every
+    sample bounds the offset (server - local) to [date - received, date + 1 - sent].
+    Intersecting the bounds of all samples gives the estimate and its error; samples taken at
+    different fractions of a second narrow it well below the 1 s header resolution.
+    """
+
+    def __init__(self, samples):
+        self.samples = list(samples)
+        rtts = sorted(received - sent for sent, received, _ in self.samples)
+        if not rtts:
+            raise ValueError("Calibration needs at least one sample")
+        self.rtt_min = rtts[0]
+        self.rtt_median = statistics.median(rtts)
+        self.rtt_p95 = _percentile(rtts, 0.95)
+
+        dated = [(sent, received, date) for sent, received, date in self.samples if date is not None]
+        if not dated:
+            logger.warning("Server sent no Date header, assuming synchronized clocks.")
+            self.offset = 0.0
+            self.offset_error = None
+            return
+
+        low = max(date - received for sent, received, date in dated)
+        high = min(date + 1 - sent for sent, received, date in dated)
+        if low <= high:
+            self.offset = (low + high) / 2
+            self.offset_error = (high - low) / 2
+        else:
+            # Inconsistent bounds (server clock jumped or requests were answered out of order)
+            self.offset = statistics.median(date + 0.5 - (sent + received) / 2 for sent, received, date in dated)
+            self.offset_error = 0.5 + self.rtt_median / 2
+
+    def local_time_for(self, server_time):
+        """Local epoch time at which the server clock shows server_time."""
+        return server_time - self.offset
+
+    def send_time_for(self, server_time, one_way=None):
+        """
+        Local epoch time to send a request so it arrives when the server clock shows server_time.
+        The one-way latency defaults to half the median round trip.
+        """
+        if one_way is None:
+            one_way = self.rtt_median / 2
+        return self.local_time_for(server_time) - one_way
+
+    def __repr__(self):
+        error = f"±{self.offset_error * 1000:.0f}ms" if self.offset_error is not None else "unknown"
+        return (f"ClockCalibration(offset={self.offset * 1000:+.0f}ms {error}, rtt min/median/p95="
+                f"{self.rtt_min * 1000:.0f}/{self.rtt_median * 1000:.0f}/{self.rtt_p95 * 1000:.0f}ms, samples={len(self.samples)})")
+
+
+def calibration_time(samples, interval=None):
+    """Seconds calibrate() waits between its samples (plus their round trips)."""
+    return sum(_calibration_delays(samples, interval))
+
+
+def _calibration_delays(samples, interval):
+    """
+    Pause before each sample. By default samples are spaced 1 + 1/samples seconds apart,
+    so their send times walk across the second and the Date header rollover narrows the offset.
+    """
+    if interval is None:
+        interval = 1 + 1 / samples
+    return [0.0] + [interval] * (samples - 1)
+
+
+class _SessionMixin:
+    """Session bookkeeping shared by the sync and async client."""
+
+    loginuid = None
+
+    def _set_session_cookie(self, phpsessid):
+        # Use the host as domain so a Set-Cookie from the server replaces it instead of adding a second PHPSESSID
+        self.client.cookies.set("PHPSESSID", phpsessid, domain=httpx.URL(self.base_url).host)
+
+    def _accept_login_page(self, response):
+        """Checks a page fetched with a restored session. Returns True if still logged in."""
+        if response.status_code != 200 or not _is_logged_in(response.text):
+            self.client.cookies.clear()
+            return False
+        self.loginuid = extract_loginuid(response.text) or self.loginuid
+        return True
+
+    def _remember_login(self, response, ok):
+        if ok:
+            self.loginuid = extract_loginuid(response.text)
+        return ok
+
+    def session_id(self):
+        return self.client.cookies.get("PHPSESSID")
+
+
+class _ClockMixin:
+    """Holds the result of calibrate() and answers scheduling questions with it."""
+
+    clock_calibration = None
+
+    def send_time_for(self, server_time, one_way=None):
+        """
+        Local epoch time to send a request so it reaches the server at server_time (server clock).
+        Without calibration the local clock is assumed to match the server.
+        """
+        if self.clock_calibration is None:
+            return server_time
+        return self.clock_calibration.send_time_for(server_time, one_way)
+
+
+class ReitbuchClient(_SessionMixin, _ClockMixin):
+    def __init__(self, base_url=DEFAULT_BASE_URL, metrics=NO_METRICS, transport=None, http2=False, conditional=False, policy=None):
+        """
+        metrics: a Metrics instance that records every request (latency, bytes, outcome).
+        policy: retry.RequestPolicy with the deadlines, retries and circuit breaker of the
+        requests. Clients of the same server can share one, and with it the breaker.
+        transport: optional httpx transport, e.g. a replay.RecordingTransport or ReplayTransport.
+        http2: multiplex the requests over one HTTP/2 connection where the server offers it
+        (needs the h2 package, ignored with a transport).
+        conditional: fetch weekplans with conditional requests, see WeekplanValidators.
+        Responses are compressed (gzip/deflate, brotli/zstd if installed) either way; httpx
+        negotiates that by itself.
+        """
         self.base_url = base_url
+        self.metrics = metrics
+        self.policy = policy if policy is not None else RequestPolicy()
+        self.validators = WeekplanValidators() if conditional else None
         self.client = httpx.Client(
             base_url=base_url,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Start-In-Task-Automation": "true" # Custom header to be nice
-            },
+            headers=DEFAULT_HEADERS,
             follow_redirects=True,
-            timeout=30.0
+            timeout=30.0,
+            http2=_use_http2(http2) if transport is None else False,
+            transport=transport
         )
 
+    def _request(self, phase, method, url, **kwargs):
+        def send(timeout):
+            with self.metrics.timed(phase) as probe:
+                response = getattr(self.client, method)(url, timeout=timeout, **kwargs)
+                if self.metrics.enabled:
+                    probe.response(response)
+            return response
+        return self.policy.call(phase, send)
+
     def login(self, username, password):
         """
         Logs into the application.
@@ -29,7 +352,7 @@ class ReitbuchClient:
         try:
             # We hit index.php or similar first to get a PHPSESSID if strictly needed,
             # but often we can just post. Let's try to just hit the root first.
-            self.client.get("/")
+            self._request("login.start", "get", "/")
         except httpx.RequestError as e:
             logger.error(f"Network error during initial connection: {e}")
             raise
@@ -46,57 +369,52 @@ class ReitbuchClient:
         cookies = self.client.cookies
         phpsessid = cookies.get("PHPSESSID", "")
         
-        data = {
-            "loginuser": username,
-            "loginpwd": password,
-            "loginsubmit": "X",
-            "loginscrwidth": "1920",
-            "loginscrheight": "1080",
-            "loginuid": "0",
-            "loginsid": phpsessid, # Reflecting the session ID if we have it
-            "loginconfirm": ""
-        }
+        data = _login_data(username, password, phpsessid)
         
-        response = self.client.post("/weekplan.php", data=data)
-        
-        if response.status_code != 200:
-            logger.error(f"Login request failed with status code: {response.status_code}")
-            return False
+        response = self._request("login", "post", "/weekplan.php", data=data)
+        return self._remember_login(response, _check_login_response(response))
+
+    def resume_session(self, phpsessid):
+        """
+        Reuses a PHPSESSID from a previous run instead of logging in.
+        Validates it with a single weekplan request; returns False if the session is stale.
+        """
+        self._set_session_cookie(phpsessid)
+        return self._accept_login_page(self._request("resume", "get", "/weekplan.php"))
 
-        # Basic verification: Check if we are still on the login page or redirected/content changed.
-        # usually successful login will show the week plan or "Logout" button.
-        text_lower = response.text.lower()
-        if "logout" in text_lower or "abmelden" in text_lower:
-            logger.info("Login successful (detected 'logout'/'abmelden' text).")
+    def login_or_resume(self, username, password, store=None):
+        """Resumes the session cached in store if it is still valid, otherwise logs in and caches the new one."""
+        session = store.load(username) if store else None
+        if session and self.resume_session(session['phpsessid']):
+            logger.info("Resumed cached session.")
+            self.loginuid = self.loginuid or session.get('loginuid')
+            store.save(username, session['phpsessid'], self.loginuid)
             return True
-        elif 'id="loginform"' in text_lower or 'name="loginform"' in text_lower:
-             logger.error("Login failed: Login form still present.")
-             return False
-        elif "falsches passwort" in text_lower or "user unknown" in text_lower:
-             logger.error("Login failed: Invalid credentials.")
-             return False
-        
-        # Fallback check
-        logger.warning("Login status uncertain. Could not find explicit success/failure markers.")
-        return True # Tentative success if no explicit failure
-        
+
+        if not self.login(username, password):
+            return False
+        if store and self.session_id():
+            store.save(username, self.session_id(), self.loginuid)
+        return True
+
     def get_weekly_plan(self, week_offset=0):
         """
         Fetches the weekly plan page HTML. 
         week_offset: Integer representing the week offset from current week (0=current, 1=next, etc.)
         """
-        params = {}
-        if week_offset != 0:
-            params['w'] = week_offset
-            params['p'] = 1 # Seems to be required or standard
-            
-        response = self.client.get("/weekplan.php", params=params)
+        params = _weekplan_params(week_offset)
+        if self.validators is not None:
+            page = self.validators.page(week_offset)
+            response = self._request("weekplan", "get", "/weekplan.php", params=params, headers=self.validators.headers(page))
+            return self.validators.text(week_offset, page, response)
+
+        response = self._request("weekplan", "get", "/weekplan.php", params=params)
         response.raise_for_status()
         return response.text
 
     def get_event_details(self, event_id):
         """Fetches the event details page to find the booking form."""
-        response = self.client.get(f"/event.php?e={event_id}")
+        response = self._request("event", "get", f"/event.php?e={event_id}")
         response.raise_for_status()
         return response.text
 
@@ -105,15 +423,11 @@ class ReitbuchClient:
         Sends an AJAX request to /ajax.php, mimicking rb_base.js.
         params should be a dict, which will be JSON encoded.
         """
-        import json
-        payload = {
-            "command": command,
-            "boxid": boxid,
-            "params": json.dumps(params),
-            "longtxt": ""
-        }
+        payload = _ajax_payload(command, params, boxid)
         # The JS uses URLSearchParams which sends application/x-www-form-urlencoded
-        response = self.client.post("/ajax.php", data=payload)
+        response = self._request(_ajax_phase(payload), "post", "/ajax.php", data=payload)
+        if self.validators is not None:
+            self.validators.sent_ajax(payload)
         response.raise_for_status()
         return response.text
 
@@ -122,9 +436,225 @@ class ReitbuchClient:
         Fetches the event details via AJAX to get the participant list.
         Corresponds to the 'ax.event.showeventdetails' command.
         """
-        params = {
-            "loginuid": str(login_uid),
-            "eventid": str(event_id),
-            "checkin": 0
-        }
+        params = _event_details_params(event_id, login_uid)
         return self.ajax_request("ax.event.showeventdetails", params, boxid="evt_detail")
+
+    def ping(self):
+        """Cheap request used for keep-alive and clock calibration. Returns the response."""
+        return self._request("ping", "head", "/")
+
+    def calibrate(self, samples=5, interval=None):
+        """
+        Estimates server clock offset and RTT from `samples` timed pings.
+        The result is stored as self.clock_calibration and returned.
+        """
+        timings = []
+        for delay in _calibration_delays(samples, interval):
+            time.sleep(delay)
+            sent = time.time()
+            response = self.ping()
+            received = time.time()
+            timings.append((sent, received, _server_date(response)))
+        self.clock_calibration = ClockCalibration(timings)
+        logger.info(f"Clock calibrated: {self.clock_calibration}")
+        return self.clock_calibration
+
+    def close(self):
+        self.client.close()
+
+
+def async_transport(max_connections=10, keepalive_expiry=5.0, http2=False):
+    """The connection pool an AsyncReitbuchClient builds for itself, for wrapping transports (replay.RecordingTransport)."""
+    return httpx.AsyncHTTPTransport(http2=_use_http2(http2), limits=httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry
+    ))
+
+
+class SharedConnectionPool:
+    """
+    One bounded connection pool shared by several AsyncReitbuchClients.
+    Each client keeps its own cookies (session), only the connections are shared.
+    Clients get a handle via transport(); closing a client leaves the pool open,
+    the owner closes it with aclose() when all clients are done.
+    """
+
+    def __init__(self, max_connections=10, keepalive_expiry=5.0, http2=False):
+        self._transport = async_transport(max_connections, keepalive_expiry, http2)
+
+    def transport(self):
+        return _PoolHandle(self._transport)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+class _PoolHandle(httpx.AsyncBaseTransport):
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        pass # The pool is owned by SharedConnectionPool
+
+
+class AsyncReitbuchClient(_SessionMixin, _ClockMixin):
+    """
+    asyncio variant of ReitbuchClient built on httpx.AsyncClient.
+    Same request/response semantics, but all network methods are coroutines so
+    several weeks/events can be fetched concurrently over one connection pool.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, cookies=None, max_connections=10, keepalive_expiry=5.0, transport=None,
+                 metrics=NO_METRICS, http2=False, conditional=False, policy=None):
+        """
+        transport: optional httpx transport, e.g. a SharedConnectionPool handle so several
+        clients (accounts) use one bounded connection pool, or a replay.RecordingTransport /
+        ReplayTransport. The limits (and http2) only apply without it.
+        metrics, http2, conditional, policy: see ReitbuchClient. Here the deadlines are hard:
+        an attempt still running at the deadline is cancelled.
+        """
+        self.base_url = base_url
+        self.metrics = metrics
+        self.policy = policy if policy is not None else RequestPolicy()
+        self.validators = WeekplanValidators() if conditional else None
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=DEFAULT_HEADERS,
+            cookies=cookies,
+            follow_redirects=True,
+            timeout=30.0,
+            http2=_use_http2(http2) if transport is None else False,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            transport=transport
+        )
+
+    @classmethod
+    def from_client(cls, client, **kwargs):
+        """
+        Creates an async client that shares the cookie jar (and thus the PHPSESSID session)
+        of an existing ReitbuchClient, so a sync login can be reused for async fetching.
+        """
+        kwargs.setdefault("metrics", client.metrics)
+        return cls(base_url=client.base_url, cookies=client.client.cookies.jar, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _request(self, phase, method, url, **kwargs):
+        async def send(timeout):
+            with self.metrics.timed(phase) as probe:
+                response = await getattr(self.client, method)(url, timeout=timeout, **kwargs)
+                if self.metrics.enabled:
+                    probe.response(response)
+            return response
+        return await self.policy.acall(phase, send)
+
+    async def login(self, username, password):
+        """Logs into the application. See ReitbuchClient.login for the flow."""
+        logger.info(f"Attempting login for user: {username}")
+
+        try:
+            await self._request("login.start", "get", "/")
+        except httpx.RequestError as e:
+            logger.error(f"Network error during initial connection: {e}")
+            raise
+
+        phpsessid = self.client.cookies.get("PHPSESSID", "")
+        response = await self._request("login", "post", "/weekplan.php", data=_login_data(username, password, phpsessid))
+        return self._remember_login(response, _check_login_response(response))
+
+    async def resume_session(self, phpsessid):
+        """Reuses a cached PHPSESSID. See ReitbuchClient.resume_session."""
+        self._set_session_cookie(phpsessid)
+        return self._accept_login_page(await self._request("resume", "get", "/weekplan.php"))
+
+    async def login_or_resume(self, username, password, store=None):
+        """Resumes a cached session or logs in. See ReitbuchClient.login_or_resume."""
+        session = store.load(username) if store else None
+        if session and await self.resume_session(session['phpsessid']):
+            logger.info("Resumed cached session.")
+            self.loginuid = self.loginuid or session.get('loginuid')
+            store.save(username, session['phpsessid'], self.loginuid)
+            return True
+
+        if not await self.login(username, password):
+            return False
+        if store and self.session_id():
+            store.save(username, self.session_id(), self.loginuid)
+        return True
+
+    async def get_weekly_plan(self, week_offset=0):
+        """Fetches the weekly plan page HTML for the given week offset."""
+        if self.validators is not None:
+            page = self.validators.page(week_offset)
+            response = await self._request("weekplan", "get", "/weekplan.php", params=_weekplan_params(week_offset),
+                                           headers=self.validators.headers(page))
+            return self.validators.text(week_offset, page, response)
+
+        response = await self._request("weekplan", "get", "/weekplan.php", params=_weekplan_params(week_offset))
+        response.raise_for_status()
+        return response.text
+
+    async def get_event_details(self, event_id):
+        """Fetches the event details page to find the booking form."""
+        response = await self._request("event", "get", f"/event.php?e={event_id}")
+        response.raise_for_status()
+        return response.text
+
+    async def ajax_request(self, command, params, boxid="chkinbox"):
+        """Sends an AJAX request to /ajax.php. params is JSON encoded like in rb_base.js."""
+        return await self.send_ajax(self.prepare_ajax(command, params, boxid))
+
+    def prepare_ajax(self, command, params, boxid="chkinbox"):
+        """Builds the form payload of an AJAX request ahead of time (see send_ajax)."""
+        return _ajax_payload(command, params, boxid)
+
+    async def send_ajax(self, payload):
+        """Sends a payload built by prepare_ajax, so time critical callers skip the encoding."""
+        response = await self._request(_ajax_phase(payload), "post", "/ajax.php", data=payload)
+        if self.validators is not None:
+            self.validators.sent_ajax(payload)
+        response.raise_for_status()
+        return response.text
+
+    async def ping(self):
+        """Cheap request used for keep-alive and clock calibration. Returns the response."""
+        return await self._request("ping", "head", "/")
+
+    async def calibrate(self, samples=5, interval=None):
+        """Estimates server clock offset and RTT. See ReitbuchClient.calibrate."""
+        timings = []
+        for delay in _calibration_delays(samples, interval):
+            await asyncio.sleep(delay)
+            sent = time.time()
+            response = await self.ping()
+            received = time.time()
+            timings.append((sent, received, _server_date(response)))
+        self.clock_calibration = ClockCalibration(timings)
+        logger.info(f"Clock calibrated: {self.clock_calibration}")
+        return self.clock_calibration
+
+    async def get_event_details_ajax(self, event_id, login_uid):
+        """Fetches the event details via AJAX ('ax.event.showeventdetails')."""
+        params = _event_details_params(event_id, login_uid)
+        return await self.ajax_request("ax.event.showeventdetails", params, boxid="evt_detail")
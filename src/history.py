@@ -0,0 +1,291 @@
+import json
+import math
+import os
+import sqlite3
+import statistics
+import time
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+try:
+    from .booking import DEFAULT_WINDOW_DAYS
+    from .cache import content_digest
+    from .lessons import Lesson, parse_clock
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import DEFAULT_WINDOW_DAYS
+    from cache import content_digest
+    from lessons import Lesson, parse_clock
+
+DEFAULT_HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".cache", "autoreitbuch", "history.sqlite3")
+
+# How quickly lessons of one kind fill up after their booking window opens.
+# lessons: lessons with participant snapshots after the opening, full: those seen full,
+# median/p90: seconds from the opening to the first full snapshot (None without full lessons).
+FillStats = namedtuple("FillStats", ["lessons", "full", "median", "p90"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lessons (
+    event_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    date TEXT,
+    start TEXT,
+    end TEXT,
+    is_bookable INTEGER NOT NULL,
+    hash BLOB NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lessons_date ON lessons (date, start);
+CREATE INDEX IF NOT EXISTS lessons_title ON lessons (title, start, date);
+
+CREATE TABLE IF NOT EXISTS lesson_snapshots (
+    event_id INTEGER NOT NULL,
+    observed_at REAL NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT,
+    start TEXT,
+    end TEXT,
+    is_bookable INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lesson_snapshots_event ON lesson_snapshots (event_id, observed_at);
+
+CREATE TABLE IF NOT EXISTS participant_snapshots (
+    event_id INTEGER NOT NULL,
+    observed_at REAL NOT NULL,
+    participants INTEGER NOT NULL,
+    waiting INTEGER NOT NULL,
+    names TEXT NOT NULL,
+    hash BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS participant_snapshots_event ON participant_snapshots (event_id, observed_at);
+
+CREATE TABLE IF NOT EXISTS weekplan_snapshots (
+    week_start TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    hash BLOB NOT NULL,
+    html BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS weekplan_snapshots_week ON weekplan_snapshots (week_start, observed_at);
+"""
+
+
+def _clock_text(value):
+    return value.strftime("%H:%M") if value is not None else None
+
+
+def _lesson_row(lesson):
+    return (lesson.title, lesson.date.isoformat() if lesson.date else None,
+            _clock_text(lesson.start), _clock_text(lesson.end), int(lesson.is_bookable))
+
+
+class HistoryStore:
+    """
+    Local SQLite history of what the runs saw: weekplan pages, lessons and participant lists.
+
+    Every record_* call appends a snapshot only for rows whose content hash differs from the
+    last one stored for the same key (event id, or week for pages), so running every few
+    seconds in --watch mode keeps the database small. The lessons table holds the latest
+    state per event id and is indexed by date and title for offline queries;
+    fill_stats() derives from the participant snapshots how fast a kind of lesson fills up
+    after its booking window opens.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_FILE, clock=time.time):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.clock = clock
+        self.db = sqlite3.connect(path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Recording
+
+    def record_lessons(self, lessons, observed_at=None):
+        """Stores new or changed lessons (Lesson objects). Returns the number of changed rows."""
+        observed_at = self.clock() if observed_at is None else observed_at
+        lessons = list(lessons)
+        if not lessons:
+            return 0
+
+        known = {}
+        ids = [lesson.id for lesson in lessons]
+        for chunk in range(0, len(ids), 500):
+            part = ids[chunk:chunk + 500]
+            query = f"SELECT event_id, hash FROM lessons WHERE event_id IN ({','.join('?' * len(part))})"
+            known.update(self.db.execute(query, part).fetchall())
+
+        changed = []
+        for lesson in lessons:
+            row = _lesson_row(lesson)
+            digest = content_digest(repr(row))
+            if known.get(lesson.id) != digest:
+                changed.append((lesson.id, row, digest))
+                known[lesson.id] = digest
+
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO lessons (event_id, title, date, start, end, is_bookable, hash, first_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (event_id) DO UPDATE SET title = excluded.title, date = excluded.date, start = excluded.start, "
+                "end = excluded.end, is_bookable = excluded.is_bookable, hash = excluded.hash",
+                [(event_id, *row, digest, observed_at) for event_id, row, digest in changed]
+            )
+            self.db.executemany(
+                "INSERT INTO lesson_snapshots (event_id, observed_at, title, date, start, end, is_bookable) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(event_id, observed_at, *row) for event_id, row, _ in changed]
+            )
+        return len(changed)
+
+    def record_weekplan(self, html, lessons, observed_at=None):
+        """Stores a weekplan page (compressed, if it changed) and its lessons. Returns the changed lesson count."""
+        observed_at = self.clock() if observed_at is None else observed_at
+        lessons = list(lessons)
+        dates = [lesson.date for lesson in lessons if lesson.date is not None]
+        if dates:
+            first = min(dates)
+            week_start = (first - timedelta(days=first.weekday())).isoformat()
+            digest = content_digest(html)
+            last = self.db.execute(
+                "SELECT hash FROM weekplan_snapshots WHERE week_start = ? ORDER BY observed_at DESC LIMIT 1", (week_start,)
+            ).fetchone()
+            if last is None or last[0] != digest:
+                with self.db:
+                    self.db.execute("INSERT INTO weekplan_snapshots VALUES (?, ?, ?, ?)",
+                                    (week_start, observed_at, digest, zlib.compress(html.encode())))
+        return self.record_lessons(lessons, observed_at)
+
+    def record_participants(self, event_id, participants, waiting_list, observed_at=None):
+        """Stores the participant/waiting list of an event if it changed. Returns True if it did."""
+        observed_at = self.clock() if observed_at is None else observed_at
+        names = json.dumps([participants, waiting_list], ensure_ascii=False)
+        digest = content_digest(names)
+        last = self.db.execute(
+            "SELECT hash FROM participant_snapshots WHERE event_id = ? ORDER BY observed_at DESC LIMIT 1", (int(event_id),)
+        ).fetchone()
+        if last is not None and last[0] == digest:
+            return False
+        with self.db:
+            self.db.execute("INSERT INTO participant_snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                            (int(event_id), observed_at, len(participants), len(waiting_list), names, digest))
+        return True
+
+    def recording_parser(self, parse):
+        """Wraps a weekplan parser (html -> lessons) so every parsed page is recorded."""
+        def recording_parse(html):
+            lessons = parse(html)
+            self.record_weekplan(html, lessons)
+            return lessons
+        return recording_parse
+
+    # Queries
+
+    def lessons(self, day=None, title=None, start=None):
+        """Latest known state of the lessons matching all given criteria, ordered by date and start."""
+        clauses, params = [], []
+        if day is not None:
+            clauses.append("date = ?")
+            params.append(day.isoformat())
+        if title is not None:
+            clauses.append("title = ?")
+            params.append(title)
+        if start is not None:
+            clauses.append("start = ?")
+            params.append(_clock_text(parse_clock(start)))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            f"SELECT event_id, title, date, start, end, is_bookable FROM lessons{where} ORDER BY date, start", params
+        ).fetchall()
+        return [
+            Lesson(event_id, title, date.fromisoformat(day_text) if day_text else None,
+                   parse_clock(start_text), parse_clock(end_text), bool(bookable),
+                   f"{start_text} - {end_text}" if start_text and end_text else "")
+            for event_id, title, day_text, start_text, end_text, bookable in rows
+        ]
+
+    def participant_history(self, event_id):
+        """[(observed_at, participants, waiting)] of an event, oldest first."""
+        return self.db.execute(
+            "SELECT observed_at, participants, waiting FROM participant_snapshots WHERE event_id = ? ORDER BY observed_at",
+            (int(event_id),)
+        ).fetchall()
+
+    def fill_stats(self, title, start=None, capacity=None, window_days=DEFAULT_WINDOW_DAYS):
+        """
+        FillStats of the lessons titled title (starting at start). A lesson counts as full at
+        its first snapshot with a waiting list (or with capacity participants, if given).
+        The fill time is measured from midnight window_days before the lesson; since
+        snapshots are taken now and then, it is an upper bound.
+        """
+        clauses, params = ["l.title = ?"], [title]
+        if start is not None:
+            clauses.append("l.start = ?")
+            params.append(_clock_text(parse_clock(start)))
+        rows = self.db.execute(
+            "SELECT l.event_id, l.date, p.observed_at, p.participants, p.waiting "
+            "FROM lessons l JOIN participant_snapshots p ON p.event_id = l.event_id "
+            f"WHERE {' AND '.join(clauses)} AND l.date IS NOT NULL ORDER BY l.event_id, p.observed_at", params
+        ).fetchall()
+
+        observed = set()
+        fill_times = {}
+        for event_id, day_text, observed_at, participants, waiting in rows:
+            opens_at = datetime.combine(date.fromisoformat(day_text) - timedelta(days=window_days), datetime.min.time()).timestamp()
+            if observed_at < opens_at or event_id in fill_times:
+                continue
+            observed.add(event_id)
+            if waiting > 0 or (capacity is not None and participants >= capacity):
+                fill_times[event_id] = observed_at - opens_at
+
+        times = sorted(fill_times.values())
+        if not times:
+            return FillStats(len(observed), 0, None, None)
+        p90 = times[max(1, math.ceil(0.9 * len(times))) - 1]
+        return FillStats(len(observed), len(times), statistics.median(times), p90)
+
+
+def fill_advice(stats):
+    """One line on how to book a lesson kind, based on its FillStats."""
+    if not stats.lessons:
+        return "no history yet"
+    if not stats.full:
+        return f"never seen full ({stats.lessons} lesson{'s' if stats.lessons != 1 else ''}), a normal run is enough"
+    share = f"{stats.full}/{stats.lessons} full"
+    if stats.median < 600:
+        return f"{share}, usually within {stats.median:.0f}s of the window opening: use --snipe"
+    if stats.median < 86400:
+        return f"{share}, usually within {stats.median / 3600:.1f}h of the window opening: run --watch from the opening"
+    return f"{share}, usually after {stats.median / 86400:.1f} days: the nightly runs are early enough"
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline queries on the booking history.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_FILE, help=f"History database (default: {DEFAULT_HISTORY_FILE})")
+    parser.add_argument("--title", help="Only lessons with this title")
+    parser.add_argument("--time", help="Only lessons starting at HH:MM")
+    parser.add_argument("--capacity", type=int, help="Places per lesson, to detect full lessons without a waiting list")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS)
+    args = parser.parse_args(argv)
+    start = _clock_text(parse_clock(args.time)) if args.time else None
+
+    with HistoryStore(args.history) as store:
+        kinds = store.db.execute(
+            "SELECT title, start, COUNT(*) FROM lessons WHERE (? IS NULL OR title = ?) AND (? IS NULL OR start = ?) "
+            "GROUP BY title, start ORDER BY title, start",
+            (args.title, args.title, start, start)
+        ).fetchall()
+        for title, start, count in kinds:
+            stats = store.fill_stats(title, start, args.capacity, args.window_days)
+            print(f"{title:<28} {start or '-':>5}  {count:>4} lessons  {fill_advice(stats)}")
+
+
+if __name__ == "__main__":
+    main()
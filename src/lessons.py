@@ -0,0 +1,221 @@
+import bisect
+import re
+from dataclasses import dataclass
+from datetime import date, time
+
+_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_TIME_RE = re.compile(r"(\d{1,2}):(\d{2})")
+
+
+def parse_clock(value):
+    """'09:00' -> time(9, 0). Accepts time objects and None."""
+    if value is None or isinstance(value, time):
+        return value
+    match = _TIME_RE.search(value)
+    if not match:
+        raise ValueError(f"Invalid time: {value!r}")
+    return time(int(match.group(1)), int(match.group(2)))
+
+
+@dataclass(slots=True, frozen=True)
+class Lesson:
+    """
+    One lesson of the weekplan with parsed fields.
+    date/start/end are None when the page did not contain them in a recognizable form.
+    """
+    id: int
+    title: str
+    date: date | None
+    start: time | None
+    end: time | None
+    is_bookable: bool
+    time_text: str = ""
+
+    @classmethod
+    def from_record(cls, record):
+        """Builds a Lesson from a parse_available_lessons dict."""
+        match = _DATE_RE.search(record.get('date_context', ''))
+        lesson_date = date(int(match.group(1)), int(match.group(2)), int(match.group(3))) if match else None
+
+        time_text = record.get('time', '')
+        times = _TIME_RE.findall(time_text)
+        start = time(int(times[0][0]), int(times[0][1])) if times else None
+        end = time(int(times[1][0]), int(times[1][1])) if len(times) > 1 else None
+
+        return cls(int(record['id']), record.get('title', ''), lesson_date, start, end, bool(record.get('is_bookable')), time_text)
+
+    @property
+    def event_id(self):
+        """Event id as the string the AJAX params expect."""
+        return str(self.id)
+
+
+@dataclass(slots=True, frozen=True)
+class LessonQuery:
+    """
+    Filter pushed down into the weekplan parsers, so lessons nobody asked for are never
+    materialized. Fields left None do not filter.
+
+    dates: ISO dates ('2025-12-20') of the day containers to read. The streaming parser skips
+    events in other containers before collecting any of their text, and stops reading the
+    page once every requested date of the page's week has been read.
+    title: exact title, or a callable(title) -> bool.
+    start: start time ('09:00' or a time), or a callable(time_text) -> bool.
+    predicate: callable(record) -> bool, applied to the finished record dict.
+    bookable_only: skip past events (wp_event_past) right away.
+    """
+    dates: frozenset | None = None
+    title: object = None
+    start: object = None
+    predicate: object = None
+    bookable_only: bool = False
+
+    @classmethod
+    def for_lesson(cls, day=None, title=None, start=None):
+        """The query of a single lesson lookup, e.g. LessonQuery.for_lesson(date(2025, 12, 20), 'Dressur Standard', '09:00')."""
+        return cls(frozenset([day.isoformat()]) if day is not None else None, title, start)
+
+
+def lessons_from_records(records):
+    # Records whose onclick did not carry a numeric event id cannot be booked anyway
+    return [Lesson.from_record(r) for r in records if str(r.get('id', '')).isdigit()]
+
+
+def _start_key(lesson):
+    # Lessons without start time sort first
+    return lesson.start or time.min
+
+
+class LessonIndex:
+    """
+    Collection of Lessons, indexed by event id, date, title and start time.
+
+    Lookups by id/date/exact title are dict accesses, start-time ranges use bisect on
+    per-date (and global) sorted lists, and title substring searches only scan the
+    distinct titles (a handful), not the lessons. Lessons of several weeks can be added
+    to one index; an id that is added again replaces the old lesson.
+    """
+
+    def __init__(self, lessons=()):
+        self._by_id = {}
+        self._by_date = {}
+        self._by_title = {}
+        self._dates = []
+        self._by_start = None # Global (start, id) list, built lazily
+        self.add(lessons)
+
+    def add(self, lessons):
+        changed_dates = set()
+        for lesson in lessons:
+            old = self._by_id.get(lesson.id)
+            if old is not None:
+                self._remove(old)
+                changed_dates.add(old.date)
+            self._by_id[lesson.id] = lesson
+            if lesson.date not in self._by_date:
+                self._by_date[lesson.date] = []
+                if lesson.date is not None:
+                    bisect.insort(self._dates, lesson.date)
+            self._by_date[lesson.date].append(lesson)
+            self._by_title.setdefault(lesson.title, []).append(lesson)
+            changed_dates.add(lesson.date)
+
+        for day in changed_dates:
+            if day in self._by_date:
+                self._by_date[day].sort(key=_start_key)
+        if changed_dates:
+            self._by_start = None
+        return self
+
+    def _remove(self, lesson):
+        day = self._by_date[lesson.date]
+        day.remove(lesson)
+        if not day:
+            del self._by_date[lesson.date]
+            if lesson.date is not None:
+                self._dates.remove(lesson.date)
+        titled = self._by_title[lesson.title]
+        titled.remove(lesson)
+        if not titled:
+            del self._by_title[lesson.title]
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def __contains__(self, event_id):
+        return int(event_id) in self._by_id
+
+    def get(self, event_id):
+        return self._by_id.get(int(event_id))
+
+    @property
+    def dates(self):
+        return list(self._dates)
+
+    def on(self, day):
+        """Lessons on day, ordered by start time."""
+        return list(self._by_date.get(day, ()))
+
+    def between_dates(self, first, last):
+        """Lessons from first to last (inclusive), ordered by date and start time."""
+        low = bisect.bisect_left(self._dates, first)
+        high = bisect.bisect_right(self._dates, last)
+        return [lesson for day in self._dates[low:high] for lesson in self._by_date[day]]
+
+    def with_title(self, text, exact=False):
+        """Lessons whose title is text (exact) or contains it."""
+        if exact:
+            return list(self._by_title.get(text, ()))
+        return [lesson for title, lessons in self._by_title.items() if text in title for lesson in lessons]
+
+    def starting_between(self, earliest, latest, day=None):
+        """Lessons starting in [earliest, latest], on day or on any date."""
+        earliest, latest = parse_clock(earliest), parse_clock(latest)
+        if day is not None:
+            lessons = self._by_date.get(day, [])
+            starts = [_start_key(lesson) for lesson in lessons]
+            return lessons[bisect.bisect_left(starts, earliest):bisect.bisect_right(starts, latest)]
+
+        if self._by_start is None:
+            self._by_start = sorted(((lesson.start, lesson.id) for lesson in self if lesson.start is not None))
+        low = bisect.bisect_left(self._by_start, (earliest, -1))
+        high = bisect.bisect_right(self._by_start, (latest, float('inf')))
+        return [self._by_id[event_id] for _, event_id in self._by_start[low:high]]
+
+    def find(self, day=None, title=None, start=None, latest_start=None, exact_title=False):
+        """
+        Lessons matching all given criteria, ordered by date and start time.
+        start alone means "starts exactly at"; with latest_start it is a range.
+        The most selective index (date, then title) is used to get the candidates.
+        """
+        start = parse_clock(start)
+        latest_start = parse_clock(latest_start) if latest_start is not None else start
+
+        if day is not None:
+            if start is not None:
+                candidates = self.starting_between(start, latest_start, day)
+            else:
+                candidates = self._by_date.get(day, [])
+        elif title is not None:
+            candidates = sorted(self.with_title(title, exact_title), key=lambda l: (l.date or date.min, _start_key(l)))
+        elif start is not None:
+            candidates = sorted(self.starting_between(start, latest_start), key=lambda l: (l.date or date.min, _start_key(l)))
+        else:
+            candidates = sorted(self, key=lambda l: (l.date or date.min, _start_key(l)))
+
+        result = []
+        for lesson in candidates:
+            if title is not None and (lesson.title != title if exact_title else title not in lesson.title):
+                continue
+            if start is not None and (lesson.start is None or not start <= lesson.start <= latest_start):
+                continue
+            result.append(lesson)
+        return result
+
+
+def index_parser(parse):
+    """Wraps a weekplan parser (html -> records) so it returns a LessonIndex instead."""
+    return lambda html: LessonIndex(lessons_from_records(parse(html)))
@@ -1,206 +1,176 @@
 import os
 import sys
 import logging
-from client import ReitbuchClient
-from parser import parse_available_lessons, parse_participants
+from booking import DEFAULT_WINDOW_DAYS
+from batch import load_accounts
+from metrics import NO_METRICS, Metrics
+from report import NdjsonReport
+from session import DEFAULT_SESSION_FILE
+from rules import RuleMatcher, default_rules, load_rules
 
-logging.basicConfig(
-    level=logging.WARNING, 
-    format='%(message)s'   
-)
+# Only light modules are imported up here. httpx, asyncio and the network side (runner.py)
+# are imported once the arguments have been checked and a run is really going to happen,
+# bs4 only by the code paths that use it (--parser soup, --status). An invocation that
+# exits early - --help, a bad --date, missing credentials - never pays for them.
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("parser").setLevel(logging.WARNING)
+def setup_logging():
+    logging.basicConfig(
+        level=logging.WARNING,
+        format='%(message)s'
+    )
+    for name in (__name__, "runner"):
+        logging.getLogger(name).setLevel(logging.INFO)
 
-def main():
-    username = os.environ.get("REITBUCH_USER")
-    password = os.environ.get("REITBUCH_PASSWORD")
-
-    if not username or not password:
-        logger.error("Error: REITBUCH_USER and REITBUCH_PASSWORD environment variables must be set.")
-        sys.exit(1)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("parser").setLevel(logging.WARNING)
 
+def main():
     import argparse
+    setup_logging()
     parser = argparse.ArgumentParser(description='Automate Reitbuch booking.')
     parser.add_argument('--book', action='store_true', help='Actually perform the booking (default is dry-run)')
     parser.add_argument('--status', action='store_true', help='List participants and waiting list')
-    parser.add_argument('--date', type=str, help='Specific date to check (DD.MM.YYYY)')
+    parser.add_argument('--date', type=str, help='Specific date to check (DD.MM.YYYY), with all rules regardless of their weekdays')
+    parser.add_argument('--rules', type=str, metavar='FILE', help="What to book (TOML/JSON rules: weekdays, time window, title pattern, priority, horizon; default: 'Dressur Standard' at 09:00 on Saturdays)")
+    parser.add_argument('--concurrency', type=int, default=6, help='Maximum number of weeks fetched at the same time (default: 6)')
+    parser.add_argument('--parser', choices=['stream', 'soup'], default='stream', help='Weekplan parser: single-pass streaming (default) or the BeautifulSoup fallback')
+    parser.add_argument('--session-file', default=DEFAULT_SESSION_FILE, help=f'Where to cache the login session between runs (default: {DEFAULT_SESSION_FILE})')
+    parser.add_argument('--no-session-cache', action='store_true', help='Always log in, never reuse a cached session')
+    parser.add_argument('--snipe', action='store_true', help='Prepare everything for the lesson on --date and fire the booking at --at (start it a few minutes before)')
+    parser.add_argument('--at', type=str, help='Snipe instant: HH:MM[:SS] or ISO datetime, local time unless an offset is given (default: next midnight)')
+    parser.add_argument('--snipe-attempts', type=int, default=20, help='Maximum booking requests in the snipe loop (default: 20)')
+    parser.add_argument('--snipe-interval', type=float, default=0.05, help='Pause between snipe attempts in seconds (default: 0.05)')
+    parser.add_argument('--no-calibrate', action='store_true', help='Do not estimate the server clock offset before sniping (trust the local clock)')
+    parser.add_argument('--calibration-samples', type=int, default=5, help='Timed requests used for clock calibration (default: 5)')
+    parser.add_argument('--race', action='store_true', help='With --book, book all matches of a date at the same time instead of one after another; the best place is kept and lower priority bookings are cancelled again')
+    parser.add_argument('--race-max', type=int, default=3, help='Maximum simultaneous bookings per date with --race (default: 3)')
+    parser.add_argument('--watch', action='store_true', help='Keep running and poll the rule targets, booking (with --book) or reporting as soon as a place frees up')
+    parser.add_argument('--watch-min-interval', type=float, default=5.0, help='Shortest pause between watch rounds in seconds, used close to a lesson or window opening (default: 5)')
+    parser.add_argument('--watch-max-interval', type=float, default=600.0, help='Longest pause between watch rounds in seconds (default: 600)')
+    parser.add_argument('--window-days', type=int, default=DEFAULT_WINDOW_DAYS, help=f'Booking windows open at midnight this many days before the lesson (default: {DEFAULT_WINDOW_DAYS})')
+    parser.add_argument('--lean', action='store_true', help='Bandwidth saving transport for polling: HTTP/2 where the server offers it (needs the h2 package) and conditional weekplan requests, so unchanged pages are neither downloaded nor parsed again')
+    parser.add_argument('--output', choices=['table', 'ndjson'], default='table', help='Result format: the table (default), or one JSON record per line on stdout, written as soon as each lesson is decided')
+    parser.add_argument('--metrics', dest='metrics_file', metavar='FILE', help='Record latency, bytes, parse time and outcome of every phase to FILE: OpenMetrics text for .prom/.om/.txt, otherwise appended JSON lines')
+    parser.add_argument('--history', nargs='?', const=True, metavar='FILE', help='Record weekplans, lessons and participant lists (--status) in a local SQLite history and print fill-rate advice; query it with src/history.py (default file: ~/.cache/autoreitbuch/history.sqlite3)')
+    parser.add_argument('--record', metavar='FILE', help='Record every request and response of this run to FILE (gzip JSON lines, passwords and session ids left out) for --replay')
+    parser.add_argument('--replay', metavar='FILE', help='Answer all requests from an archive made with --record instead of the server; the run uses the recording date as today')
+    parser.add_argument('--replay-timing', action='store_true', help='With --replay, delay each response by its recorded latency instead of answering at once')
+    parser.add_argument('--base-url', default=os.environ.get("REITBUCH_URL"), help='Reitbuch server, e.g. a local stand-in (default: $REITBUCH_URL or the club site)')
+    parser.add_argument('--batch', type=str, metavar='FILE', help='Book for all accounts in FILE (TOML/JSON) in one process instead of REITBUCH_USER')
     args = parser.parse_args()
 
-    client = ReitbuchClient()
+    args.report = NdjsonReport() if args.output == 'ndjson' else None
+
+    accounts = None
+    username = password = None
+    if args.batch:
+        if args.snipe or args.watch:
+            parser.error("--batch cannot be combined with --snipe or --watch")
+        try:
+            accounts = load_accounts(args.batch)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error: cannot read accounts: {e}")
+            sys.exit(1)
+    else:
+        username = os.environ.get("REITBUCH_USER")
+        password = os.environ.get("REITBUCH_PASSWORD")
+
+        if not username or not password:
+            logger.error("Error: REITBUCH_USER and REITBUCH_PASSWORD environment variables must be set.")
+            sys.exit(1)
+
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.replay and (args.snipe or args.watch):
+        parser.error("--replay cannot be combined with --snipe or --watch")
+    if args.replay_timing and not args.replay:
+        parser.error("--replay-timing requires --replay")
+    if args.record or args.replay:
+        # A resumed session would replace the login exchanges of the archive
+        args.no_session_cache = True
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.race_max < 1:
+        parser.error("--race-max must be at least 1")
+    if args.snipe and args.watch:
+        parser.error("--snipe and --watch are mutually exclusive")
+    if args.snipe:
+        if not args.date:
+            parser.error("--snipe requires --date")
+        from snipe import parse_fire_time
+        try:
+            args.fire_at = parse_fire_time(args.at)
+        except ValueError:
+            parser.error("Invalid --at time. Use HH:MM[:SS][+HH:MM] or an ISO datetime")
+
+    from datetime import date, datetime
+    archive = None
+    if args.replay:
+        from replay import Archive
+        try:
+            archive = Archive(args.replay)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error: cannot read replay archive: {e}")
+            sys.exit(1)
+    # A replayed run happens on the day it was recorded, so it asks for the same weeks
+    today = date.fromtimestamp(archive.recorded_at) if archive is not None else date.today()
 
     try:
-        if not client.login(username, password):
-            logger.error("Login failed. Check credentials.")
+        rules = load_rules(args.rules) if args.rules else default_rules()
+    except (OSError, ValueError) as e:
+        logger.error(f"Error: cannot read rules: {e}")
+        sys.exit(1)
+    matcher = RuleMatcher(rules)
+
+    only = None
+    if args.date:
+        try:
+            only = datetime.strptime(args.date, "%d.%m.%Y").date()
+        except ValueError:
+            logger.error("Invalid date format. Please use DD.MM.YYYY")
             sys.exit(1)
-            
-        logger.info("Login successful. Checking schedule for 'Dressur Standard' (09:00 - 10:00)...")
-        print("-" * 60)
-        print(f"{'Date':<15} | {'Lesson ID':<10} | {'Status':<30}")
-        print("-" * 60)
-        
-        from datetime import date, datetime, timedelta
-        today = date.today()
-        
-        target_dates = []
-        if args.date:
-            try:
-                dt = datetime.strptime(args.date, "%d.%m.%Y").date()
-                target_dates = [dt]
-            except ValueError:
-                logger.error("Invalid date format. Please use DD.MM.YYYY")
-                sys.exit(1)
-        else:
-            days_ahead = 5 - today.weekday()
-            if days_ahead <= 0: days_ahead += 7
-            next_saturday = today + timedelta(days=days_ahead)
-            
-            # Check next 6 weeks to catch lessons > 14 days away
-            potential_dates = [next_saturday + timedelta(weeks=i) for i in range(6)]
-            # Filter: must be more than 14 days in the future
-            target_dates = [d for d in potential_dates if (d - today).days > 14]
-        
-        target_found = False
-        
-        for target_date in target_dates:
-            date_str = target_date.strftime("%d.%m.%Y")
-            
-            # Calculate week offset
-            # Reitbuch likely counts week diffs.
-            # Get Monday of current week
-            start_of_current_week = today - timedelta(days=today.weekday())
-            # Get Monday of target week
-            start_of_target_week = target_date - timedelta(days=target_date.weekday())
-            
-            week_diff = (start_of_target_week - start_of_current_week).days // 7
-            
-            try:
-                html = client.get_weekly_plan(week_diff)
-                lessons = parse_available_lessons(html)
-                
-                target_lessons = [l for l in lessons if "Dressur Standard" in l['title'] and "09:00" in l['time']]
-                
-                if not target_lessons:
-                    print(f"{date_str:<15} | {'-':<10} | {'Not found':<30}")
-                    continue
+    # By default the Saturdays 15 to 42 days ahead (the next two weeks are booked out already)
+    targets = matcher.targets(today, only=only)
 
-                for tl in target_lessons:
-                    eid = tl['id']
-                    status_msg = "Unknown"
-                    
-                    # Expected context format: 'col_YYYY-MM-DD' or just 'YYYY-MM-DD' depending on parser
-                    target_iso = target_date.strftime("%Y-%m-%d")
-                    lesson_date_ctx = tl.get('date_context', '')
-                    
-                    if target_iso not in lesson_date_ctx:
-                         status_msg = f"Date Mismatch ({lesson_date_ctx})"
-                         print(f"{date_str:<15} | {eid:<10} | {status_msg:<30}")
-                         continue
-                    
-                    if not tl.get('is_bookable'):
-                         status_msg = "Full / Deadline passed"
-                    else:
-                         # It's technically bookable, check details via PRE
-                         # Extract loginuid
-                         import re
-                         match = re.search(r'id="loginuid" name="loginuid" value="(\d+)"', html)
-                         loginuid = match.group(1) if match else "0"
-                         
-                         params = {"loginuid": loginuid, "step": "PRE", "next": "", "eventid": eid, "courseid": "0"}
-                         response_pre = client.ajax_request("ax.checkin.showcheckin", params)
-                         if "Buchungsfrist beendet" in response_pre or "Termin ist vergangen" in response_pre:
-                              status_msg = "Deadline passed"
-                         elif "Sie sind auf der Warteliste" in response_pre:
-                              status_msg = "Already Booked/Waitlisted (Waitlist detected)"
-                         else:
-                              # Robust check: Parse the Next Action from the button
-                              # onClick="ShowCheckin('EVBK','BOOK_W')" or 'STORN_WT' etc.
-                              # Regex handles potential variations in quoting and whitespace
-                              # We use findall because there might be multiple ShowCheckin calls (e.g. for onChange events)
-                              all_actions = re.findall(r"ShowCheckin\s*\(\s*['\"]EVBK['\"]\s*,\s*['\"]([^'\"]+)['\"]\s*\)", response_pre)
-                              
-                              # Determine status based on available actions
-                              # Priority: Check if we can cancel (STORN) -> Booked
-                              # Then check if we can book (BOOK_T / BOOK_W)
-                              
-                              next_action = None
-                              # 1. Check for cancellation (Already booked)
-                              storn_action = next((a for a in all_actions if "STORN" in a), None)
-                              
-                              # 2. Check for booking
-                              book_t_action = "BOOK_T" if "BOOK_T" in all_actions else None
-                              book_w_action = "BOOK_W" if "BOOK_W" in all_actions else None
-                              
-                              if storn_action:
-                                  status_msg = f"Already Booked/Waitlisted ({storn_action})"
-                                  print(f"{date_str:<15} | {eid:<10} | {status_msg:<30}")
-                                  continue 
-                              elif book_t_action:
-                                  status_msg = "AVAILABLE (Booking)"
-                                  action_desc = "Booking"
-                                  next_param = "BOOK_T"
-                                  is_waitlist = False
-                              elif book_w_action:
-                                  status_msg = "AVAILABLE (Waitlisting)"
-                                  action_desc = "Waitlisting"
-                                  next_param = "BOOK_W"
-                                  is_waitlist = True
-                              else:
-                                  # Fallback / Unknown
-                                  if "Teilnahme am Termin" in response_pre and "stornieren" in response_pre:
-                                       status_msg = "Status unclear (Manual check required)"
-                                  else:
-                                       status_msg = "Unknown Status"
-                              
-                              # Proceed with booking if available
-                              if "AVAILABLE" in status_msg:
-                                  if args.book:
-                                      booking_params = {
-                                        "loginuid": loginuid, "step": "EVBK", "next": next_param, "eventid": eid, "courseid": "0",
-                                        "selanicls": "S", "selanimal": "S:0", "note": "", "selpayopt": "BILL"
-                                      }
-                                      response_evbk = client.ajax_request("ax.checkin.showcheckin", booking_params)
-                                      if "erfolgreich" in response_evbk or "gebucht" in response_evbk or "Sie sind Teilnehmer" in response_evbk:
-                                          status_msg = f"{action_desc} SUCCESSFUL"
-                                          target_found = True
-                                      else:
-                                          status_msg = f"{action_desc} FAILED (See log)"
-                                          logger.warning(f"Booking response debug: {response_evbk[:200]}...")
-                                          target_found = True
-                                  else:
-                                      status_msg += " - Dry Run"
-                                      target_found = True
-                    
-                    print(f"{date_str:<15} | {eid:<10} | {status_msg:<30}")
-                    
-                    if args.status:
-                         # Fetch participants
-                         match = re.search(r'id="loginuid" name="loginuid" value="(\d+)"', html)
-                         loginuid = match.group(1) if match else "0"
-                         
-                         try:
-                             details_html = client.get_event_details_ajax(eid, loginuid)
-                             parsed = parse_participants(details_html)
-                             
-                             if parsed['participants']:
-                                 print(f"   Participants: {', '.join(parsed['participants'])}")
-                             else:
-                                 print("   Participants: (None found or parsing failed)")
-                                 
-                             if parsed['waiting_list']:
-                                 print(f"   Waiting List: {', '.join(parsed['waiting_list'])}")
-                         except Exception as e:
-                             print(f"   Error fetching status: {e}")
-                    # Continue searching other dates even if found
-            
-            except Exception as e:
-                print(f"{date_str:<15} | {'ERROR':<10} | {str(e):<30}")
+    # From here on every run talks to the server
+    import asyncio
+    from client import DEFAULT_BASE_URL
+    from runner import run, run_batch
+    if args.base_url is None:
+        args.base_url = DEFAULT_BASE_URL
 
+    metrics = Metrics() if args.metrics_file else NO_METRICS
+    history = None
+    recorder = None
+    try:
+        if args.history:
+            from history import DEFAULT_HISTORY_FILE, HistoryStore
+            history = HistoryStore(DEFAULT_HISTORY_FILE if args.history is True else args.history)
+        if args.record:
+            from replay import ExchangeRecorder
+            recorder = ExchangeRecorder(args.record)
+        if accounts:
+            asyncio.run(run_batch(args, accounts, list(targets), today, metrics, history, recorder, archive))
+        else:
+            asyncio.run(run(args, username, password, matcher, targets, today, only, metrics, history, recorder, archive))
+    except KeyboardInterrupt:
+        logger.info("Stopped.")
     except Exception as e:
         logger.exception(f"An unexpected error occurred: {e}")
         sys.exit(1)
+    finally:
+        if history is not None:
+            history.close()
+        if recorder is not None:
+            recorder.close()
+            logger.info(f"Recorded {recorder.exchanges} exchanges to {args.record}")
+        if metrics.enabled:
+            try:
+                metrics.write(args.metrics_file)
+            except OSError as e:
+                logger.error(f"Cannot write metrics: {e}")
 
 if __name__ == "__main__":
     main()
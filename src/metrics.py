@@ -0,0 +1,194 @@
+import json
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram buckets of the OpenMetrics export, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class Sample:
+    """
+    One timed phase (duration in seconds) or, with duration None, an outcome event such
+    as a booking result. sent/received are bytes on the wire.
+    """
+    __slots__ = ("ts", "phase", "duration", "sent", "received", "outcome", "detail", "labels")
+
+    def __init__(self, ts, phase, duration=None, sent=0, received=0, outcome="ok", detail=None, labels=None):
+        self.ts = ts
+        self.phase = phase
+        self.duration = duration
+        self.sent = sent
+        self.received = received
+        self.outcome = outcome
+        self.detail = detail
+        self.labels = labels or {}
+
+    def to_dict(self):
+        record = {"ts": round(self.ts, 6), "phase": self.phase, "outcome": self.outcome}
+        if self.duration is not None:
+            record["duration_ms"] = round(self.duration * 1000, 3)
+        if self.sent or self.received:
+            record["sent"] = self.sent
+            record["received"] = self.received
+        if self.detail:
+            record["detail"] = self.detail
+        record.update(self.labels)
+        return record
+
+
+class _Probe:
+    """Handed out by Metrics.timed() so the timed code can fill in what it learned."""
+    __slots__ = ("sent", "received", "outcome", "detail", "labels")
+
+    def __init__(self, labels):
+        self.sent = 0
+        self.received = 0
+        self.outcome = "ok"
+        self.detail = None
+        self.labels = labels
+
+    def response(self, response):
+        """Takes sizes and outcome from an httpx response."""
+        self.sent = len(response.request.content)
+        self.received = response.num_bytes_downloaded
+        if response.status_code >= 400:
+            self.outcome = f"http_{response.status_code}"
+        elif response.status_code == 304:
+            self.outcome = "not_modified"
+
+
+def summarize(text):
+    """The whole response text on one line, for the detail of a failed sample and its log line."""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class Metrics:
+    """
+    Collects per-phase samples of a run: request latency and bytes from the clients, parse
+    time from timed_parser() and booking outcomes from the callers.
+    Exports them as JSON lines (appended, one run after the other) or as an OpenMetrics
+    text file (a snapshot of this run, e.g. for a node_exporter textfile collector).
+    """
+
+    enabled = True
+
+    def __init__(self, clock=time.perf_counter, wall_clock=time.time):
+        self.clock = clock
+        self.wall_clock = wall_clock
+        self.run = datetime.fromtimestamp(wall_clock()).isoformat(timespec="seconds")
+        self.samples = []
+
+    @contextmanager
+    def timed(self, phase, **labels):
+        """Times the block as phase. Exceptions are recorded with outcome 'error' and re-raised."""
+        probe = _Probe(labels)
+        ts = self.wall_clock()
+        start = self.clock()
+        try:
+            yield probe
+        except BaseException as e:
+            probe.outcome = "error"
+            probe.detail = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.samples.append(Sample(ts, phase, self.clock() - start, probe.sent, probe.received,
+                                       probe.outcome, probe.detail, probe.labels))
+
+    def event(self, phase, outcome, detail=None, **labels):
+        """Records an untimed outcome, e.g. the classified answer to a booking request."""
+        self.samples.append(Sample(self.wall_clock(), phase, outcome=outcome, detail=detail, labels=labels))
+
+    def timed_parser(self, parse, phase="parse"):
+        """Wraps a weekplan parser (html -> lessons) so every call is recorded with its input size."""
+        def timed_parse(html):
+            with self.timed(phase) as probe:
+                probe.received = len(html)
+                lessons = parse(html)
+                probe.labels = {"lessons": len(lessons)}
+            return lessons
+        return timed_parse
+
+    def write(self, path):
+        """Writes OpenMetrics for .prom/.om/.txt files, JSON lines otherwise."""
+        if path.endswith((".prom", ".om", ".txt")):
+            with open(path, "w") as f:
+                f.write(self.openmetrics())
+        else:
+            self.write_jsonl(path)
+
+    def write_jsonl(self, path):
+        with open(path, "a") as f:
+            for sample in self.samples:
+                f.write(json.dumps({"run": self.run, **sample.to_dict()}, ensure_ascii=False) + "\n")
+
+    def openmetrics(self):
+        durations = {}
+        sizes = {}
+        outcomes = {}
+        for sample in self.samples:
+            if sample.duration is not None:
+                durations.setdefault(sample.phase, []).append(sample.duration)
+            if sample.sent or sample.received:
+                sent, received = sizes.get(sample.phase, (0, 0))
+                sizes[sample.phase] = (sent + sample.sent, received + sample.received)
+            key = (sample.phase, sample.outcome)
+            outcomes[key] = outcomes.get(key, 0) + 1
+
+        lines = [
+            "# TYPE reitbuch_phase_duration_seconds histogram",
+            "# UNIT reitbuch_phase_duration_seconds seconds",
+            "# HELP reitbuch_phase_duration_seconds Duration of requests and parses per phase.",
+        ]
+        for phase, values in sorted(durations.items()):
+            label = f'phase="{_escape(phase)}"'
+            for bound in DURATION_BUCKETS:
+                lines.append(f'reitbuch_phase_duration_seconds_bucket{{{label},le="{bound}"}} {sum(v <= bound for v in values)}')
+            lines.append(f'reitbuch_phase_duration_seconds_bucket{{{label},le="+Inf"}} {len(values)}')
+            lines.append(f"reitbuch_phase_duration_seconds_count{{{label}}} {len(values)}")
+            lines.append(f"reitbuch_phase_duration_seconds_sum{{{label}}} {sum(values):.6f}")
+
+        lines += [
+            "# TYPE reitbuch_phase_bytes counter",
+            "# UNIT reitbuch_phase_bytes bytes",
+            "# HELP reitbuch_phase_bytes Bytes sent and received per phase.",
+        ]
+        for phase, (sent, received) in sorted(sizes.items()):
+            lines.append(f'reitbuch_phase_bytes_total{{phase="{_escape(phase)}",direction="sent"}} {sent}')
+            lines.append(f'reitbuch_phase_bytes_total{{phase="{_escape(phase)}",direction="received"}} {received}')
+
+        lines += [
+            "# TYPE reitbuch_phase_outcomes counter",
+            "# HELP reitbuch_phase_outcomes Samples per phase and outcome.",
+        ]
+        for (phase, outcome), count in sorted(outcomes.items()):
+            lines.append(f'reitbuch_phase_outcomes_total{{phase="{_escape(phase)}",outcome="{_escape(outcome)}"}} {count}')
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class _NoMetrics(Metrics):
+    """Metrics that records nothing; the default of the clients."""
+
+    enabled = False
+
+    @contextmanager
+    def timed(self, phase, **labels):
+        yield _Probe(labels)
+
+    def event(self, phase, outcome, detail=None, **labels):
+        pass
+
+    def timed_parser(self, parse, phase="parse"):
+        return parse
+
+
+NO_METRICS = _NoMetrics()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
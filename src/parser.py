@@ -1,17 +1,85 @@
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from dataclasses import dataclass
+from enum import StrEnum
+import html
 import logging
+import re
+
+try:
+    from .lessons import parse_clock
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from lessons import parse_clock
 
 logger = logging.getLogger(__name__)
 
-def parse_available_lessons(html_content):
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _event_id_from_onclick(onclick):
+    # Expected format: "window.location.href='event.php?e=26094';"
+    event_id = ''
+    if 'event.php?e=' in onclick:
+        try:
+            event_id = onclick.split('e=')[1].split("'")[0]
+        except IndexError:
+            pass
+    return event_id
+
+def _date_key(date_context):
+    """The ISO date in a date context ('2025-12-20', 'col_2025-12-20'), or None."""
+    match = _ISO_DATE_RE.search(date_context)
+    return match.group(0) if match else None
+
+def _start_filter(start):
+    clock = parse_clock(start)
+    def matches(time_text):
+        try:
+            return parse_clock(time_text) == clock
+        except ValueError:
+            return False
+    return matches
+
+class _QueryFilter:
+    """A LessonQuery prepared for the parsers."""
+    __slots__ = ('dates', 'last', 'title', 'start', 'predicate', 'bookable_only')
+
+    def __init__(self, query):
+        self.dates = frozenset(query.dates) if query.dates is not None else None
+        # ISO dates sort like the days: the day containers after this one are not asked for
+        self.last = max(self.dates, default=None) if self.dates is not None else None
+        title = query.title
+        self.title = title if title is None or callable(title) else title.__eq__
+        start = query.start
+        self.start = start if start is None or callable(start) else _start_filter(start)
+        self.predicate = query.predicate
+        self.bookable_only = query.bookable_only
+
+    def accepts_event(self, date_context, classes):
+        """What can be decided when a wp_event starts: its date and whether it is past."""
+        if self.bookable_only and 'wp_event_past' in classes:
+            return False
+        return self.dates is None or _date_key(date_context) in self.dates
+
+    def accepts_text(self, title, time_text):
+        if self.title is not None and not self.title(title):
+            return False
+        return self.start is None or self.start(time_text)
+
+    def accepts(self, record):
+        return (self.accepts_event(record['date_context'], () if record['is_bookable'] else ('wp_event_past',))
+                and self.accepts_text(record['title'], record['time'])
+                and (self.predicate is None or self.predicate(record)))
+
+def parse_available_lessons(html_content, query=None):
     """
     Parses the weekplan HTML to find available lessons.
     
     Since we don't have the exact HTML structure yet, this is a best-effort 
     implementation that finds elements that look like lessons.
     
-    Returns a list of dictionaries with lesson info.
+    Returns a list of dictionaries with lesson info, only those matching query
+    (a lessons.LessonQuery) if given.
     """
+    from bs4 import BeautifulSoup # Only the fallback parser needs bs4, keep it out of the startup path
     soup = BeautifulSoup(html_content, 'html.parser')
     lessons = []
     
@@ -28,13 +96,7 @@ def parse_available_lessons(html_content):
     for link in links:
         # Extract onclick attribute for event ID
         onclick = link.get('onclick', '')
-        # Expected format: "window.location.href='event.php?e=26094';"
-        event_id = ''
-        if 'event.php?e=' in onclick:
-            try:
-                event_id = onclick.split('e=')[1].split("'")[0]
-            except IndexError:
-                pass
+        event_id = _event_id_from_onclick(onclick)
         
         # Extract text details
         title = link.find('div', class_='wp_text')
@@ -86,14 +148,479 @@ def parse_available_lessons(html_content):
                 'date_context': date_context
             })
             
+    if query is not None:
+        accepted = _QueryFilter(query)
+        lessons = [lesson for lesson in lessons if accepted.accepts(lesson)]
     return lessons
 
 
+# Tags without a closing tag (same set BeautifulSoup's html.parser builder uses)
+_VOID_TAGS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+    'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+])
+# Text inside these is not part of get_text()
+_HIDDEN_TEXT_TAGS = frozenset(['script', 'style', 'template'])
+
+
+def _date_container(element_id):
+    """Returns the date context an element id stands for ('collapse2025-12-20' / 'col_2025-12-20'), or None."""
+    if element_id.startswith('collapse'):
+        possible_date = element_id.replace('collapse', '')
+        if len(possible_date) >= 10:
+            return possible_date
+    if element_id.startswith('col_'):
+        return element_id
+    return None
+
+
+class _StopParsing(Exception):
+    """Raised by the stream parser once a query has everything it asked for."""
+
+
+class _OpenEvent:
+    __slots__ = ('onclick', 'classes', 'date_context', 'skip', 'title', 'time', 'title_depth', 'time_depth')
+
+    def __init__(self, onclick, classes, date_context, skip=False):
+        self.onclick = onclick
+        self.classes = classes
+        self.date_context = date_context
+        self.skip = skip # Rejected by the query: only its end is tracked
+        # Text pieces of the first wp_text / wp_date div, and the stack depth while it is open
+        self.title = None
+        self.time = None
+        self.title_depth = None
+        self.time_depth = None
+
+
+class WeekplanStreamParser(HTMLParser):
+    """
+    Event-driven, single-pass weekplan parser.
+
+    Instead of building a tree and walking up from every wp_event, it keeps a stack of
+    the open elements together with the date container ('collapse…'/'col_…') each one is in,
+    so the date of an event is known the moment it starts. Lesson records (same dicts as
+    parse_available_lessons) are appended to self.lessons as soon as their wp_event closes.
+
+    With a query (lessons.LessonQuery) events are rejected as early as possible: on their
+    date and past marker when they start, so none of their text is collected, and on title
+    and time before a record is built. With query dates, handle_starttag raises _StopParsing
+    when a day container that was not asked for starts after all requested dates were read,
+    or after the latest requested date (the page lists the days in order).
+    """
+
+    def __init__(self, query=None):
+        super().__init__(convert_charrefs=True)
+        self._filter = _QueryFilter(query) if query is not None else None
+        self._pending = None # Requested dates not read yet
+        # Stack entries: [tag, date_context, hidden_text]
+        self._stack = []
+        self._event = None
+        self._event_depth = 0
+        self._seen_ids = set()
+        self._text = [] # Text run since the last tag; may arrive in several pieces across feed() chunks
+        self.lessons = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        parent = self._stack[-1] if self._stack else None
+        parent_context = parent[1] if parent else "Unknown"
+        hidden = (parent[2] if parent else False) or tag in _HIDDEN_TEXT_TAGS
+
+        attributes = dict(attrs)
+        element_id = attributes.get('id') or ''
+        if tag == 'body':
+            # The original tree walk stops at <body>, containers above it do not count
+            context = "Unknown"
+        else:
+            container = _date_container(element_id) if element_id else None
+            if container is not None and self._filter is not None and self._filter.dates is not None:
+                self._enter_day(container)
+            context = container or parent_context
+
+        if tag == 'div':
+            classes = (attributes.get('class') or '').split()
+            event = self._event
+            if 'wp_event' in classes and event is None:
+                skip = self._filter is not None and not self._filter.accepts_event(parent_context, classes)
+                self._event = _OpenEvent(attributes.get('onclick') or '', classes, parent_context, skip)
+                self._event_depth = len(self._stack) + 1
+            elif event is not None and not event.skip:
+                if 'wp_text' in classes and event.title is None:
+                    event.title = []
+                    event.title_depth = len(self._stack) + 1
+                if 'wp_date' in classes and event.time is None:
+                    event.time = []
+                    event.time_depth = len(self._stack) + 1
+
+        if tag in _VOID_TAGS:
+            return
+        self._stack.append([tag, context, hidden])
+
+    def _enter_day(self, container):
+        day = _date_key(container)
+        if day is None:
+            return
+        dates = self._filter.dates
+        if self._pending is None:
+            self._pending = set(dates)
+        if day not in dates and (not self._pending or day > self._filter.last):
+            raise _StopParsing
+        self._pending.discard(day)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        stack = self._stack
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index][0] == tag:
+                break
+        else:
+            return # Stray closing tag, ignored like BeautifulSoup does
+        del stack[index:]
+
+        event = self._event
+        if event is None:
+            return
+        depth = len(stack)
+        if event.title_depth is not None and depth < event.title_depth:
+            event.title_depth = None
+        if event.time_depth is not None and depth < event.time_depth:
+            event.time_depth = None
+        if depth < self._event_depth:
+            self._event = None
+            self._emit(event)
+
+    def handle_data(self, data):
+        event = self._event
+        if event is None or (event.title_depth is None and event.time_depth is None):
+            return
+        if self._stack and self._stack[-1][2]:
+            return
+        self._text.append(data)
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        data = ''.join(self._text).strip()
+        self._text.clear()
+        event = self._event
+        if data:
+            if event.title_depth is not None:
+                event.title.append(data)
+            if event.time_depth is not None:
+                event.time.append(data)
+
+    def _emit(self, event):
+        if event.skip:
+            return
+        event_id = _event_id_from_onclick(event.onclick)
+        if not event_id or event_id in self._seen_ids:
+            return
+        self._seen_ids.add(event_id)
+        title = ''.join(event.title) if event.title is not None else "Unknown"
+        time_text = ''.join(event.time) if event.time is not None else "Unknown"
+        accepted = self._filter
+        if accepted is not None and not accepted.accepts_text(title, time_text):
+            return
+        record = {
+            'id': event_id,
+            'title': title,
+            'time': time_text,
+            'is_bookable': 'wp_event_past' not in event.classes,
+            'raw_onclick': event.onclick,
+            'date_context': event.date_context
+        }
+        if accepted is not None and accepted.predicate is not None and not accepted.predicate(record):
+            return
+        self.lessons.append(record)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        # Unterminated document: flush the event that is still open
+        if self._event is not None:
+            event, self._event = self._event, None
+            self._emit(event)
+
+
+_DAY_CONTAINER_ID_RE = re.compile(r"""\bid=["'](?:collapse|col_)(\d{4}-\d{2}-\d{2})["']""")
+
+
+def _day_sections(html_content, dates):
+    """
+    The part of a page that holds the day containers of dates: each from its start tag up to
+    the start tag of the next day container. None if no day containers are found.
+    """
+    starts = [(html_content.rfind('<', 0, m.start()), m.group(1)) for m in _DAY_CONTAINER_ID_RE.finditer(html_content)]
+    if not starts:
+        return None
+    ends = [start for start, _ in starts[1:]] + [len(html_content)]
+    return "".join(html_content[start:end] for (start, day), end in zip(starts, ends) if day in dates)
+
+
+def iter_lessons(html_content, chunk_size=65536, query=None):
+    """
+    Streams lesson records out of a weekplan page in a single pass.
+    html_content is either the whole page or an iterable of text chunks (e.g. httpx's iter_text()),
+    records are yielded as soon as their wp_event element has been read.
+    With a query (lessons.LessonQuery) only matching records are built, and reading stops
+    early once the requested dates are through; of a whole page (str) only the day containers
+    of the requested dates are parsed.
+    """
+    chunks = html_content
+    if isinstance(html_content, str):
+        if query is not None and query.dates is not None:
+            # Only the requested days are tokenized at all
+            sections = _day_sections(html_content, frozenset(query.dates))
+            html_content = sections if sections is not None else html_content
+        chunks = (html_content[i:i + chunk_size] for i in range(0, len(html_content), chunk_size))
+
+    parser = WeekplanStreamParser(query)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            if parser.lessons:
+                yield from parser.lessons
+                parser.lessons.clear()
+        parser.close()
+    except _StopParsing:
+        pass
+    yield from parser.lessons
+
+
+def parse_available_lessons_stream(html_content, query=None):
+    """
+    Drop-in replacement for parse_available_lessons built on the streaming parser.
+    Returns the same list of dicts without building a BeautifulSoup tree;
+    parse_available_lessons stays available as the reference/fallback implementation.
+    """
+    return list(iter_lessons(html_content, query=query))
+
+
+class CheckinState(StrEnum):
+    """What a checkin dialog (the answer to a PRE or EVBK request) says about a lesson."""
+    DEADLINE_PASSED = "deadline-passed" # Buchungsfrist beendet / Termin ist vergangen
+    NOT_OPEN = "not-open" # The booking window has not opened yet
+    BOOKABLE = "bookable" # BOOK_T offered
+    WAITLIST_OPEN = "waitlist-open" # BOOK_W offered
+    BOOKED = "booked" # We are a participant (STORN_TN offered)
+    WAITLISTED = "waitlisted" # We are (or were just put) on the waiting list
+    SUCCESS = "success" # The booking went through
+    CANCELLED = "cancelled" # A STORN went through
+    FULL = "full" # The booking was refused, no place left (ausgebucht)
+    FAILED = "failed" # Some other error message
+    UNCLEAR = "unclear" # Mentions cancelling, but offers no known action
+    UNKNOWN = "unknown"
+
+
+@dataclass(slots=True, frozen=True)
+class Checkin:
+    """A classified checkin dialog: its state and the EVBK actions it offers, in page order."""
+    state: CheckinState
+    actions: tuple = ()
+
+    @property
+    def next_action(self):
+        """The EVBK action to book with ('BOOK_T'/'BOOK_W'), or None."""
+        if self.state is CheckinState.BOOKABLE:
+            return "BOOK_T"
+        if self.state is CheckinState.WAITLIST_OPEN:
+            return "BOOK_W"
+        return None
+
+    @property
+    def storn(self):
+        """The EVBK action that cancels our place or waiting list entry (e.g. 'STORN_WT'), or None."""
+        return next((action for action in self.actions if "STORN" in action), None)
+
+    @property
+    def holds_place(self):
+        """True if we are a participant or on the waiting list (now, or by the request just answered)."""
+        return self.state in (CheckinState.BOOKED, CheckinState.WAITLISTED, CheckinState.SUCCESS)
+
+
+# The messages parse_checkin looks for, by what they tell. "ö" may come as an entity.
+_CHECKIN_MESSAGES = {
+    "Buchungsfrist beendet": "deadline",
+    "Termin ist vergangen": "deadline",
+    "Noch nicht möglich": "not_open",
+    "noch nicht möglich": "not_open",
+    "Noch nicht m&ouml;glich": "not_open",
+    "noch nicht m&ouml;glich": "not_open",
+    "Noch nicht freigegeben": "not_open",
+    "noch nicht freigegeben": "not_open",
+    "auf die Warteliste gesetzt": "waitlist_added",
+    "Sie sind auf der Warteliste": "waitlist",
+    "Sie sind Teilnehmer": "participant",
+    "Stornierung war erfolgreich": "cancelled",
+    "erfolgreich storniert": "cancelled",
+    "ausgebucht": "full",
+    "Kein freier Platz": "full",
+    "kein freier Platz": "full",
+    "erfolgreich": "success",
+    "gebucht": "success",
+    "Teilnahme am Termin": "cancel_prompt",
+    "stornieren": "cancel_verb",
+    "alert-danger": "danger",
+}
+
+# Everything parse_checkin looks for, as one alternation: the EVBK actions of the buttons
+# (ShowCheckin('EVBK','BOOK_W'), also with other quoting and whitespace), "Buchung ab <date>"
+# (window not open yet) and the messages, longest first. Every branch starts with a literal,
+# which lets the regex engine skip ahead to candidate positions instead of trying each
+# branch at every character. "gebucht" inside "ausgebucht" is consumed by the latter.
+_CHECKIN_RE = re.compile(
+    r"ShowCheckin\s*\(\s*['\"]EVBK['\"]\s*,\s*['\"]([^'\"]+)['\"]\s*\)"
+    r"|Buchung ab (\d)|"
+    + "|".join(map(re.escape, sorted(_CHECKIN_MESSAGES, key=len, reverse=True)))
+)
+
+
+def _pre_state(actions, seen, storn):
+    # A PRE dialog offers what can be done; its words describe the lesson ("ausgebucht" with
+    # BOOK_W, "bereits gebucht" by others), not a result of ours, so the actions decide.
+    if "deadline" in seen:
+        return CheckinState.DEADLINE_PASSED
+    if "waitlist" in seen or storn == "STORN_WT":
+        return CheckinState.WAITLISTED
+    if storn is not None:
+        return CheckinState.BOOKED
+    if "BOOK_T" in actions:
+        return CheckinState.BOOKABLE
+    if "BOOK_W" in actions:
+        return CheckinState.WAITLIST_OPEN
+    if "not_open" in seen:
+        return CheckinState.NOT_OPEN
+    if "cancel_prompt" in seen and "cancel_verb" in seen:
+        return CheckinState.UNCLEAR
+    return CheckinState.UNKNOWN
+
+
+def _evbk_state(actions, seen, storn):
+    # An EVBK dialog answers the request just sent: its result message decides
+    if "deadline" in seen:
+        return CheckinState.DEADLINE_PASSED
+    if "waitlist_added" in seen and "success" in seen:
+        return CheckinState.WAITLISTED
+    if "cancelled" in seen:
+        return CheckinState.CANCELLED
+    if "full" in seen:
+        return CheckinState.FULL
+    if "success" in seen:
+        return CheckinState.SUCCESS
+    if "waitlist" in seen or storn == "STORN_WT":
+        return CheckinState.WAITLISTED
+    if "participant" in seen or storn is not None:
+        return CheckinState.BOOKED
+    if "BOOK_T" in actions:
+        return CheckinState.BOOKABLE
+    if "BOOK_W" in actions:
+        return CheckinState.WAITLIST_OPEN
+    if "not_open" in seen:
+        return CheckinState.NOT_OPEN
+    if "cancel_prompt" in seen and "cancel_verb" in seen:
+        return CheckinState.UNCLEAR
+    if "danger" in seen:
+        return CheckinState.FAILED
+    return CheckinState.UNKNOWN
+
+
+def parse_checkin(response, step="EVBK"):
+    """
+    Classifies a checkin dialog in one scan over the text. step is the request it answers:
+    'PRE' (what the lesson offers; the actions take precedence over the messages) or 'EVBK'
+    (the result of a booking or cancellation; the messages take precedence).
+    Returns a Checkin; see CheckinState for the states.
+    """
+    actions = []
+    seen = set()
+    for match in _CHECKIN_RE.finditer(response):
+        action, opens = match.groups()
+        if action is not None:
+            actions.append(action)
+        elif opens is not None:
+            seen.add("not_open")
+        else:
+            seen.add(_CHECKIN_MESSAGES[match.group()])
+    storn = next((action for action in actions if "STORN" in action), None)
+    state = (_pre_state if step == "PRE" else _evbk_state)(actions, seen, storn)
+    return Checkin(state, tuple(actions))
+
+
+# The parts of an event details payload parse_participants needs: the start and end of a
+# <thead>/<tbody>, a table header cell, the first cell of a row and the end of a table
+# (behind one shared '<', so the alternatives are only tried at a tag)
+_DETAILS_RE = re.compile(
+    r"<(?:(?P<section>thead|tbody)\b[^>]*>"
+    r"|(?P<close>/thead|/tbody)>"
+    r"|th\b[^>]*>(?P<header>.*?)</th>"
+    r"|tr\b[^>]*>\s*<td\b[^>]*>(?P<cell>.*?)</td>"
+    r"|(?P<end>/table)>)",
+    re.S | re.I
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def _cell_text(fragment):
+    # Like get_text(separator=' ', strip=True): tags separate words, entities are decoded
+    return " ".join(html.unescape(_TAG_RE.sub(" ", fragment)).split())
+
+
 def parse_participants(html_content):
+    """
+    Parses the event details HTML to find participants and waiting list, in one scan over
+    the text. Tables count by the first header cell of their <thead> ("Teilnehmer ...",
+    "Warteplätze ..." / "Warteliste ..."); the name is in the first cell of each <tbody> row,
+    "(frei)" slots are skipped.
+    Returns a dict with 'participants' and 'waiting_list' (lists of strings).
+    parse_participants_soup is the BeautifulSoup reference implementation.
+    """
+    participants = []
+    waiting_list = []
+    target_list = None
+    has_header = False
+    section = None
+    for match in _DETAILS_RE.finditer(html_content):
+        kind = match.lastgroup
+        if kind == "section":
+            section = match.group("section").lower()
+        elif kind == "close":
+            section = None
+        elif kind == "header":
+            if section == "thead" and not has_header:
+                has_header = True
+                header_text = _cell_text(match.group("header")).lower()
+                if "teilnehmer" in header_text:
+                    target_list = participants
+                elif "warteplätze" in header_text or "warteliste" in header_text:
+                    target_list = waiting_list
+        elif kind == "cell":
+            if section == "tbody" and target_list is not None:
+                name_text = _cell_text(match.group("cell"))
+                if "(frei)" not in name_text:
+                    target_list.append(name_text)
+        else:
+            target_list = None
+            has_header = False
+            section = None
+
+    return {
+        "participants": participants,
+        "waiting_list": waiting_list
+    }
+
+
+def parse_participants_soup(html_content):
     """
     Parses the event details HTML to find participants and waiting list.
     Returns a dict with 'participants' and 'waiting_list' (lists of strings).
     """
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html_content, 'html.parser')
     
     participants = []
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections import namedtuple
+
+try:
+    from .booking import CHECKIN_COMMAND, booking_params, evbk_outcome, pre_params, pre_status, send_booking, storn_action
+    from .metrics import summarize
+    from .parser import CheckinState, parse_checkin
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import CHECKIN_COMMAND, booking_params, evbk_outcome, pre_params, pre_status, send_booking, storn_action
+    from metrics import summarize
+    from parser import CheckinState, parse_checkin
+
+logger = logging.getLogger(__name__)
+
+# What a BookingRace did with one candidate lesson. outcome is one of
+# 'booked', 'waitlisted', 'held' (we had a place before), 'unavailable', 'failed',
+# 'cancelled' (a preferred candidate won first), 'rolled-back', 'rollback-failed' or 'error'.
+RaceResult = namedtuple("RaceResult", ["lesson", "outcome", "status"])
+
+# Outcomes that leave a booking of ours on the lesson
+_HOLDING = ("booked", "waitlisted")
+
+
+class BookingRace:
+    """
+    Books the first available of several candidate lessons (in priority order) by running
+    PRE and EVBK for all of them at the same time, at most max_parallel at once.
+
+    A place in a candidate decides the race for everything of lower priority: their attempts
+    are cancelled unless their EVBK is already on the way, and what they booked anyway is
+    cancelled again with the STORN action of their PRE dialog. Higher priority candidates keep
+    going, and if one of them gets a place it wins instead. Waiting list entries do not decide
+    the race; those above the winner are kept, those below it are rolled back.
+    """
+
+    def __init__(self, client, candidates, loginuid, max_parallel=3):
+        self.client = client
+        self.candidates = list(candidates)
+        self.loginuid = loginuid
+        self.max_parallel = max_parallel
+        self.winner = None # Index of the best candidate we hold a place in
+        self._slots = None
+        self._tasks = []
+        self._sending = set() # Candidates whose EVBK is on the way; they are not cancelled
+
+    def _beaten(self, index):
+        return self.winner is not None and self.winner < index
+
+    def _won(self, index):
+        if self._beaten(index) or self.winner == index:
+            return
+        self.winner = index
+        for other, task in enumerate(self._tasks):
+            if other > index and other not in self._sending:
+                task.cancel()
+
+    async def _attempt(self, index, lesson):
+        cancelled = RaceResult(lesson, "cancelled", "Cancelled (preferred lesson booked)")
+        async with self._slots:
+            if self._beaten(index):
+                return cancelled
+            response = await self.client.ajax_request(CHECKIN_COMMAND, pre_params(self.loginuid, lesson.event_id))
+            checkin = parse_checkin(response, "PRE")
+            pre = pre_status(checkin)
+            if pre.booked:
+                if checkin.state is not CheckinState.WAITLISTED:
+                    self._won(index)
+                return RaceResult(lesson, "held", pre.status_msg)
+            if not pre.next_param:
+                return RaceResult(lesson, "unavailable", pre.status_msg)
+            if self._beaten(index):
+                return cancelled
+
+            self._sending.add(index)
+            response, checkin = await send_booking(self.client, self.loginuid, lesson.event_id, pre.next_param)
+            outcome = evbk_outcome(checkin)
+            self.client.metrics.event("booking", outcome, None if checkin.holds_place else summarize(response), event=lesson.event_id)
+            if not checkin.holds_place:
+                logger.warning(f"Booking response debug: {summarize(response)}")
+                return RaceResult(lesson, "failed", f"{pre.action_desc} FAILED ({outcome})")
+            if pre.next_param == "BOOK_W" or checkin.state is CheckinState.WAITLISTED:
+                return RaceResult(lesson, "waitlisted", f"{pre.action_desc} SUCCESSFUL")
+            self._won(index)
+            return RaceResult(lesson, "booked", f"{pre.action_desc} SUCCESSFUL")
+
+    async def _roll_back(self, result):
+        """Cancels a booking made by the race with the STORN action its PRE dialog offers."""
+        eid = result.lesson.event_id
+        try:
+            action = storn_action(await self.client.ajax_request(CHECKIN_COMMAND, pre_params(self.loginuid, eid)))
+            if action is None:
+                return RaceResult(result.lesson, "rollback-failed", f"{result.status}, no cancel action offered")
+            response = await self.client.ajax_request(CHECKIN_COMMAND, booking_params(self.loginuid, eid, action))
+        except Exception as e:
+            return RaceResult(result.lesson, "rollback-failed", f"{result.status}, cancelling failed: {e}")
+        if parse_checkin(response).state not in (CheckinState.CANCELLED, CheckinState.SUCCESS):
+            logger.warning(f"Cancel response debug: {summarize(response)}")
+            return RaceResult(result.lesson, "rollback-failed", f"{result.status}, cancelling failed")
+        self.client.metrics.event("booking", "rolled-back", event=eid)
+        return RaceResult(result.lesson, "rolled-back", f"{result.status}, cancelled again ({action})")
+
+    async def run(self):
+        """Runs the race. Returns a RaceResult per candidate, in candidate order."""
+        self._slots = asyncio.Semaphore(self.max_parallel)
+        self._tasks = [asyncio.ensure_future(self._attempt(i, lesson)) for i, lesson in enumerate(self.candidates)]
+        try:
+            outcomes = await asyncio.gather(*self._tasks, return_exceptions=True)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+        results = []
+        for lesson, outcome in zip(self.candidates, outcomes):
+            if isinstance(outcome, asyncio.CancelledError):
+                outcome = RaceResult(lesson, "cancelled", "Cancelled (preferred lesson booked)")
+            elif isinstance(outcome, Exception):
+                outcome = RaceResult(lesson, "error", str(outcome))
+            results.append(outcome)
+
+        # Lower priority bookings that went through before (or while) the winner was decided
+        losers = [i for i, result in enumerate(results) if self._beaten(i) and result.outcome in _HOLDING]
+        rolled_back = await asyncio.gather(*(self._roll_back(results[i]) for i in losers))
+        for i, result in zip(losers, rolled_back):
+            results[i] = result
+        return results
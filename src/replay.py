@@ -0,0 +1,219 @@
+import asyncio
+import base64
+import gzip
+import json
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+
+import httpx
+
+ARCHIVE_VERSION = 1
+
+# Never written to an archive, and not part of the replay key: the password and the
+# session id the login form reflects
+REDACTED_FIELDS = ("loginpwd", "loginsid")
+
+# The session id in Set-Cookie response headers, written as PHPSESSID=***
+_SESSION_COOKIE_RE = re.compile(r"(PHPSESSID=)[^;]*", re.I)
+
+# Headers that describe the wire encoding; the archive stores decoded bodies
+_ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class ReplayMissError(httpx.TransportError):
+    """The replayed archive has no response for a request."""
+
+
+def _form(request):
+    """The urlencoded body of request as a dict, with the JSON 'params' of ajax.php decoded."""
+    if not request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+        return None
+    form = {}
+    for name, value in parse_qsl(request.content.decode(), keep_blank_values=True):
+        if name in REDACTED_FIELDS:
+            value = "***"
+        elif name == "params":
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        form[name] = value
+    return form
+
+
+def _describe(request):
+    return {
+        "method": request.method,
+        "path": request.url.path,
+        "query": sorted(request.url.params.multi_items()),
+        "form": _form(request),
+    }
+
+
+def _key(description):
+    # Query and form are order independent; 'params' compares as decoded JSON
+    query = [list(item) for item in description["query"]]
+    return json.dumps([description["method"], description["path"], sorted(query), description["form"]], sort_keys=True)
+
+
+def _header_record(name, value):
+    if name.lower() == "set-cookie":
+        value = _SESSION_COOKIE_RE.sub(r"\1***", value)
+    return [name, value]
+
+
+def _response_record(response, body, elapsed):
+    headers = [_header_record(name, value) for name, value in response.headers.multi_items() if name.lower() not in _ENCODING_HEADERS]
+    record = {"status": response.status_code, "headers": headers, "elapsed": round(elapsed, 6)}
+    try:
+        record["body"] = body.decode("utf-8")
+    except UnicodeDecodeError:
+        record["body_b64"] = base64.b64encode(body).decode()
+    return record
+
+
+class ExchangeRecorder:
+    """
+    Writes request/response exchanges to a compact archive: gzip compressed JSON lines, a
+    header line followed by one line per exchange. Each exchange is flushed right away, so a
+    run that crashes still leaves a usable archive. Passwords and session ids are never written.
+    """
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.started_at = clock()
+        self.exchanges = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": ARCHIVE_VERSION, "recorded_at": self.started_at})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def record(self, request, response, body, elapsed):
+        with self._lock:
+            self.exchanges += 1
+            self._write({"at": round(self.clock() - self.started_at, 6), "request": _describe(request),
+                         "response": _response_record(response, body, elapsed)})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Passes requests to the inner transport (sync or async) and records every exchange with
+    an ExchangeRecorder. Without one, a connection pool with httpx's default limits is
+    created; pass the pool the client would use (client.async_transport) to record what
+    runs in production.
+    """
+
+    def __init__(self, recorder, transport=None):
+        self.recorder = recorder
+        self.transport = transport
+
+    def _received(self, request, response, body, elapsed):
+        self.recorder.record(request, response, body, elapsed)
+        headers = [(name, value) for name, value in response.headers.multi_items() if name.lower() not in _ENCODING_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request, extensions=response.extensions)
+
+    def handle_request(self, request):
+        if self.transport is None:
+            self.transport = httpx.HTTPTransport()
+        start = time.perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        return self._received(request, response, body, time.perf_counter() - start)
+
+    async def handle_async_request(self, request):
+        if self.transport is None:
+            self.transport = httpx.AsyncHTTPTransport()
+        start = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            body = await response.aread()
+        finally:
+            await response.aclose()
+        return self._received(request, response, body, time.perf_counter() - start)
+
+    def close(self):
+        if isinstance(self.transport, httpx.BaseTransport):
+            self.transport.close()
+
+    async def aclose(self):
+        if isinstance(self.transport, httpx.AsyncBaseTransport):
+            await self.transport.aclose()
+
+
+class Archive:
+    """A recorded archive in memory, with the responses queued per request."""
+
+    def __init__(self, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != ARCHIVE_VERSION:
+                raise ValueError(f"{path}: unsupported archive version {header.get('version')}")
+            self.recorded_at = header["recorded_at"]
+            self.exchanges = [json.loads(line) for line in f if line.strip()]
+
+        self.responses = {}
+        for exchange in self.exchanges:
+            self.responses.setdefault(_key(exchange["request"]), []).append(exchange["response"])
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Answers requests from an Archive without touching the network. Requests are matched on
+    method, path, query and form fields (the JSON 'params' of ajax.php decoded, the password
+    ignored), so e.g. a PRE before and one after a booking get their own recorded answers.
+    Identical requests get the recorded responses in order, the last one repeats.
+
+    With realtime each response is delayed by its recorded latency; otherwise replay runs
+    as fast as the client can consume it.
+    """
+
+    def __init__(self, archive, realtime=False):
+        self.archive = archive
+        self.realtime = realtime
+        self.served = 0
+        self._queues = {key: deque(responses) for key, responses in archive.responses.items()}
+        self._lock = threading.Lock()
+
+    def _next(self, request):
+        key = _key(_describe(request))
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                raise ReplayMissError(f"No recorded response for {request.method} {request.url}", request=request)
+            record = queue.popleft() if len(queue) > 1 else queue[0]
+            self.served += 1
+        return record
+
+    @staticmethod
+    def _response(request, record):
+        body = base64.b64decode(record["body_b64"]) if "body_b64" in record else record["body"].encode("utf-8")
+        return httpx.Response(record["status"], headers=record["headers"], content=body, request=request)
+
+    def handle_request(self, request):
+        request.read()
+        record = self._next(request)
+        if self.realtime:
+            time.sleep(record["elapsed"])
+        return self._response(request, record)
+
+    async def handle_async_request(self, request):
+        await request.aread()
+        record = self._next(request)
+        if self.realtime:
+            await asyncio.sleep(record["elapsed"])
+        return self._response(request, record)
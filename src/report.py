@@ -0,0 +1,47 @@
+import json
+import sys
+import time
+
+
+def _error_text(error):
+    if error is None or isinstance(error, str):
+        return error
+    return f"{type(error).__name__}: {error}"
+
+
+class NdjsonReport:
+    """
+    Machine readable run output: one JSON object per line, written and flushed the moment
+    something is decided, so a consumer can react to a booking while the run goes on.
+
+    Every record has 'kind' and 'ts' (epoch seconds). 'lesson' records describe an evaluated
+    lesson (event, date, title, start, action, outcome, status, latency_ms, error),
+    'participants' records the lists fetched with --status, and 'watch' records the status
+    changes seen by --watch. Errors are reported as 'Type: message' strings.
+    """
+
+    def __init__(self, stream=None, clock=time.time):
+        self.stream = stream if stream is not None else sys.stdout
+        self.clock = clock
+
+    def write(self, kind, **fields):
+        record = {"kind": kind, "ts": round(self.clock(), 3)}
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+    def lesson(self, lesson, outcome, status, action=None, latency=None, error=None, **fields):
+        """A decided lesson. outcome is a short keyword ('success', 'available', 'full', ...), status the table text."""
+        self.write(
+            "lesson", event=lesson.event_id, date=lesson.date.isoformat() if lesson.date else None, title=lesson.title,
+            start=lesson.start.strftime("%H:%M") if lesson.start else None, action=action, outcome=outcome, status=status,
+            latency_ms=round(latency * 1000, 1) if latency is not None else None, error=_error_text(error), **fields
+        )
+
+    def missing(self, day, outcome, error=None, **fields):
+        """A target date without an evaluated lesson: 'not-found', or 'error' when the week failed."""
+        self.write("lesson", date=day.isoformat(), outcome=outcome, error=_error_text(error), **fields)
+
+    def participants(self, event_id, day, participants, waiting_list, error=None, **fields):
+        self.write("participants", event=event_id, date=day.isoformat() if day else None, participants=participants,
+                   waiting_list=waiting_list, error=_error_text(error), **fields)
@@ -0,0 +1,207 @@
+import asyncio
+import email.utils
+import httpx
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Time budget of one operation in seconds, all its attempts (and waits) included, by the
+# metrics phase of the request. A booking must not stall on a hung socket: if it has not
+# been answered within its budget the caller (e.g. the Sniper) is better off sending it
+# again. Status lookups are nobody's race and may take their time.
+DEADLINES = {
+    "checkin.evbk": 4.0,
+    "checkin.pre": 8.0,
+    "ping": 5.0,
+    "login.start": 10.0,
+    "login": 15.0,
+    "resume": 10.0,
+    "weekplan": 15.0,
+    "event": 15.0,
+    "details": 30.0,
+}
+DEFAULT_DEADLINE = 15.0
+
+# Reads that change nothing on the server, so a failed attempt may be sent again. PRE and
+# the event details are POSTs, but only show dialogs. EVBK and the login are never repeated
+# here; pings are timing samples and must not hide a slow round trip behind a retry.
+IDEMPOTENT_PHASES = frozenset(["login.start", "resume", "weekplan", "event", "checkin.pre", "details"])
+
+# Answers of an overloaded server: retried (reads only) and counted by the circuit breaker
+OVERLOAD_STATUSES = frozenset([429, 502, 503, 504])
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """An operation did not finish within its deadline."""
+
+
+class CircuitOpenError(httpx.TransportError):
+    """The circuit breaker is open for longer than the operation's deadline allows to wait."""
+
+
+def _retry_after(response):
+    """Seconds of a Retry-After header (delta or HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Backs off from an overloaded server. After threshold consecutive failures (transport
+    errors, timeouts, overload statuses) the circuit opens for cooldown seconds, in which
+    requests wait instead of adding to the load (or fail right away if their deadline ends
+    first). Afterwards requests go out again: a success closes the circuit, another failure
+    opens it for twice as long, up to max_cooldown.
+
+    The breaker guards the server, not a client: the clients of several accounts share one.
+    """
+
+    def __init__(self, threshold=5, cooldown=1.0, max_cooldown=30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened = 0
+        self._open_until = 0.0
+        self._next_cooldown = cooldown
+
+    def wait_time(self):
+        """Seconds until requests may be sent again (0 while closed)."""
+        return max(0.0, self._open_until - self.clock())
+
+    def success(self):
+        self.failures = 0
+        self._next_cooldown = self.cooldown
+
+    def failure(self):
+        self.failures += 1
+        now = self.clock()
+        # Requests that were in flight when it opened do not extend the cooldown
+        if self.failures >= self.threshold and now >= self._open_until:
+            self._open_until = now + self._next_cooldown
+            self.opened += 1
+            logger.warning(f"Server overloaded ({self.failures} failures in a row), backing off for {self._next_cooldown:.1f}s")
+            self._next_cooldown = min(self._next_cooldown * 2, self.max_cooldown)
+
+
+class RequestPolicy:
+    """
+    Deadlines, retries and circuit breaking for the requests of a client.
+
+    Every operation gets the deadline of its phase (DEADLINES); each attempt is sent with
+    the remaining time as timeout and, in the async client, cancelled when the deadline
+    passes, so no request can hang longer than its budget. Idempotent reads that fail with
+    a transport error or an overload status are retried with exponential backoff and full
+    jitter (honoring Retry-After), as long as the deadline leaves time for it; anything else
+    is attempted once. All attempts go through the CircuitBreaker.
+
+    send(timeout) sends one attempt and returns the response; responses with other error
+    statuses are returned for the caller's raise_for_status().
+    """
+
+    def __init__(self, deadlines=None, retries=3, backoff=0.25, max_backoff=4.0, breaker=None,
+                 clock=time.monotonic, random=random.random):
+        self.deadlines = dict(DEADLINES, **(deadlines or {}))
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker if breaker is not None else CircuitBreaker(clock=clock)
+        self.clock = clock
+        self.random = random
+        self.retried = 0
+
+    def deadline(self, phase):
+        return self.deadlines.get(phase, DEFAULT_DEADLINE)
+
+    def _delay(self, attempt, response):
+        delay = self.random() * min(self.max_backoff, self.backoff * 2 ** attempt)
+        retry_after = _retry_after(response)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _breaker_wait(self, phase, deadline):
+        """Seconds to wait for the breaker; raises CircuitOpenError if that outlasts the deadline."""
+        wait = self.breaker.wait_time()
+        if wait and self.clock() + wait >= deadline:
+            raise CircuitOpenError(f"{phase}: server overloaded, backing off for {wait:.1f}s")
+        return wait
+
+    def _remaining(self, phase, deadline):
+        remaining = deadline - self.clock()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{phase}: deadline of {self.deadline(phase):.0f}s used up")
+        return remaining
+
+    def _outcome(self, phase, deadline, attempt, response=None, error=None):
+        """
+        Books the result of an attempt with the breaker. Returns the seconds to wait before
+        the next attempt, or None if the result (response or error) is final.
+        """
+        if error is None and response.status_code not in OVERLOAD_STATUSES:
+            self.breaker.success()
+            return None
+        self.breaker.failure()
+        if phase not in IDEMPOTENT_PHASES or attempt >= self.retries:
+            return None
+        delay = self._delay(attempt, response)
+        if self.clock() + delay >= deadline:
+            return None
+        self.retried += 1
+        reason = f"{type(error).__name__}: {error}" if error is not None else f"HTTP {response.status_code}"
+        logger.info(f"{phase}: {reason}, retrying in {delay:.2f}s (attempt {attempt + 2})")
+        return delay
+
+    async def acall(self, phase, send):
+        deadline = self.clock() + self.deadline(phase)
+        attempt = 0
+        while True:
+            wait = self._breaker_wait(phase, deadline)
+            if wait:
+                await asyncio.sleep(wait)
+            remaining = self._remaining(phase, deadline)
+            response = error = None
+            try:
+                async with asyncio.timeout(remaining):
+                    response = await send(remaining)
+            except TimeoutError:
+                error = DeadlineExceeded(f"{phase}: no answer within the {self.deadline(phase):.0f}s deadline")
+            except httpx.TransportError as e:
+                error = e
+            delay = self._outcome(phase, deadline, attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def call(self, phase, send):
+        """Synchronous acall. Each attempt is bounded by httpx's timeouts only (per connect/read)."""
+        deadline = self.clock() + self.deadline(phase)
+        attempt = 0
+        while True:
+            wait = self._breaker_wait(phase, deadline)
+            if wait:
+                time.sleep(wait)
+            remaining = self._remaining(phase, deadline)
+            response = error = None
+            try:
+                response = send(remaining)
+            except httpx.TransportError as e:
+                error = e
+            delay = self._outcome(phase, deadline, attempt, response, error)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,216 @@
+import json
+import re
+import tomllib
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import time, timedelta
+
+try:
+    from .booking import DEFAULT_TIME, DEFAULT_TITLE, week_offset
+    from .lessons import LessonQuery, parse_clock
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import DEFAULT_TIME, DEFAULT_TITLE, week_offset
+    from lessons import LessonQuery, parse_clock
+
+WEEKDAYS = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Lessons closer than this are not targeted by default (the next two weeks are usually booked out)
+DEFAULT_MIN_DAYS = 15
+# ... and lessons further ahead than this are not on the weekplan yet
+DEFAULT_HORIZON = 42
+
+# A lesson selected by a rule
+Match = namedtuple("Match", ["rule", "lesson"])
+
+
+@dataclass(slots=True, frozen=True)
+class Rule:
+    """
+    What to book: lessons on one of weekdays, starting in [earliest, latest], whose title
+    matches the title regular expression, between min_days and horizon days from today.
+    Lower priority values are tried first when several rules match on the same date.
+    """
+    title: re.Pattern
+    weekdays: frozenset
+    earliest: time
+    latest: time
+    priority: int = 0
+    min_days: int = DEFAULT_MIN_DAYS
+    horizon: int = DEFAULT_HORIZON
+    name: str = ""
+
+    def dates(self, today):
+        """The dates this rule targets, counted from today."""
+        days = (today + timedelta(days=n) for n in range(self.min_days, self.horizon + 1))
+        return [day for day in days if day.weekday() in self.weekdays]
+
+    def describe(self):
+        days = ",".join(WEEKDAY_NAMES[d] for d in sorted(self.weekdays))
+        times = self.earliest.strftime("%H:%M")
+        if self.latest != self.earliest:
+            times += "-" + self.latest.strftime("%H:%M")
+        return self.name or f"'{self.title.pattern}' {days} {times}"
+
+
+def default_rules():
+    """The built-in target: 'Dressur Standard' at 09:00 on Saturdays."""
+    start = parse_clock(DEFAULT_TIME)
+    return [Rule(re.compile(re.escape(DEFAULT_TITLE)), frozenset([5]), start, start, name=f"'{DEFAULT_TITLE}' Sat {DEFAULT_TIME}")]
+
+
+def _weekdays(value, where):
+    if isinstance(value, (str, int)):
+        value = [value]
+    days = set()
+    for day in value or ():
+        if isinstance(day, int) and 0 <= day <= 6:
+            days.add(day)
+        elif isinstance(day, str) and day[:3].lower() in WEEKDAYS:
+            days.add(WEEKDAYS[day[:3].lower()])
+        else:
+            raise ValueError(f"{where}: invalid weekday {day!r}, use Mon..Sun or 0..6")
+    if not days:
+        raise ValueError(f"{where}: no weekdays")
+    return frozenset(days)
+
+
+def _rule(entry, where):
+    try:
+        title = re.compile(entry.get("title", re.escape(DEFAULT_TITLE)))
+    except re.error as e:
+        raise ValueError(f"{where}: invalid title pattern: {e}")
+
+    try:
+        if "time" in entry:
+            earliest = latest = parse_clock(entry["time"])
+        else:
+            earliest = parse_clock(entry.get("earliest", "00:00"))
+            latest = parse_clock(entry.get("latest", "23:59"))
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: invalid time, use HH:MM")
+    if latest < earliest:
+        raise ValueError(f"{where}: latest is before earliest")
+
+    try:
+        priority = int(entry.get("priority", 0))
+        min_days = int(entry.get("min_days", DEFAULT_MIN_DAYS))
+        horizon = int(entry.get("horizon", DEFAULT_HORIZON))
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: priority, min_days and horizon must be numbers")
+    if not 0 <= min_days <= horizon:
+        raise ValueError(f"{where}: need 0 <= min_days <= horizon")
+
+    return Rule(title, _weekdays(entry.get("weekdays", entry.get("weekday")), where),
+                earliest, latest, priority, min_days, horizon, entry.get("name", ""))
+
+
+def load_rules(path):
+    """
+    Reads booking rules from a TOML or JSON file:
+
+        [[rule]]
+        name = "Dressur"                # optional, used in the output
+        title = "Dressur (Standard|Basis)"  # regular expression, searched in the lesson title
+        weekdays = ["Sat", "Sun"]       # Mon..Sun or 0..6
+        time = "09:00"                  # exact start, or: earliest = "09:00", latest = "11:00"
+        priority = 0                    # optional, lower is tried first on the same date
+        min_days = 15                   # optional, first day targeted, counted from today
+        horizon = 42                    # optional, last day targeted
+
+    JSON files use the same keys: {"rule": [{...}, ...]}.
+    Raises ValueError with a readable message on invalid entries.
+    """
+    with open(path, "rb") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+        else:
+            data = tomllib.load(f)
+
+    entries = data.get("rule") if isinstance(data, dict) else None
+    if not entries:
+        raise ValueError(f"{path}: no [[rule]] entries found")
+    return [_rule(entry, f"{path}: rule {number}") for number, entry in enumerate(entries, 1)]
+
+
+class RuleMatcher:
+    """
+    All rules compiled into one matcher.
+
+    targets() maps every date any rule is interested in to the rules for that date, by_week()
+    groups that by the week offsets that have to be fetched (each at most once), and match()
+    evaluates all rules in a single pass over a week's lessons: a lesson is only compared with
+    the rules for its date, and every distinct title is run through the patterns once.
+    """
+
+    def __init__(self, rules):
+        # Stable sort: equal priorities keep file order
+        self.rules = sorted(rules, key=lambda rule: rule.priority)
+        self._title_hits = {}
+
+    def targets(self, today, only=None):
+        """
+        {date: [rules]} for all targeted dates, in priority order.
+        With only (a date), every rule is applied to that date regardless of weekday and window.
+        """
+        if only is not None:
+            return {only: list(self.rules)}
+        targets = {}
+        for rule in self.rules:
+            for day in rule.dates(today):
+                targets.setdefault(day, []).append(rule)
+        return dict(sorted(targets.items()))
+
+    @staticmethod
+    def by_week(targets, today):
+        """
+        Splits targets by week offset: {week_offset: {date: [rules]}}, ordered by week.
+        The keys are the minimal set of weekplan pages to fetch.
+        """
+        weeks = {}
+        for day, rules in targets.items():
+            weeks.setdefault(week_offset(day, today), {})[day] = rules
+        return dict(sorted(weeks.items()))
+
+    def _rules_for_title(self, title):
+        hits = self._title_hits.get(title)
+        if hits is None:
+            hits = self._title_hits[title] = frozenset(rule for rule in self.rules if rule.title.search(title))
+        return hits
+
+    def query(self, targets):
+        """
+        LessonQuery for the weekplan parser that only lets through lessons some rule of targets
+        can match: on a target date, with a matching title and a start inside a rule window.
+        """
+        rules = frozenset(rule for day_rules in targets.values() for rule in day_rules)
+        windows = sorted({(rule.earliest, rule.latest) for rule in rules})
+
+        def title(text):
+            return not self._rules_for_title(text).isdisjoint(rules)
+
+        def start(time_text):
+            try:
+                clock = parse_clock(time_text)
+            except ValueError:
+                return False
+            return any(earliest <= clock <= latest for earliest, latest in windows)
+
+        return LessonQuery(frozenset(day.isoformat() for day in targets), title, start)
+
+    def match(self, lessons, targets):
+        """
+        Matches of all rules among lessons (an iterable of Lesson, e.g. a LessonIndex),
+        ordered by date, rule priority and start time.
+        """
+        matches = []
+        for lesson in lessons:
+            rules = targets.get(lesson.date)
+            if not rules or lesson.start is None:
+                continue
+            by_title = self._rules_for_title(lesson.title)
+            for rule in rules:
+                if rule in by_title and rule.earliest <= lesson.start <= rule.latest:
+                    matches.append(Match(rule, lesson))
+        matches.sort(key=lambda m: (m.lesson.date, m.rule.priority, m.lesson.start))
+        return matches
@@ -0,0 +1,486 @@
+import asyncio
+import functools
+import logging
+import sys
+import time
+
+try:
+    from .booking import CHECKIN_COMMAND, DEFAULT_TIME, DEFAULT_TITLE, check_pre, evbk_outcome, pre_params, send_booking, week_offset
+    from .cache import AsyncWeekplanCache
+    from .client import AsyncReitbuchClient, SharedConnectionPool, async_transport, calibration_time, extract_loginuid
+    from .lessons import LessonQuery, index_parser, parse_clock
+    from .metrics import NO_METRICS, summarize
+    from .parser import parse_available_lessons, parse_available_lessons_stream
+    from .race import BookingRace
+    from .replay import RecordingTransport, ReplayTransport
+    from .retry import RequestPolicy
+    from .session import SessionStore
+    from .snipe import Sniper, format_attempts
+    from .status import fetch_statuses
+    from .watch import Watcher
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import CHECKIN_COMMAND, DEFAULT_TIME, DEFAULT_TITLE, check_pre, evbk_outcome, pre_params, send_booking, week_offset
+    from cache import AsyncWeekplanCache
+    from client import AsyncReitbuchClient, SharedConnectionPool, async_transport, calibration_time, extract_loginuid
+    from lessons import LessonQuery, index_parser, parse_clock
+    from metrics import NO_METRICS, summarize
+    from parser import parse_available_lessons, parse_available_lessons_stream
+    from race import BookingRace
+    from replay import RecordingTransport, ReplayTransport
+    from retry import RequestPolicy
+    from session import SessionStore
+    from snipe import Sniper, format_attempts
+    from status import fetch_statuses
+    from watch import Watcher
+
+# The network side of main(): everything after the arguments are checked. main.py imports
+# this module (and with it httpx and asyncio) only once a run is really going to happen.
+logger = logging.getLogger(__name__)
+
+# Lead time calibrate() needs besides its pauses: the pings' round trips and some slack
+SNIPE_CALIBRATION_MARGIN = 2.0
+
+def row(date_str, eid, status_msg):
+    return f"{date_str:<15} | {eid:<10} | {status_msg:<30}"
+
+def print_header():
+    print("-" * 60)
+    print(f"{'Date':<15} | {'Lesson ID':<10} | {'Status':<30}")
+    print("-" * 60)
+
+def session_loginuid(client, html):
+    """
+    The loginuid for AJAX requests. It is known from login/session resume; otherwise it is
+    searched in html once and remembered, not again for every lesson and week. html must be
+    a page fetched with client's own session (never the shared weekplan of --batch).
+    """
+    if not client.loginuid:
+        client.loginuid = extract_loginuid(html)
+    return client.loginuid or "0"
+
+def weekplan_parser(args, metrics=NO_METRICS, history=None, query=None):
+    """
+    html -> LessonIndex, with the parser chosen by --parser. Parse times go to metrics,
+    and with a HistoryStore every parsed page is recorded. A LessonQuery is pushed down into
+    the parser so only the lessons asked for are built; the history needs all of them.
+    """
+    parse = parse_available_lessons if args.parser == 'soup' else parse_available_lessons_stream
+    if query is not None and history is None:
+        parse = functools.partial(parse, query=query)
+    parse = index_parser(metrics.timed_parser(parse))
+    return history.recording_parser(parse) if history is not None else parse
+
+def report_lesson(args, lesson, outcome, status, **fields):
+    """--output ndjson: writes the record of a lesson the moment its status is decided."""
+    if args.report is not None:
+        args.report.lesson(lesson, outcome, status, **fields)
+
+def report_missing(args, day, outcome, error=None, **fields):
+    if args.report is not None:
+        args.report.missing(day, outcome, error, **fields)
+
+async def evaluate_lesson(client, weekplans, week_diff, lesson, loginuid, date_str, args, account=None):
+    """
+    Runs PRE for one lesson and books it with --book. Returns the output lines and whether
+    we hold a place in the lesson afterwards.
+    """
+    lines = []
+    eid = lesson.event_id
+    status_msg = "Unknown"
+    booked = False
+    action = None
+    outcome = "unknown"
+    started = time.perf_counter()
+
+    if not lesson.is_bookable:
+         status_msg = "Full / Deadline passed"
+         outcome = "full"
+    else:
+         # It's technically bookable, check details via PRE
+         response_pre = await client.ajax_request(CHECKIN_COMMAND, pre_params(loginuid, eid))
+         pre = check_pre(response_pre)
+         status_msg = pre.status_msg
+         outcome = "unavailable"
+         if pre.booked:
+              lines.append(row(date_str, eid, status_msg))
+              report_lesson(args, lesson, "held", status_msg, latency=time.perf_counter() - started, account=account)
+              return lines, True
+
+         # Proceed with booking if available
+         if pre.next_param:
+              action = pre.next_param
+              if args.book:
+                  response_evbk, checkin = await send_booking(client, loginuid, eid, pre.next_param)
+                  # The booking changed the week's page
+                  weekplans.invalidate(week_diff)
+                  outcome = evbk_outcome(checkin)
+                  client.metrics.event("booking", outcome, None if checkin.holds_place else summarize(response_evbk), event=eid)
+                  if checkin.holds_place:
+                      status_msg = f"{pre.action_desc} SUCCESSFUL"
+                      booked = True
+                  else:
+                      status_msg = f"{pre.action_desc} FAILED (See log)"
+                      logger.warning(f"Booking response debug: {summarize(response_evbk)}")
+              else:
+                  status_msg += " - Dry Run"
+                  outcome = "available"
+
+    lines.append(row(date_str, eid, status_msg))
+    report_lesson(args, lesson, outcome, status_msg, action=action, latency=time.perf_counter() - started, account=account)
+    return lines, booked
+
+async def check_date(client, weekplans, target_date, today, args, semaphore, title=DEFAULT_TITLE, start=DEFAULT_TIME, account=None):
+    """
+    Fetches the week containing target_date and evaluates (and optionally books)
+    the lessons titled title starting at start on that date. Returns the output lines for
+    this date (so the caller can print them in date order even though all dates are
+    processed concurrently) and the evaluated lessons.
+    """
+    date_str = target_date.strftime("%d.%m.%Y")
+    lines = []
+
+    week_diff = week_offset(target_date, today)
+
+    async with semaphore:
+        try:
+            # Several target dates in the same week share one fetch + parse
+            lessons = await weekplans.get_lessons(week_diff)
+
+            target_lessons = lessons.find(day=target_date, title=title, start=start)
+
+            if not target_lessons:
+                lines.append(row(date_str, '-', 'Not found'))
+                report_missing(args, target_date, "not-found", account=account)
+                return lines, []
+
+            # The weekplan may come from another account's session: only our own loginuid will do
+            loginuid = client.loginuid
+            for tl in target_lessons:
+                # Continue with the other lessons even if one was booked
+                lesson_lines, _ = await evaluate_lesson(client, weekplans, week_diff, tl, loginuid, date_str, args, account)
+                lines.extend(lesson_lines)
+
+        except Exception as e:
+            lines.append(row(date_str, 'ERROR', str(e)))
+            report_missing(args, target_date, "error", e, account=account)
+            return lines, []
+
+    return lines, target_lessons
+
+async def race_date(client, weekplans, week_diff, matches, loginuid, date_str, args):
+    """--race: books all matches of a date at once, keeping the best place. Returns the output lines."""
+    started = time.perf_counter()
+    try:
+        results = await BookingRace(client, [match.lesson for match in matches], loginuid, args.race_max).run()
+    except Exception as e:
+        report_missing(args, matches[0].lesson.date, "error", e)
+        return [row(date_str, 'ERROR', str(e))]
+    if any(result.outcome not in ("held", "unavailable", "cancelled") for result in results):
+        # Something was booked (or cancelled again): the week's page changed
+        weekplans.invalidate(week_diff)
+    for result in results:
+        report_lesson(args, result.lesson, result.outcome, result.status, latency=time.perf_counter() - started)
+    return [row(date_str, result.lesson.event_id, result.status) for result in results]
+
+async def check_week(client, weekplans, week_diff, matcher, targets, args, semaphore):
+    """
+    Evaluates all rules against one week; targets holds the {date: [rules]} of that week.
+    The page is fetched and parsed once and the matcher selects the lessons for every
+    target date of the week in one pass. On each date the matches are tried in priority
+    order; once we hold a place, the remaining (lower priority) matches are skipped.
+    Returns the output lines of the week's target dates, in date order, and the evaluated lessons.
+    """
+    lines = []
+    evaluated = []
+    async with semaphore:
+        try:
+            html = await weekplans.get_html(week_diff)
+            lessons = await weekplans.get_lessons(week_diff)
+        except Exception as e:
+            for day in targets:
+                report_missing(args, day, "error", e)
+            return [row(day.strftime("%d.%m.%Y"), 'ERROR', str(e)) for day in targets], []
+
+        by_date = {day: [] for day in targets}
+        for match in matcher.match(lessons, targets):
+            by_date[match.lesson.date].append(match)
+
+        loginuid = session_loginuid(client, html)
+        for day, matches in by_date.items():
+            date_str = day.strftime("%d.%m.%Y")
+            if not matches:
+                lines.append(row(date_str, '-', 'Not found'))
+                report_missing(args, day, "not-found")
+                continue
+            if args.book and args.race and len(matches) > 1:
+                lines.extend(await race_date(client, weekplans, week_diff, matches, loginuid, date_str, args))
+                evaluated.extend(match.lesson for match in matches)
+                continue
+            have_place = False
+            for match in matches:
+                if have_place:
+                    status = f"Skipped ({match.rule.describe()}, already booked this day)"
+                    lines.append(row(date_str, match.lesson.event_id, status))
+                    report_lesson(args, match.lesson, "skipped", status, rule=match.rule.name)
+                    continue
+                try:
+                    lesson_lines, have_place = await evaluate_lesson(client, weekplans, week_diff, match.lesson, loginuid, date_str, args)
+                    lines.extend(lesson_lines)
+                    evaluated.append(match.lesson)
+                except Exception as e:
+                    lines.append(row(date_str, 'ERROR', str(e)))
+                    report_lesson(args, match.lesson, "error", str(e), error=e)
+    return lines, evaluated
+
+async def print_status(client, lessons, concurrency, history=None, report=None, account=None):
+    """
+    --status: participants and waiting lists of lessons, printed (or written as NDJSON records
+    to report) as each one arrives, and recorded in history.
+    """
+    if not lessons:
+        return
+    days = {lesson.event_id: lesson.date for lesson in lessons}
+    if report is None:
+        print("\nParticipants / waiting lists:")
+    async for status in fetch_statuses(client, list(days), client.loginuid or "0", concurrency):
+        if history is not None and status.error is None:
+            history.record_participants(status.event_id, status.participants, status.waiting_list)
+        if report is not None:
+            report.participants(status.event_id, days[status.event_id], status.participants, status.waiting_list, status.error, account=account)
+            continue
+        print(row(days[status.event_id].strftime("%d.%m.%Y"), status.event_id, "Status"))
+        if status.error is not None:
+            print(f"   Error fetching status: {status.error}")
+            continue
+        if status.participants:
+            print(f"   Participants: {', '.join(status.participants)}")
+        else:
+            print("   Participants: (None found or parsing failed)")
+        if status.waiting_list:
+            print(f"   Waiting List: {', '.join(status.waiting_list)}")
+
+def print_fill_advice(history, lessons, window_days):
+    """--history: how fast the evaluated kinds of lessons filled up so far, and how to book them."""
+    kinds = dict.fromkeys((lesson.title, lesson.start) for lesson in lessons)
+    if not kinds:
+        return
+    # Imported here, runs without --history do not need sqlite3
+    try:
+        from .history import fill_advice
+    except ImportError: # Running as a script from src/ (python src/main.py)
+        from history import fill_advice
+    print("\nHistory:")
+    for title, start in kinds:
+        stats = history.fill_stats(title, start, window_days=window_days)
+        print(f"   {title} {start.strftime('%H:%M') if start else ''}: {fill_advice(stats)}")
+
+def history_fill_time(history, window_days):
+    """fill_time for the Watcher: the p90 time lessons of a kind took to fill, looked up once per kind."""
+    known = {}
+    def fill_time(lesson):
+        key = (lesson.title, lesson.start)
+        if key not in known:
+            known[key] = history.fill_stats(lesson.title, lesson.start, window_days=window_days).p90
+        return known[key]
+    return fill_time
+
+async def snipe(client, parse, matcher, target_date, today, args):
+    """Resolves the target lesson (best match of the rules) and its booking action (one PRE) ahead of time and fires the booking at args.fire_at."""
+    from datetime import datetime
+    html = await client.get_weekly_plan(week_offset(target_date, today))
+    matches = matcher.match(parse(html), matcher.targets(today, only=target_date))
+    if not matches:
+        logger.error(f"Target lesson not found on {target_date.strftime('%d.%m.%Y')}.")
+        sys.exit(1)
+    lesson = matches[0].lesson
+
+    loginuid = session_loginuid(client, html)
+    # One PRE ahead of time: the action to fire (BOOK_W for a full lesson), or a place we hold already.
+    # Before the booking window opens it offers no action yet, then BOOK_T is fired.
+    pre = check_pre(await client.ajax_request(CHECKIN_COMMAND, pre_params(loginuid, lesson.event_id)))
+    if pre.booked:
+        logger.info(f"Event {lesson.id}: {pre.status_msg}, nothing to snipe.")
+        report_lesson(args, lesson, "held", pre.status_msg)
+        if args.report is None:
+            print(row(target_date.strftime("%d.%m.%Y"), lesson.event_id, pre.status_msg))
+        return
+    sniper = Sniper(
+        client, lesson.event_id, loginuid, next_param=pre.next_param or "BOOK_T", dry_run=not args.book,
+        max_attempts=args.snipe_attempts, retry_interval=args.snipe_interval
+    )
+    mode = "booking" if args.book else "dry run (PRE only)"
+    logger.info(f"Sniping event {lesson.id} at {datetime.fromtimestamp(args.fire_at).isoformat(timespec='milliseconds')} (server time) - {mode}")
+
+    # --at is meant in server time: send early enough to arrive when the server clock shows it.
+    # Calibrating takes a few seconds; with less lead time than that it would delay the booking.
+    if args.no_calibrate:
+        pass
+    elif args.fire_at - time.time() < calibration_time(args.calibration_samples) + SNIPE_CALIBRATION_MARGIN:
+        logger.warning(f"Not enough time left to calibrate the clock ({args.calibration_samples} samples), trusting the local clock.")
+    else:
+        calibration = await client.calibrate(samples=args.calibration_samples)
+        logger.info(f"Server clock offset {calibration.offset * 1000:+.0f}ms, "
+                    f"RTT min/median/p95 {calibration.rtt_min * 1000:.0f}/{calibration.rtt_median * 1000:.0f}/{calibration.rtt_p95 * 1000:.0f}ms")
+    send_at = client.send_time_for(args.fire_at)
+    late = time.time() - send_at
+    if late > 0:
+        logger.warning(f"The send instant passed {late * 1000:.0f}ms ago, sending right away.")
+
+    attempts = await sniper.run(send_at)
+    outcome = attempts[-1].outcome
+    if args.report is not None:
+        report_lesson(args, lesson, outcome, f"{len(attempts)} attempt(s)", action=None if not args.book else "EVBK",
+                      latency=attempts[-1].latency, error=attempts[-1].error, attempts=len(attempts))
+    else:
+        for line in format_attempts(attempts):
+            print(line)
+    if outcome not in ("success", "waitlisted", "dry-run"):
+        logger.error(f"Snipe finished without booking: {outcome}")
+        sys.exit(1)
+
+async def watch(client, parse, matcher, only, username, password, store, args, history=None):
+    """--watch: polls the rule targets until interrupted, printing every status change."""
+    def report(event):
+        if args.report is not None:
+            args.report.write("watch", event=event.lesson.event_id, date=event.date.isoformat(), title=event.lesson.title, status=event.status)
+        else:
+            print(row(event.date.strftime("%d.%m.%Y"), event.lesson.event_id, event.status), flush=True)
+
+    async def relogin():
+        # The cached session is the one that just expired
+        if store is not None:
+            store.clear(username)
+        return await client.login_or_resume(username, password, store)
+
+    watcher = Watcher(
+        client, matcher, parse, book=args.book, only=only, window_days=args.window_days,
+        min_interval=args.watch_min_interval, max_interval=args.watch_max_interval,
+        on_event=report, relogin=relogin,
+        fill_time=history_fill_time(history, args.window_days) if history is not None else None
+    )
+    logger.info(f"Watching {'; '.join(r.describe() for r in matcher.rules)} (Ctrl-C to stop)...")
+    if args.report is None:
+        print_header()
+    await watcher.run()
+
+def replay_transport(args, recorder=None, archive=None, transport=None):
+    """The transport for --record/--replay (recording over transport, if given), or transport itself."""
+    if recorder is not None:
+        return RecordingTransport(recorder, transport)
+    if archive is not None:
+        return ReplayTransport(archive, realtime=args.replay_timing)
+    return transport
+
+async def run(args, username, password, matcher, targets, today, only=None, metrics=NO_METRICS, history=None,
+              recorder=None, archive=None):
+    # Sniping waits minutes on an idle pool, keep its connection around for the keep-alive pings
+    keepalive_expiry = 30.0 if args.snipe else 5.0
+    # A recording goes over the connection pool the client would build for itself
+    network = async_transport(args.concurrency, keepalive_expiry, args.lean) if recorder is not None else None
+    async with AsyncReitbuchClient(args.base_url, max_connections=args.concurrency, keepalive_expiry=keepalive_expiry, metrics=metrics,
+                                   transport=replay_transport(args, recorder, archive, network), http2=args.lean, conditional=args.lean) as client:
+        store = None if args.no_session_cache else SessionStore(args.session_file)
+        if not await client.login_or_resume(username, password, store):
+            logger.error("Login failed. Check credentials.")
+            sys.exit(1)
+
+        # The watcher's targets move on with the days, so it reads whole pages
+        parse = weekplan_parser(args, metrics, history, None if args.watch else matcher.query(targets))
+        if args.watch:
+            await watch(client, parse, matcher, only, username, password, store, args, history)
+            return
+        if args.snipe:
+            await snipe(client, parse, matcher, next(iter(targets)), today, args)
+            return
+
+        # Every week with a target date is fetched exactly once, however many rules want it
+        weeks = matcher.by_week(targets, today)
+
+        logger.info(f"Login successful. Checking {len(weeks)} week(s) for {'; '.join(r.describe() for r in matcher.rules)}...")
+        if args.report is None:
+            print_header()
+
+        # All target weeks are fetched and evaluated at the same time, bounded by --concurrency.
+        semaphore = asyncio.Semaphore(args.concurrency)
+        weekplans = AsyncWeekplanCache(client, parse)
+        results = await asyncio.gather(*(check_week(client, weekplans, w, matcher, days, args, semaphore) for w, days in weeks.items()))
+        if args.report is None:
+            for lines, _ in results:
+                for line in lines:
+                    print(line)
+        evaluated = [lesson for _, lessons in results for lesson in lessons]
+        if args.status:
+            await print_status(client, evaluated, args.concurrency, history, args.report)
+        if history is not None and args.report is None:
+            print_fill_advice(history, evaluated, args.window_days)
+
+def batch_query(accounts, default_dates):
+    """LessonQuery for the lessons of all accounts, as check_date looks them up (title contained, exact start)."""
+    titles = {account.title for account in accounts}
+    starts = {parse_clock(account.time) for account in accounts}
+
+    def start(time_text):
+        try:
+            return parse_clock(time_text) in starts
+        except ValueError:
+            return False
+
+    dates = frozenset(day.isoformat() for account in accounts for day in (account.dates or default_dates))
+    return LessonQuery(dates, lambda title: any(text in title for text in titles), start)
+
+async def run_batch(args, accounts, default_dates, today, metrics=NO_METRICS, history=None, recorder=None, archive=None):
+    """
+    Runs several accounts in one process: one session per account over a shared, bounded
+    connection pool. The weekplan is the same for everybody, so it is fetched and parsed once
+    (through the first account's session) and only the PRE/EVBK calls are per account.
+    """
+    store = None if args.no_session_cache else SessionStore(args.session_file)
+    # One circuit breaker for all sessions: they load the same server
+    policy = RequestPolicy()
+    async with SharedConnectionPool(max_connections=args.concurrency, http2=args.lean) as pool:
+        clients = [AsyncReitbuchClient(args.base_url, transport=replay_transport(args, recorder, archive, pool.transport()), metrics=metrics,
+                                       conditional=args.lean, policy=policy)
+                   for _ in accounts]
+        try:
+            logins = await asyncio.gather(
+                *(c.login_or_resume(a.user, a.password, store) for c, a in zip(clients, accounts)),
+                return_exceptions=True
+            )
+            active = []
+            for account, client, ok in zip(accounts, clients, logins):
+                if ok is not True:
+                    logger.error(f"Login failed for {account.user}: {ok if isinstance(ok, Exception) else 'check credentials'}")
+                elif not client.loginuid:
+                    # The shared weekplan pages carry the first account's loginuid, never fall back to them
+                    logger.error(f"Login failed for {account.user}: no loginuid in the login response")
+                else:
+                    active.append((account, client))
+            if not active:
+                sys.exit(1)
+
+            weekplans = AsyncWeekplanCache(active[0][1], weekplan_parser(args, metrics, history, batch_query(accounts, default_dates)))
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            jobs = []
+            for account, client in active:
+                for target_date in account.dates or default_dates:
+                    jobs.append(((account, client), check_date(client, weekplans, target_date, today, args, semaphore, account.title, account.time, account.user)))
+            results = await asyncio.gather(*(job for _, job in jobs))
+
+            by_account = {}
+            for ((account, client), _), (lines, lessons) in zip(jobs, results):
+                if account.user not in by_account:
+                    by_account[account.user] = (account, client, [], [])
+                by_account[account.user][2].extend(lines)
+                by_account[account.user][3].extend(lessons)
+
+            for account, client, lines, lessons in by_account.values():
+                if args.report is None:
+                    print(f"\n{account.user}: '{account.title}' ({account.time})")
+                    print_header()
+                    for line in lines:
+                        print(line)
+                if args.status:
+                    await print_status(client, lessons, args.concurrency, history, args.report, account.user)
+        finally:
+            await asyncio.gather(*(c.aclose() for c in clients))
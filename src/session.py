@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_FILE = os.path.join(os.path.expanduser("~"), ".cache", "autoreitbuch", "session.json")
+
+# How long a cached session is trusted enough to be worth validating.
+# The validation request is the real check, this only avoids a pointless round trip for very old sessions.
+DEFAULT_SESSION_TTL = 12 * 3600
+
+
+class SessionStore:
+    """
+    On-disk cache of logged-in sessions (PHPSESSID cookie, loginuid and expiry), keyed by username.
+    The file holds live session ids, so it is written with owner-only permissions.
+    """
+
+    def __init__(self, path=DEFAULT_SESSION_FILE, ttl=DEFAULT_SESSION_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable session file {self.path}: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self, username):
+        """Returns the cached session for username, or None if there is none or it has expired."""
+        session = self._read().get(username)
+        if not session or not session.get('phpsessid'):
+            return None
+        if session.get('expires_at', 0) <= self.clock():
+            logger.info("Cached session expired.")
+            return None
+        return session
+
+    def save(self, username, phpsessid, loginuid):
+        data = self._read()
+        data[username] = {
+            'phpsessid': phpsessid,
+            'loginuid': loginuid,
+            'expires_at': self.clock() + self.ttl
+        }
+        self._write(data)
+
+    def clear(self, username=None):
+        if username is None:
+            data = {}
+        else:
+            data = self._read()
+            data.pop(username, None)
+        self._write(data)
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, time as dt_time
+
+try:
+    from .booking import CHECKIN_COMMAND, booking_params, classify_evbk, pre_params
+    from .metrics import summarize
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import CHECKIN_COMMAND, booking_params, classify_evbk, pre_params
+    from metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# One booking request fired by the Sniper.
+# offset is the send time relative to the planned instant, latency the round trip (both in seconds).
+SnipeAttempt = namedtuple("SnipeAttempt", ["number", "offset", "latency", "outcome", "error"])
+
+DEFINITIVE_OUTCOMES = ("success", "waitlisted", "closed", "full")
+
+
+def parse_fire_time(value, now=None):
+    """
+    Resolves the --at option to epoch seconds.
+    Accepts 'HH:MM[:SS[.ffffff]][+HH:MM]' (next occurrence) or an ISO datetime; times without
+    an offset are local time. None means the next local midnight, when the booking window moves on.
+    """
+    now = now or datetime.now()
+    if value is None:
+        target = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return target.timestamp()
+
+    try:
+        clock = dt_time.fromisoformat(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+    if clock.tzinfo is not None:
+        # The next occurrence on the clock of that offset
+        now = now.astimezone(clock.tzinfo)
+    target = datetime.combine(now.date(), clock)
+    if target <= now:
+        target += timedelta(days=1)
+    return target.timestamp()
+
+
+class Sniper:
+    """
+    Fires a precomputed booking request at a fixed instant.
+
+    Everything that can be done ahead of time is: the event id and loginuid are resolved by
+    the caller, the EVBK payload is encoded once, and the pooled connection is kept warm with
+    cheap pings until shortly before the instant. At the instant the request is sent and
+    repeated in a tight, bounded loop until the server gives a definitive answer.
+
+    With dry_run the PRE request is fired instead of EVBK, which exercises the same timing
+    without booking anything.
+    """
+
+    def __init__(self, client, event_id, loginuid, next_param="BOOK_T", dry_run=False,
+                 max_attempts=20, retry_interval=0.05, keepalive_interval=3.0, warm_window=60.0,
+                 quiet_period=0.5, clock=time.time):
+        self.client = client
+        self.event_id = event_id
+        self.dry_run = dry_run
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.keepalive_interval = keepalive_interval
+        self.warm_window = warm_window
+        self.quiet_period = quiet_period
+        self.clock = clock
+
+        params = pre_params(loginuid, event_id) if dry_run else booking_params(loginuid, event_id, next_param)
+        self.payload = client.prepare_ajax(CHECKIN_COMMAND, params)
+
+    async def wait_until(self, fire_at):
+        """
+        Sleeps until fire_at (epoch seconds). Within warm_window before the instant the
+        connection is pinged every keepalive_interval; the last quiet_period is left idle so no
+        ping is in flight when the booking goes out, and is slept precisely.
+        """
+        while True:
+            remaining = fire_at - self.clock()
+            if remaining <= self.quiet_period:
+                break
+            if remaining > self.warm_window:
+                await asyncio.sleep(min(remaining - self.warm_window, 60.0))
+                continue
+            try:
+                await self.client.ping()
+            except Exception as e:
+                logger.warning(f"Keep-alive ping failed: {e}")
+            await asyncio.sleep(max(0.0, min(self.keepalive_interval, fire_at - self.clock() - self.quiet_period)))
+
+        # Coarse sleep, then spin for the last few milliseconds (event loop timers are not that precise)
+        remaining = fire_at - self.clock()
+        if remaining > 0.005:
+            await asyncio.sleep(remaining - 0.005)
+        while self.clock() < fire_at:
+            pass
+
+    async def fire(self, fire_at=None):
+        """Sends the booking request until a definitive answer arrives. Returns the list of attempts."""
+        reference = fire_at if fire_at is not None else self.clock()
+        attempts = []
+        for number in range(1, self.max_attempts + 1):
+            sent_at = self.clock()
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await self.client.send_ajax(self.payload)
+                outcome = "dry-run" if self.dry_run else classify_evbk(response)
+                if not self.dry_run:
+                    self.client.metrics.event("booking", outcome, None if outcome == "success" else summarize(response), event=self.event_id)
+            except Exception as e:
+                outcome = "error"
+                error = str(e)
+            latency = time.perf_counter() - start
+            attempts.append(SnipeAttempt(number, sent_at - reference, latency, outcome, error))
+
+            if outcome in DEFINITIVE_OUTCOMES or outcome == "dry-run":
+                break
+            if number < self.max_attempts and self.retry_interval:
+                await asyncio.sleep(self.retry_interval)
+        return attempts
+
+    async def run(self, fire_at):
+        await self.wait_until(fire_at)
+        return await self.fire(fire_at)
+
+
+def format_attempts(attempts):
+    lines = [f"{'#':>3} | {'Sent':>9} | {'Latency':>10} | Outcome"]
+    for a in attempts:
+        outcome = f"{a.outcome} ({a.error})" if a.error else a.outcome
+        lines.append(f"{a.number:>3} | {a.offset * 1000:>+7.1f}ms | {a.latency * 1000:>8.1f}ms | {outcome}")
+    return lines
@@ -0,0 +1,41 @@
+import asyncio
+from collections import namedtuple
+
+try:
+    from .parser import parse_participants
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from parser import parse_participants
+
+# Participant and waiting list of one event, or the error that prevented fetching/parsing them
+EventStatus = namedtuple("EventStatus", ["event_id", "participants", "waiting_list", "error"])
+
+
+async def fetch_statuses(client, event_ids, loginuid, concurrency=6, parse=parse_participants):
+    """
+    Fetches the 'ax.event.showeventdetails' dialog of every event id (duplicates once) with at
+    most concurrency requests in flight, and yields an EventStatus per event as soon as it is
+    done, in completion order.
+
+    Parsing runs in a worker thread after the request slot has been released, so the next
+    request goes out while the previous answer is still being parsed. Errors are reported in
+    the EventStatus instead of aborting the other fetches.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(event_id):
+        try:
+            async with semaphore:
+                html = await client.get_event_details_ajax(event_id, loginuid)
+            parsed = await asyncio.to_thread(parse, html)
+            return EventStatus(event_id, parsed['participants'], parsed['waiting_list'], None)
+        except Exception as e:
+            return EventStatus(event_id, [], [], e)
+
+    tasks = [asyncio.ensure_future(fetch(event_id)) for event_id in dict.fromkeys(event_ids)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        # The consumer stopped early: do not leave requests running
+        for task in tasks:
+            task.cancel()
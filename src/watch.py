@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+try:
+    from .booking import CHECKIN_COMMAND, DEFAULT_WINDOW_DAYS, check_pre, evbk_outcome, pre_params, send_booking
+    from .cache import AsyncWeekplanCache, content_digest
+    from .client import extract_loginuid
+    from .metrics import summarize
+except ImportError: # Running as a script from src/ (python src/main.py)
+    from booking import CHECKIN_COMMAND, DEFAULT_WINDOW_DAYS, check_pre, evbk_outcome, pre_params, send_booking
+    from cache import AsyncWeekplanCache, content_digest
+    from client import extract_loginuid
+    from metrics import summarize
+
+logger = logging.getLogger(__name__)
+
+# A change the Watcher noticed (or caused) for a matched lesson
+WatchEvent = namedtuple("WatchEvent", ["date", "lesson", "status"])
+
+
+class LoginLost(RuntimeError):
+    """The session expired and logging in again failed."""
+
+
+def poll_interval(seconds_until, min_interval, max_interval, ratio=120.0):
+    """
+    Polling interval for something seconds_until away: a lesson in an hour is polled every
+    30s, one in ten minutes every 5s, and anything days away every max_interval.
+    """
+    return max(min_interval, min(max_interval, seconds_until / ratio))
+
+
+class Watcher:
+    """
+    Long-running watch over the lessons selected by a RuleMatcher.
+
+    Every round fetches the weekplans of the target weeks and runs PRE for the matched,
+    bookable lessons of dates where we hold no place yet. Weekplans are compared by content
+    hash and only re-parsed (and re-matched) when they changed; PRE responses are hashed too,
+    so an unchanged dialog is neither classified again nor reported again. When a lesson
+    offers a booking action it is booked right away (book=True) or reported.
+
+    The pause between rounds adapts to the closest lesson start or booking window opening
+    (see poll_interval), and a window opening is never slept past. fill_time(lesson) may
+    return how long such lessons take to fill after the opening (e.g. from the history);
+    for that long after the opening the lesson is polled every min_interval.
+    """
+
+    def __init__(self, client, matcher, parse, book=False, only=None, window_days=DEFAULT_WINDOW_DAYS,
+                 min_interval=5.0, max_interval=600.0, on_event=None, relogin=None, fill_time=None,
+                 clock=time.time, today=date.today, sleep=asyncio.sleep):
+        self.client = client
+        self.matcher = matcher
+        self.book = book
+        self.only = only
+        self.window_days = window_days
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.on_event = on_event or (lambda event: None)
+        self.relogin = relogin
+        self.fill_time = fill_time or (lambda lesson: None)
+        self.clock = clock
+        self.today = today
+        self.sleep = sleep
+
+        self.weekplans = AsyncWeekplanCache(client, parse, ttl=None)
+        self.held = set() # Dates on which we hold a place
+        self.rounds = 0
+        self._matches = {} # week -> (lessons, targets, matches), re-matched only when either changed
+        self._pre = {} # event id -> (digest, PreStatus)
+        self._status = {} # event id -> last reported status
+
+    def _emit(self, lesson, status):
+        if self._status.get(lesson.id) != status:
+            self._status[lesson.id] = status
+            self.on_event(WatchEvent(lesson.date, lesson, status))
+
+    async def _week_matches(self, week, targets):
+        self.weekplans.invalidate(week)
+        html = await self.weekplans.get_html(week)
+        loginuid = extract_loginuid(html)
+        if loginuid is None and self.relogin is not None:
+            # The session timed out: log in again and fetch the page once more
+            logger.info("Session lost, logging in again.")
+            if not await self.relogin():
+                raise LoginLost("Login failed while watching")
+            self.weekplans.invalidate(week)
+            loginuid = extract_loginuid(await self.weekplans.get_html(week))
+
+        lessons = await self.weekplans.get_lessons(week)
+        cached = self._matches.get(week)
+        if cached is None or cached[0] is not lessons or cached[1] != targets:
+            cached = self._matches[week] = (lessons, targets, self.matcher.match(lessons, targets))
+        return loginuid, cached[2]
+
+    async def _check(self, week, lesson, loginuid):
+        """PRE for one lesson, EVBK if it offers an action and we book. Returns True if we hold a place."""
+        eid = lesson.event_id
+        response = await self.client.ajax_request(CHECKIN_COMMAND, pre_params(loginuid, eid))
+        digest = content_digest(response)
+        cached = self._pre.get(lesson.id)
+        if cached is not None and cached[0] == digest:
+            pre = cached[1]
+        else:
+            pre = check_pre(response)
+            self._pre[lesson.id] = (digest, pre)
+
+        if pre.booked:
+            self._emit(lesson, pre.status_msg)
+            return True
+        if not pre.next_param:
+            self._emit(lesson, pre.status_msg)
+            return False
+        if not self.book:
+            self._emit(lesson, f"{pre.status_msg} - not booking")
+            return False
+
+        response, checkin = await send_booking(self.client, loginuid, eid, pre.next_param)
+        self.weekplans.invalidate(week)
+        self._pre.pop(lesson.id, None)
+        self.client.metrics.event("booking", evbk_outcome(checkin), None if checkin.holds_place else summarize(response), event=eid)
+        if checkin.holds_place:
+            self._emit(lesson, f"{pre.action_desc} SUCCESSFUL")
+            return True
+        self._emit(lesson, f"{pre.action_desc} FAILED")
+        logger.warning(f"Booking response debug: {summarize(response)}")
+        return False
+
+    def _opens_at(self, day):
+        return datetime.combine(day - timedelta(days=self.window_days), datetime.min.time()).timestamp()
+
+    async def _watch_week(self, week, targets, now):
+        """One round for one week. Returns (starts_at, opens_at, fill_time) of the lessons still watched."""
+        page_loginuid, matches = await self._week_matches(week, targets)
+        loginuid = self.client.loginuid or page_loginuid or "0"
+
+        watched = []
+        for match in matches:
+            lesson = match.lesson
+            starts_at = datetime.combine(lesson.date, lesson.start).timestamp()
+            if lesson.date in self.held or starts_at <= now:
+                continue
+            if not lesson.is_bookable:
+                self._emit(lesson, "Full / Deadline passed")
+            elif await self._check(week, lesson, loginuid):
+                self.held.add(lesson.date)
+                continue
+            watched.append((starts_at, self._opens_at(lesson.date), self.fill_time(lesson)))
+        return watched
+
+    def _next_interval(self, now, watched):
+        interval = self.max_interval
+        for starts_at, opens_at, fill_time in watched:
+            interval = min(interval, poll_interval(starts_at - now, self.min_interval, self.max_interval))
+            if fill_time is not None and opens_at <= now < opens_at + fill_time:
+                # The places usually go in this phase
+                interval = self.min_interval
+            if opens_at > now:
+                # Poll faster as the window opening approaches and wake up right after it
+                interval = min(interval, poll_interval(opens_at - now, self.min_interval, self.max_interval), opens_at - now + 0.05)
+        return interval
+
+    async def poll(self):
+        """One round over all target weeks. Returns the seconds to wait before the next round."""
+        self.rounds += 1
+        now = self.clock()
+        today = self.today()
+        targets = {day: rules for day, rules in self.matcher.targets(today, only=self.only).items() if day not in self.held}
+
+        weeks = self.matcher.by_week(targets, today)
+        results = await asyncio.gather(*(self._watch_week(week, days, now) for week, days in weeks.items()), return_exceptions=True)
+
+        watched = []
+        for week, result in zip(weeks, results):
+            if isinstance(result, LoginLost):
+                raise result
+            if isinstance(result, Exception):
+                # Network trouble: try again next round
+                logger.warning(f"Watching week {week} failed: {result}")
+                continue
+            watched.extend(result)
+        return self._next_interval(now, watched)
+
+    async def run(self, rounds=None):
+        """Polls until stopped (or for rounds rounds)."""
+        while rounds is None or self.rounds < rounds:
+            interval = await self.poll()
+            if rounds is not None and self.rounds >= rounds:
+                break
+            logger.debug(f"Next watch round in {interval:.1f}s")
+            await self.sleep(interval)
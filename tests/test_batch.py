@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from argparse import Namespace
+from datetime import date
+from benchmarks.standin import StandinServer
+from src import runner
+from src.batch import Account, load_accounts
+from src.client import AsyncReitbuchClient, SharedConnectionPool
+
+def test_load_accounts_toml(tmp_path, monkeypatch):
+    monkeypatch.setenv("BEN_PASSWORD", "secret")
+    path = tmp_path / "accounts.toml"
+    path.write_text('''
+[[account]]
+user = "anna"
+password = "pw"
+dates = ["20.12.2025"]
+
+[[account]]
+user = "ben"
+password_env = "BEN_PASSWORD"
+title = "Springen Basis"
+time = "10:00"
+''')
+    anna, ben = load_accounts(str(path))
+    assert anna.dates == [date(2025, 12, 20)]
+    assert anna.title == "Dressur Standard"
+    assert ben.password == "secret"
+    assert ben.dates is None
+    assert ben.time == "10:00"
+
+def test_load_accounts_rejects_missing_password(tmp_path, monkeypatch):
+    monkeypatch.delenv("NOPE", raising=False)
+    path = tmp_path / "accounts.json"
+    path.write_text('{"account": [{"user": "anna", "password_env": "NOPE"}]}')
+    with pytest.raises(ValueError, match="no password for anna"):
+        load_accounts(str(path))
+
+def test_shared_pool_keeps_sessions_apart():
+    """Clients on one shared pool keep separate sessions; closing a client leaves the pool usable."""
+    async def scenario(url):
+        async with SharedConnectionPool(max_connections=2) as pool:
+            anna = AsyncReitbuchClient(url, transport=pool.transport())
+            ben = AsyncReitbuchClient(url, transport=pool.transport())
+            await asyncio.gather(anna.login("anna", "pw"), ben.login("ben", "pw"))
+            assert anna.session_id() != ben.session_id()
+            assert anna.loginuid != ben.loginuid
+
+            await anna.aclose()
+            html = await ben.get_weekly_plan(1)
+            await ben.aclose()
+            return html
+
+    with StandinServer() as server:
+        assert "wp_event" in asyncio.run(scenario(server.url))
+
+def test_batch_never_borrows_the_loginuid_of_another_account(monkeypatch, capsys):
+    """An account without its own loginuid is dropped, not run with the one on the shared weekplan."""
+    login = AsyncReitbuchClient.login_or_resume
+    async def login_without_loginuid(self, username, password, store=None):
+        ok = await login(self, username, password, store)
+        if username == "ben":
+            self.loginuid = None
+        return ok
+    monkeypatch.setattr(AsyncReitbuchClient, "login_or_resume", login_without_loginuid)
+
+    with StandinServer() as server:
+        day = next(e.date for e in server.state.week(1) if e.title == "Dressur Standard")
+        args = Namespace(base_url=server.url, no_session_cache=True, session_file=None, concurrency=2, lean=False,
+                         parser="stream", book=True, status=False, report=None)
+        accounts = [Account(user, "pw", "Dressur Standard", "09:00", [day]) for user in ("anna", "ben")]
+        asyncio.run(runner.run_batch(args, accounts, [day], server.state.today))
+        event = next(e for e in server.state.week(1) if e.date == day and e.title == "Dressur Standard")
+
+    out = capsys.readouterr().out
+    assert "anna:" in out and "ben:" not in out
+    assert "ben" not in " ".join(map(str, event.participants + event.waiting_list))
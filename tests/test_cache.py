@@ -0,0 +1,82 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from src.cache import AsyncWeekplanCache, WeekplanCache
+
+HTML_SAMPLE = "<div id=\"col_2025-12-13\"><div class=\"wp_event\"></div></div>"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_cache_fetches_and_parses_once():
+    """Repeated lookups for the same week hit the cache."""
+    client = MagicMock()
+    client.get_weekly_plan.return_value = HTML_SAMPLE
+    parse = MagicMock(return_value=[{'id': '12345'}])
+    cache = WeekplanCache(client, parse)
+
+    assert cache.get_lessons(3) == [{'id': '12345'}]
+    assert cache.get_lessons(3) == [{'id': '12345'}]
+    assert cache.get_html(3) == HTML_SAMPLE
+
+    client.get_weekly_plan.assert_called_once_with(3)
+    parse.assert_called_once_with(HTML_SAMPLE)
+
+def test_cache_ttl_and_invalidate():
+    """Entries expire after the TTL and can be dropped explicitly."""
+    client = MagicMock()
+    client.get_weekly_plan.return_value = HTML_SAMPLE
+    clock = FakeClock()
+    cache = WeekplanCache(client, MagicMock(return_value=[]), ttl=60, clock=clock)
+
+    cache.get_html(1)
+    clock.now = 30
+    cache.get_html(1)
+    assert cache.fetches == 1
+
+    clock.now = 100
+    cache.get_html(1)
+    assert cache.fetches == 2
+
+    cache.invalidate(1)
+    cache.get_html(1)
+    assert cache.fetches == 3
+
+def test_async_cache_shares_inflight_fetch():
+    """Concurrent lookups for the same week share one request."""
+    client = MagicMock()
+
+    async def slow_plan(week_offset):
+        await asyncio.sleep(0.01)
+        return HTML_SAMPLE
+
+    client.get_weekly_plan = AsyncMock(side_effect=slow_plan)
+    parse = MagicMock(return_value=[])
+    cache = AsyncWeekplanCache(client, parse)
+
+    async def scenario():
+        return await asyncio.gather(cache.get_lessons(2), cache.get_lessons(2), cache.get_html(2))
+
+    results = asyncio.run(scenario())
+    assert results[2] == HTML_SAMPLE
+    client.get_weekly_plan.assert_awaited_once_with(2)
+    parse.assert_called_once()
+
+def test_cache_reparses_only_changed_pages():
+    """A page fetched again after invalidate() is only parsed again if its content changed."""
+    client = MagicMock()
+    client.get_weekly_plan.side_effect = [HTML_SAMPLE, HTML_SAMPLE, HTML_SAMPLE + "<p>changed</p>"]
+    parse = MagicMock(side_effect=lambda html: [len(html)])
+    cache = WeekplanCache(client, parse)
+
+    first = cache.get_lessons(0)
+    cache.invalidate(0)
+    assert cache.get_lessons(0) is first
+    assert (cache.fetches, cache.parses) == (2, 1)
+
+    cache.invalidate()
+    assert cache.get_lessons(0) != first
+    assert (cache.fetches, cache.parses) == (3, 2)
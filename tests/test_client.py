@@ -1,6 +1,7 @@
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
-from src.client import ReitbuchClient
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.client import AsyncReitbuchClient, ClockCalibration, ReitbuchClient, calibration_time
 import httpx
 
 @pytest.fixture
@@ -56,3 +57,81 @@ def test_ajax_request(client):
     assert "data" in kwargs
     assert kwargs['data']['command'] == "cmd"
     assert "params" in kwargs['data'] # Should be json dumped
+
+def test_async_client_shares_session_cookies():
+    """The async client reuses the cookie jar (PHPSESSID) of a sync client."""
+    sync_client = ReitbuchClient()
+    sync_client.client.cookies.set("PHPSESSID", "abc123")
+
+    async_client = AsyncReitbuchClient.from_client(sync_client)
+    assert async_client.client.cookies.get("PHPSESSID") == "abc123"
+    asyncio.run(async_client.aclose())
+    sync_client.close()
+
+def test_async_get_weekly_plan():
+    """Test the async weekplan request parameters."""
+    with patch('src.client.httpx.AsyncClient') as mock_httpx:
+        mock_instance = MagicMock()
+        mock_response = MagicMock()
+        mock_response.text = "<html>plan</html>"
+        mock_instance.get = AsyncMock(return_value=mock_response)
+        mock_httpx.return_value = mock_instance
+
+        client = AsyncReitbuchClient()
+        assert asyncio.run(client.get_weekly_plan(2)) == "<html>plan</html>"
+
+    args, kwargs = mock_instance.get.call_args
+    assert args[0] == "/weekplan.php"
+    assert kwargs['params'] == {'w': 2, 'p': 1}
+
+def test_conditional_weekplan_requests():
+    """Validators go out as If-None-Match/If-Modified-Since; a 304 returns the remembered page."""
+    requests = []
+    def handler(request):
+        requests.append(request)
+        week = request.url.params.get("w", "0")
+        if week == "1": # No validators at all: always downloaded
+            return httpx.Response(200, text="<html>week 1</html>")
+        if request.headers.get("If-Modified-Since") == "Sat, 07 Nov 2026 08:00:00 GMT":
+            return httpx.Response(304)
+        return httpx.Response(200, text="<html>week 0</html>", headers={"Last-Modified": "Sat, 07 Nov 2026 08:00:00 GMT"})
+
+    async def scenario():
+        async with AsyncReitbuchClient(transport=httpx.MockTransport(handler), conditional=True) as client:
+            first = await client.get_weekly_plan(0)
+            assert await client.get_weekly_plan(0) is first
+            assert await client.get_weekly_plan(1) == await client.get_weekly_plan(1) == "<html>week 1</html>"
+            return client.validators.not_modified
+
+    assert asyncio.run(scenario()) == 1
+    assert "If-Modified-Since" not in requests[0].headers and "If-None-Match" not in requests[1].headers
+    assert not any("If-Modified-Since" in request.headers for request in requests[2:])
+
+def test_clock_calibration_narrows_offset():
+    """Samples straddling the server's second rollover bound the clock offset."""
+    # Server clock is 2.3 s ahead of local, RTT 0.1 s, server stamps at the midpoint
+    samples = []
+    for sent in (1000.0, 1001.4, 1002.8, 1004.2, 1005.6):
+        received = sent + 0.1
+        server_date = float(int(sent + 0.05 + 2.3))
+        samples.append((sent, received, server_date))
+
+    calibration = ClockCalibration(samples)
+    assert abs(calibration.offset - 2.3) <= calibration.offset_error + 1e-9
+    assert calibration.offset_error < 0.5
+    assert abs(calibration.rtt_median - 0.1) < 1e-9
+    # Request should leave half a round trip before the server shows the target time
+    assert abs(calibration.send_time_for(2000.0) - (2000.0 - calibration.offset - 0.05)) < 1e-9
+
+def test_calibrate_uses_date_headers(client):
+    """calibrate() times pings and reads the Date header."""
+    client.client.head.return_value = MagicMock(headers={"Date": "Mon, 01 Dec 2025 23:59:59 GMT"})
+    calibration = client.calibrate(samples=3, interval=0)
+
+    assert client.client.head.call_count == 3
+    assert client.clock_calibration is calibration
+    assert len(calibration.samples) == 3
+    assert calibration.rtt_p95 >= calibration.rtt_median >= calibration.rtt_min
+    # What snipe() checks the lead time against
+    assert calibration_time(3, interval=0) == 0
+    assert abs(calibration_time(5) - 4 * 1.2) < 1e-9
@@ -0,0 +1,65 @@
+from dataclasses import replace
+from datetime import date, datetime, time, timedelta
+from benchmarks import fixtures
+from src.history import HistoryStore, fill_advice
+from src.lessons import index_parser
+from src.parser import parse_available_lessons_stream
+
+def saturday_lesson(lessons):
+    return next(l for l in lessons if l.date == date(2025, 12, 20) and l.start == time(9))
+
+def test_snapshots_are_incremental():
+    store = HistoryStore(":memory:", clock=lambda: 1000.0)
+    html = fixtures.weekplan()
+    lessons = list(index_parser(parse_available_lessons_stream)(html))
+
+    assert store.record_weekplan(html, lessons) == len(lessons)
+    # Same page again: nothing new
+    assert store.record_weekplan(html, lessons) == 0
+    assert store.db.execute("SELECT COUNT(*) FROM weekplan_snapshots").fetchone() == (1,)
+
+    lesson = saturday_lesson(lessons)
+    assert store.record_lessons([replace(lesson, is_bookable=False)] + lessons[:3], observed_at=2000.0) == 1
+    assert store.db.execute("SELECT COUNT(*) FROM lesson_snapshots WHERE event_id = ?", (lesson.id,)).fetchone() == (2,)
+
+    assert store.record_participants(lesson.event_id, ["1 Anna"], [])
+    assert not store.record_participants(lesson.event_id, ["1 Anna"], [])
+    assert store.record_participants(lesson.event_id, ["1 Anna", "2 Lena"], [])
+    assert [row[1:] for row in store.participant_history(lesson.id)] == [(1, 0), (2, 0)]
+
+def test_offline_queries_use_indexes():
+    store = HistoryStore(":memory:")
+    lessons = list(index_parser(parse_available_lessons_stream)(fixtures.weekplan(weeks=3)))
+    store.record_lessons(lessons)
+
+    found = store.lessons(title="Dressur Standard", start="09:00")
+    assert [l.date for l in found] == [date(2025, 12, 20), date(2025, 12, 27), date(2026, 1, 3)]
+    assert found[0].id == saturday_lesson(lessons).id and found[0].time_text == "09:00 - 10:00"
+    assert len(store.lessons(day=date(2025, 12, 20))) == len([l for l in lessons if l.date == date(2025, 12, 20)])
+
+    plan = store.db.execute("EXPLAIN QUERY PLAN SELECT * FROM lessons WHERE title = ? AND start = ?", ("x", "09:00")).fetchall()
+    assert "lessons_title" in str(plan)
+    plan = store.db.execute("EXPLAIN QUERY PLAN SELECT * FROM lessons WHERE date = ?", ("2025-12-20",)).fetchall()
+    assert "lessons_date" in str(plan)
+
+def test_fill_stats(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    lessons = list(index_parser(parse_available_lessons_stream)(fixtures.weekplan(weeks=3)))
+    saturdays = [l for l in lessons if l.title == "Dressur Standard" and l.start == time(9)]
+
+    with HistoryStore(path) as store:
+        store.record_lessons(lessons)
+        for lesson, fill_seconds in zip(saturdays, (30, 90, None)):
+            opens_at = datetime.combine(lesson.date - timedelta(days=21), time()).timestamp()
+            # Before the window opened: ignored
+            store.record_participants(lesson.event_id, ["1 A"], ["1 W"], observed_at=opens_at - 60)
+            store.record_participants(lesson.event_id, ["1 A"], [], observed_at=opens_at + 5)
+            if fill_seconds is not None:
+                store.record_participants(lesson.event_id, ["1 A", "2 B"], ["1 C"], observed_at=opens_at + fill_seconds)
+
+    # Persistent across connections
+    with HistoryStore(path) as store:
+        stats = store.fill_stats("Dressur Standard", "09:00")
+    assert stats == (3, 2, 60.0, 90)
+    assert fill_advice(stats) == "2/3 full, usually within 60s of the window opening: use --snipe"
+    assert fill_advice(stats._replace(full=0)).startswith("never seen full")
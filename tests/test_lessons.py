@@ -0,0 +1,47 @@
+from datetime import date, time
+from src.lessons import Lesson, LessonIndex, lessons_from_records
+
+def record(event_id, day, title, times, bookable=True):
+    return {'id': str(event_id), 'title': title, 'time': times, 'is_bookable': bookable,
+            'raw_onclick': '', 'date_context': f'col_{day}'}
+
+RECORDS = [
+    record(1, "2025-12-20", "Dressur Standard", "08:00 - 09:00"),
+    record(2, "2025-12-20", "Dressur Standard", "09:00 - 10:00"),
+    record(3, "2025-12-20", "Springen Basis", "10:00 - 11:00"),
+    record(4, "2025-12-27", "Dressur Standard", "09:00 - 10:00", bookable=False),
+    record(5, "2025-12-21", "Longe", "Unknown"),
+]
+
+def test_lesson_from_record():
+    lesson = Lesson.from_record(RECORDS[1])
+    assert lesson.id == 2
+    assert lesson.event_id == "2"
+    assert lesson.date == date(2025, 12, 20)
+    assert (lesson.start, lesson.end) == (time(9), time(10))
+
+    unknown = Lesson.from_record({'id': '9', 'title': 'X', 'time': 'Unknown', 'date_context': 'Unknown'})
+    assert unknown.date is None and unknown.start is None
+    assert lessons_from_records([{'id': 'abc'}]) == []
+
+def test_index_lookups():
+    index = LessonIndex(lessons_from_records(RECORDS))
+
+    assert index.get("3").title == "Springen Basis"
+    assert [l.id for l in index.on(date(2025, 12, 20))] == [1, 2, 3]
+    assert [l.id for l in index.with_title("Dressur")] == [1, 2, 4]
+    assert [l.id for l in index.starting_between("09:00", "10:00")] == [2, 4, 3]
+    assert [l.id for l in index.between_dates(date(2025, 12, 21), date(2025, 12, 31))] == [5, 4]
+
+    # "09:00" is the start time, the 08:00 - 09:00 lesson does not match any more
+    assert [l.id for l in index.find(day=date(2025, 12, 20), title="Dressur Standard", start="09:00")] == [2]
+    assert [l.id for l in index.find(title="Dressur Standard", start="09:00")] == [2, 4]
+    assert [l.id for l in index.find(start="08:00", latest_start="09:30")] == [1, 2, 4]
+
+def test_index_merges_weeks_and_replaces_ids():
+    index = LessonIndex(lessons_from_records(RECORDS[:2]))
+    index.add(lessons_from_records([record(2, "2025-12-20", "Dressur Standard", "09:00 - 10:00", bookable=False), RECORDS[3]]))
+
+    assert len(index) == 3
+    assert index.get(2).is_bookable == False
+    assert index.dates == [date(2025, 12, 20), date(2025, 12, 27)]
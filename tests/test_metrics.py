@@ -0,0 +1,77 @@
+import json
+import pytest
+from benchmarks.standin import StandinServer
+from src.booking import CHECKIN_COMMAND, pre_params
+from src.client import ReitbuchClient
+from src.lessons import index_parser
+from src.metrics import Metrics, summarize
+from src.parser import parse_available_lessons_stream
+
+class FakeClock:
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+def test_timed_records_errors_and_reraises():
+    metrics = Metrics(clock=FakeClock(0.02), wall_clock=lambda: 1000.0)
+    with metrics.timed("weekplan", week=2) as probe:
+        probe.received = 512
+    with pytest.raises(ValueError):
+        with metrics.timed("parse"):
+            raise ValueError("broken page")
+    metrics.event("booking", "closed", "Kein freier Platz mehr vorhanden.")
+
+    weekplan, parse, booking = metrics.samples
+    assert weekplan.to_dict() == {"ts": 1000.0, "phase": "weekplan", "outcome": "ok", "duration_ms": 20.0, "sent": 0, "received": 512, "week": 2}
+    assert (parse.outcome, parse.detail) == ("error", "ValueError: broken page")
+    assert booking.duration is None
+
+def test_summarize_keeps_the_whole_response():
+    response = "<div class='alert'>\n  Kein freier Platz\n</div>" + "<p>x</p>" * 500
+    detail = summarize(response)
+    assert detail.startswith("<div class='alert'> Kein freier Platz </div>")
+    assert detail.endswith("<p>x</p>") and len(detail) > 4000
+
+def test_openmetrics_export():
+    metrics = Metrics(clock=FakeClock(0.02))
+    for _ in range(3):
+        with metrics.timed("checkin.pre") as probe:
+            probe.sent, probe.received = 100, 2000
+    metrics.event("booking", "success")
+
+    text = metrics.openmetrics()
+    assert 'reitbuch_phase_duration_seconds_bucket{phase="checkin.pre",le="0.01"} 0' in text
+    assert 'reitbuch_phase_duration_seconds_bucket{phase="checkin.pre",le="0.025"} 3' in text
+    assert 'reitbuch_phase_duration_seconds_count{phase="checkin.pre"} 3' in text
+    assert 'reitbuch_phase_bytes_total{phase="checkin.pre",direction="received"} 6000' in text
+    assert 'reitbuch_phase_outcomes_total{phase="booking",outcome="success"} 1' in text
+    assert text.endswith("# EOF\n")
+
+def test_client_and_parser_are_instrumented(tmp_path):
+    metrics = Metrics()
+    with StandinServer() as server:
+        client = ReitbuchClient(base_url=server.url, metrics=metrics)
+        client.login("alice", "pw")
+        lessons = index_parser(metrics.timed_parser(parse_available_lessons_stream))(client.get_weekly_plan(2))
+        lesson = next(l for l in lessons if l.is_bookable)
+        client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson.event_id))
+        client.get_event_details_ajax(lesson.event_id, client.loginuid)
+        client.close()
+
+    phases = [s.phase for s in metrics.samples]
+    assert phases == ["login.start", "login", "weekplan", "parse", "checkin.pre", "details"]
+    weekplan = metrics.samples[2]
+    assert weekplan.received > 10000 and weekplan.duration > 0
+    assert metrics.samples[3].labels == {"lessons": len(lessons)}
+    assert metrics.samples[4].sent > 0
+
+    path = tmp_path / "metrics.jsonl"
+    metrics.write(str(path))
+    metrics.write(str(path))
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(records) == 12
+    assert {r["run"] for r in records} == {metrics.run}
@@ -1,5 +1,10 @@
 import pytest
-from src.parser import parse_available_lessons
+from datetime import date, timedelta
+from benchmarks import fixtures
+from src.booking import check_pre
+from src.lessons import LessonQuery
+from src.parser import (CheckinState, iter_lessons, parse_available_lessons, parse_available_lessons_stream,
+                        parse_checkin, parse_participants, parse_participants_soup)
 
 HTML_SAMPLE = """
 <div class="col-md-2" id="col_2025-12-13"> 
@@ -36,3 +41,145 @@ def test_parse_empty():
     """Test parsing empty/invalid HTML."""
     lessons = parse_available_lessons("<div>Nothing here</div>")
     assert len(lessons) == 0
+
+NESTED_SAMPLE = """
+<html><body>
+<div id="collapse2025-12-20" class="collapse">
+    <div class="card-body">
+        <div class="wp_event" onclick="window.location.href='event.php?e=111';">
+            <div class="wp_text"> Dressur <b>Standard</b> </div>
+            <div class="wp_date">09:00 - 10:00<br>Halle</div>
+        </div>
+    </div>
+</div>
+<div id="col_2025-12-21">
+    <div class="wp_event wp_event_past" onclick="window.location.href='event.php?e=222';"><div class="wp_text">Springen</div></div>
+    <div class="wp_event" onclick="window.location.href='event.php?e=111';"><div class="wp_text">Duplicate</div></div>
+</div>
+<div class="wp_event" onclick="window.location.href='event.php?e=333';"><div class="wp_text">No Container</div></div>
+</body></html>
+"""
+
+def test_stream_parser_matches_soup_parser():
+    """The streaming parser returns exactly what the BeautifulSoup implementation returns."""
+    for html in (HTML_SAMPLE, NESTED_SAMPLE, "<div>Nothing here</div>"):
+        assert parse_available_lessons_stream(html) == parse_available_lessons(html)
+
+    lessons = parse_available_lessons_stream(NESTED_SAMPLE)
+    assert [l['date_context'] for l in lessons] == ['2025-12-20', 'col_2025-12-21', 'Unknown']
+    assert lessons[0]['title'] == 'DressurStandard'
+    assert lessons[0]['time'] == '09:00 - 10:00Halle'
+
+def test_stream_parser_handles_chunk_boundaries():
+    """Records are emitted correctly when the page arrives in small chunks."""
+    chunks = [NESTED_SAMPLE[i:i + 7] for i in range(0, len(NESTED_SAMPLE), 7)]
+    assert list(iter_lessons(chunks)) == parse_available_lessons(NESTED_SAMPLE)
+
+def test_stream_parser_matches_soup_parser_on_recorded_weekplan():
+    """Both parsers agree on the (tiled) recorded weekplan fixture."""
+    page = fixtures.weekplan(3)
+    lessons = parse_available_lessons_stream(page)
+    assert lessons == parse_available_lessons(page)
+    assert len({l['date_context'] for l in lessons}) == 21
+
+def test_query_pushdown_matches_filtering_afterwards():
+    page = fixtures.weekplan(1)
+    full = parse_available_lessons_stream(page)
+    saturday = fixtures.WEEK_START + timedelta(days=5)
+    title = next(l['title'] for l in full if l['date_context'] == saturday.isoformat())
+    start = next(l['time'][:5] for l in full if l['date_context'] == saturday.isoformat() and l['title'] == title)
+    expected = [l for l in full if l['date_context'] == saturday.isoformat() and l['title'] == title and l['time'].startswith(start)]
+    assert expected
+
+    query = LessonQuery.for_lesson(saturday, title, start)
+    assert parse_available_lessons_stream(page, query) == expected
+    assert parse_available_lessons(page, query) == expected
+
+    predicate = LessonQuery(frozenset([saturday.isoformat()]), predicate=lambda record: record['id'] == expected[0]['id'])
+    assert parse_available_lessons_stream(page, predicate) == expected[:1]
+    assert parse_available_lessons_stream(page, LessonQuery(frozenset([date(2030, 1, 1).isoformat()]))) == []
+
+def test_query_stops_reading_after_the_requested_dates():
+    page = fixtures.weekplan(1)
+    chunks = [page[i:i + 1024] for i in range(0, len(page), 1024)]
+    read = []
+    def reader():
+        for chunk in chunks:
+            read.append(chunk)
+            yield chunk
+
+    monday = LessonQuery(frozenset([fixtures.WEEK_START.isoformat()]))
+    lessons = list(iter_lessons(reader(), query=monday))
+    assert lessons == [l for l in parse_available_lessons_stream(page) if l['date_context'] == fixtures.WEEK_START.isoformat()]
+    assert lessons and len(read) < len(chunks) / 2
+
+def test_chunked_query_over_several_weeks_matches_soup_parser():
+    """Reading stops only after the last requested date, wherever the requested dates are on the page."""
+    page = fixtures.weekplan(3)
+    chunks = [page[i:i + 1000] for i in range(0, len(page), 1000)]
+    days = sorted({l['date_context'] for l in parse_available_lessons_stream(page)})
+    for dates in ([days[0], days[8]], [days[9]], [days[3], days[12], days[20]], [days[20], "2030-01-01"], ["2020-01-01"]):
+        query = LessonQuery(frozenset(dates))
+        expected = parse_available_lessons(page, query)
+        assert list(iter_lessons(iter(chunks), query=query)) == expected
+        assert parse_available_lessons_stream(page, query) == expected
+
+def test_query_skips_past_events():
+    lessons = parse_available_lessons_stream(HTML_SAMPLE, LessonQuery(bookable_only=True))
+    assert [l['id'] for l in lessons] == ['12345']
+    assert len(parse_available_lessons_stream(HTML_SAMPLE, LessonQuery(frozenset(['2025-12-13'])))) == 2
+
+@pytest.mark.parametrize("name, state, actions", [
+    ("pre_book_t.html", CheckinState.BOOKABLE, "BOOK_T"),
+    ("pre_book_w.html", CheckinState.WAITLIST_OPEN, "BOOK_W"),
+    ("pre_storn.html", CheckinState.BOOKED, None),
+    ("pre_deadline.html", CheckinState.DEADLINE_PASSED, None),
+    ("evbk_success.html", CheckinState.SUCCESS, None),
+    ("evbk_failure.html", CheckinState.FULL, None),
+])
+def test_parse_checkin_recorded_dialogs(name, state, actions):
+    checkin = parse_checkin(fixtures.load(name), name[:name.index("_")].upper())
+    assert checkin.state is state
+    assert checkin.next_action == actions
+    assert checkin.holds_place == (state in (CheckinState.BOOKED, CheckinState.SUCCESS))
+
+def test_parse_checkin_messages():
+    """Messages take precedence over the buttons; 'ausgebucht' is no booking."""
+    waitlist = "<p>Sie sind auf der Warteliste.</p><button onclick=\"ShowCheckin( 'EVBK', \"STORN_WT\" )\">"
+    assert parse_checkin(waitlist, "PRE").state is CheckinState.WAITLISTED
+    assert parse_checkin(waitlist, "PRE").storn == "STORN_WT"
+    assert parse_checkin("Sie wurden erfolgreich auf die Warteliste gesetzt.").state is CheckinState.WAITLISTED
+    assert parse_checkin("Die Stornierung war erfolgreich.").state is CheckinState.CANCELLED
+    assert parse_checkin("Der Termin ist bereits ausgebucht.").state is CheckinState.FULL
+    assert parse_checkin("Kein freier Platz mehr vorhanden.").state is CheckinState.FULL
+    assert parse_checkin("Sie haben den Termin gebucht.").state is CheckinState.SUCCESS
+    assert parse_checkin("Eine Buchung ist noch nicht m&ouml;glich.").state is CheckinState.NOT_OPEN
+    assert parse_checkin("<p>Buchung ab 01.03.2026 00:00 m&ouml;glich.</p>").state is CheckinState.NOT_OPEN
+    assert parse_checkin("Buchungsfrist beendet <button onclick=\"ShowCheckin('EVBK','BOOK_T')\">").next_action is None
+    assert parse_checkin("Teilnahme am Termin stornieren?").state is CheckinState.UNCLEAR
+    assert parse_checkin("").state is CheckinState.UNKNOWN
+
+def test_parse_checkin_pre_dialogs_go_by_their_actions():
+    """Words of a PRE dialog describe the lesson, not a result of ours."""
+    full = "<p>Der Termin ist ausgebucht.</p><button onclick=\"ShowCheckin('EVBK','BOOK_W')\">"
+    assert parse_checkin(full, "PRE").state is CheckinState.WAITLIST_OPEN
+    assert check_pre(full) == ("AVAILABLE (Waitlisting)", "BOOK_W", "Waitlisting", False)
+    assert parse_checkin(full).state is CheckinState.FULL
+
+    taken = "<p>Bereits gebucht: 5 von 6</p><button onclick=\"ShowCheckin('EVBK','BOOK_T')\">"
+    assert parse_checkin(taken, "PRE").state is CheckinState.BOOKABLE
+    assert check_pre(taken) == ("AVAILABLE (Booking)", "BOOK_T", "Booking", False)
+
+def test_participant_parser_matches_soup_parser():
+    details = fixtures.load("eventdetails.html")
+    result = parse_participants(details)
+    assert result == parse_participants_soup(details)
+    assert result["participants"] and result["waiting_list"]
+    assert parse_participants("<div>Nothing here</div>") == {"participants": [], "waiting_list": []}
+
+def test_participant_parser_skips_header_rows():
+    """Rows in <thead> (here a row of <td> column labels) are no participants."""
+    details = fixtures.load("eventdetails_td_header.html")
+    result = parse_participants(details)
+    assert result == parse_participants_soup(details)
+    assert result == {"participants": ["1 Paula G.", "2 Greta L.", "3 Mia T."], "waiting_list": ["1 Ida P."]}
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import date, time
+from src.lessons import Lesson
+from src.metrics import NO_METRICS
+from src.race import BookingRace
+
+def dialog(*actions, text=""):
+    buttons = "".join(f"<button onClick=\"ShowCheckin('EVBK','{a}')\">x</button>" for a in actions)
+    return f"<div>{text}</div>{buttons}"
+
+class CheckinClient:
+    """Checkin dialogs per event: offers is 'BOOK_T', 'BOOK_W' or None, delays the EVBK round trip."""
+
+    metrics = NO_METRICS
+
+    def __init__(self, offers, delays=None):
+        self.offers = offers
+        self.delays = delays or {}
+        self.booked = {}
+        self.requests = []
+
+    async def ajax_request(self, command, params):
+        eid, step, action = params["eventid"], params["step"], params["next"]
+        self.requests.append((eid, action or step))
+        if step == "PRE":
+            await asyncio.sleep(0)
+            if eid in self.booked:
+                kind = self.booked[eid]
+                return dialog("STORN_TN" if kind == "BOOK_T" else "STORN_WT", text="Sie sind auf der Warteliste" if kind == "BOOK_W" else "")
+            return dialog(self.offers[eid]) if self.offers[eid] else "Buchungsfrist beendet"
+        await asyncio.sleep(self.delays.get(eid, 0.0))
+        if action.startswith("STORN"):
+            del self.booked[eid]
+            return "Die Stornierung war erfolgreich."
+        self.booked[eid] = action
+        return "Die Buchung war erfolgreich."
+
+def lessons(*ids):
+    return [Lesson(i, "Dressur", date(2026, 11, 7), time(9 + n), time(10 + n), True, "") for n, i in enumerate(ids)]
+
+def race(client, candidates, max_parallel=3):
+    results = asyncio.run(BookingRace(client, candidates, "4711", max_parallel).run())
+    return [(r.lesson.id, r.outcome) for r in results]
+
+def test_preferred_lesson_wins_and_lower_bookings_are_rolled_back():
+    # 2 books first and wins over 3 (still waiting for a slot); then 1 gets its place
+    client = CheckinClient({"1": "BOOK_T", "2": "BOOK_T", "3": "BOOK_T"}, delays={"1": 0.05})
+    assert race(client, lessons(1, 2, 3), max_parallel=2) == [(1, "booked"), (2, "rolled-back"), (3, "cancelled")]
+    assert client.booked == {"1": "BOOK_T"}
+    assert ("2", "STORN_TN") in client.requests
+    assert not any(eid == "3" for eid, _ in client.requests)
+
+def test_lower_priority_place_when_preferred_is_full():
+    client = CheckinClient({"1": None, "2": "BOOK_T", "3": "BOOK_T"}, delays={"3": 0.05})
+    assert race(client, lessons(1, 2, 3)) == [(1, "unavailable"), (2, "booked"), (3, "rolled-back")]
+    assert client.booked == {"2": "BOOK_T"}
+
+def test_waiting_list_above_the_winner_is_kept():
+    client = CheckinClient({"1": "BOOK_W", "2": "BOOK_T", "3": "BOOK_W"}, delays={"3": 0.02})
+    assert race(client, lessons(1, 2, 3)) == [(1, "waitlisted"), (2, "booked"), (3, "rolled-back")]
+    assert client.booked == {"1": "BOOK_W", "2": "BOOK_T"}
+    assert ("3", "STORN_WT") in client.requests
+
+def test_existing_place_decides_the_race():
+    client = CheckinClient({"1": "BOOK_T", "2": "BOOK_T"})
+    client.booked["1"] = "BOOK_T"
+    assert race(client, lessons(1, 2)) == [(1, "held"), (2, "cancelled")]
+    assert client.booked == {"1": "BOOK_T"}
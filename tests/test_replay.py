@@ -0,0 +1,96 @@
+import asyncio
+import gzip
+import json
+import time
+import httpx
+import pytest
+from benchmarks.standin import StandinServer
+from src.booking import CHECKIN_COMMAND, booking_params, check_pre, classify_evbk, pre_params
+from src.client import AsyncReitbuchClient, ReitbuchClient
+from src.parser import parse_available_lessons_stream
+from src.replay import Archive, ExchangeRecorder, RecordingTransport, ReplayMissError, ReplayTransport
+
+def session(client):
+    """A short nightly run: login, weekplan, event page, PRE, EVBK, PRE again and the participants."""
+    seen = []
+    assert client.login("alice", "secret")
+    html = client.get_weekly_plan(2)
+    seen.append(html)
+    lesson = next(l for l in parse_available_lessons_stream(html) if l['title'] == "Dressur Standard" and l['is_bookable'])
+    seen.append(client.get_event_details(lesson['id']))
+    pre = check_pre(client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson['id'])))
+    seen.append(pre)
+    seen.append(classify_evbk(client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, lesson['id'], pre.next_param))))
+    seen.append(check_pre(client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson['id']))))
+    seen.append(client.get_event_details_ajax(lesson['id'], client.loginuid))
+    return seen
+
+@pytest.fixture
+def recorded(tmp_path):
+    path = str(tmp_path / "run.jsonl.gz")
+    recorder = ExchangeRecorder(path)
+    with StandinServer(latency=0.01) as server:
+        client = ReitbuchClient(base_url=server.url, transport=RecordingTransport(recorder))
+        seen = session(client)
+        client.close()
+    recorder.close()
+    return path, server.url, seen
+
+def test_replay_reproduces_the_recorded_run(recorded):
+    path, url, seen = recorded
+    # The server is gone; the archive answers everything
+    client = ReitbuchClient(base_url=url, transport=ReplayTransport(Archive(path)))
+    start = time.perf_counter()
+    replayed = session(client)
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    assert replayed == seen
+    assert seen[2].next_param and not seen[2].booked and seen[3] == "success" and seen[4].booked
+    assert elapsed < 0.5
+
+def test_archive_is_compact_and_has_no_secrets(recorded):
+    path, _, _ = recorded
+    with gzip.open(path, "rt") as f:
+        text = f.read()
+    assert "secret" not in text
+    exchanges = Archive(path).exchanges
+    login = next(e for e in exchanges if e["request"]["form"] and "loginsid" in e["request"]["form"])
+    assert login["request"]["form"]["loginsid"] == "***"
+    cookies = [value for e in exchanges for name, value in e["response"]["headers"] if name.lower() == "set-cookie"]
+    assert cookies and all(value.startswith("PHPSESSID=***") for value in cookies)
+    paths = {e["request"]["path"] for e in exchanges}
+    assert {"/", "/weekplan.php", "/event.php", "/ajax.php"} <= paths
+    ajax = [e for e in exchanges if e["request"]["path"] == "/ajax.php"]
+    # The JSON params are stored decoded
+    assert ajax[0]["request"]["form"]["params"]["step"] == "PRE"
+
+def test_params_match_regardless_of_key_order(recorded):
+    path, url, _ = recorded
+    archive = Archive(path)
+    exchange = next(e for e in archive.exchanges if e["request"]["path"] == "/ajax.php")
+    form = dict(exchange["request"]["form"])
+    form["params"] = json.dumps(dict(reversed(list(form["params"].items()))))
+
+    client = httpx.Client(base_url=url, transport=ReplayTransport(archive))
+    response = client.post("/ajax.php", data=dict(reversed(list(form.items()))))
+    assert response.text == exchange["response"]["body"]
+
+    with pytest.raises(ReplayMissError):
+        client.post("/ajax.php", data={**form, "command": "ax.unknown"})
+
+def test_timed_replay_keeps_the_recorded_latency(recorded):
+    path, url, _ = recorded
+    archive = Archive(path)
+    recorded_latency = sum(e["response"]["elapsed"] for e in archive.exchanges)
+
+    async def replay():
+        async with AsyncReitbuchClient(base_url=url, transport=ReplayTransport(archive, realtime=True)) as client:
+            start = time.perf_counter()
+            assert await client.login("alice", "secret")
+            await client.get_weekly_plan(2)
+            return time.perf_counter() - start
+
+    # login.start, login and the weekplan each waited at least the stand-in latency
+    assert asyncio.run(replay()) >= 0.03
+    assert recorded_latency >= 0.01 * len(archive.exchanges)
@@ -0,0 +1,31 @@
+import io
+import json
+from datetime import date, time
+from src.lessons import Lesson
+from src.report import NdjsonReport
+
+class Stream(io.StringIO):
+    flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+def test_lesson_records_are_written_one_per_line_and_flushed():
+    stream = Stream()
+    report = NdjsonReport(stream, clock=lambda: 1700000000.0)
+    lesson = Lesson(40343, "Dressur Standard", date(2026, 11, 7), time(9), time(10), True, "09:00 - 10:00")
+
+    report.lesson(lesson, "success", "Booking SUCCESSFUL", action="BOOK_T", latency=0.0914, account="alice")
+    assert stream.flushes == 1
+    report.missing(date(2026, 11, 14), "error", ConnectionError("timed out"))
+    report.participants("40343", date(2026, 11, 7), ["1 alice"], [])
+
+    first, second, third = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first == {
+        "kind": "lesson", "ts": 1700000000.0, "event": "40343", "date": "2026-11-07", "title": "Dressur Standard",
+        "start": "09:00", "action": "BOOK_T", "outcome": "success", "status": "Booking SUCCESSFUL",
+        "latency_ms": 91.4, "account": "alice",
+    }
+    assert second == {"kind": "lesson", "ts": 1700000000.0, "date": "2026-11-14", "outcome": "error", "error": "ConnectionError: timed out"}
+    assert third["participants"] == ["1 alice"] and third["waiting_list"] == []
+    assert stream.flushes == 3
@@ -0,0 +1,92 @@
+import asyncio
+import httpx
+import pytest
+import time
+from src.booking import send_booking
+from src.client import AsyncReitbuchClient
+from src.parser import CheckinState
+from src.retry import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RequestPolicy
+
+def responder(statuses):
+    """MockTransport answering with the given statuses in turn (the last one repeats)."""
+    requests = []
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(statuses[min(len(requests), len(statuses)) - 1], text="<html>ok</html>")
+    return httpx.MockTransport(handler), requests
+
+def test_reads_are_retried_and_bookings_are_not():
+    transport, requests = responder([503, 502, 200])
+    policy = RequestPolicy(backoff=0.001, random=lambda: 1.0)
+
+    async def scenario():
+        async with AsyncReitbuchClient(transport=transport, policy=policy) as client:
+            assert await client.get_weekly_plan(1) == "<html>ok</html>"
+            assert len(requests) == 3
+            requests.clear()
+            transport.handler = lambda request: requests.append(request) or httpx.Response(503)
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.ajax_request("ax.checkin.showcheckin", {"step": "EVBK", "action": "BOOK_T"})
+            assert len(requests) == 1
+
+    asyncio.run(scenario())
+    assert policy.retried == 2
+
+def test_deadline_cancels_a_hung_booking():
+    async def hang(request):
+        await asyncio.sleep(30)
+
+    async def scenario():
+        policy = RequestPolicy(deadlines={"checkin.evbk": 0.1})
+        async with AsyncReitbuchClient(transport=httpx.MockTransport(hang), policy=policy) as client:
+            start = time.perf_counter()
+            with pytest.raises(DeadlineExceeded):
+                await client.ajax_request("ax.checkin.showcheckin", {"step": "EVBK", "action": "BOOK_T"})
+            return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) < 1.0
+
+@pytest.mark.parametrize("pre_action, booked", [("STORN_TN", True), ("BOOK_T", False)])
+def test_booking_past_its_deadline_is_checked_with_a_pre(pre_action, booked):
+    """The server may book after the EVBK deadline fired: a PRE tells whether it did."""
+    async def handler(request):
+        if b"EVBK" in request.content:
+            await asyncio.sleep(30)
+        return httpx.Response(200, text=f"<button onclick=\"ShowCheckin('EVBK','{pre_action}')\">")
+
+    async def scenario():
+        policy = RequestPolicy(deadlines={"checkin.evbk": 0.1})
+        async with AsyncReitbuchClient(transport=httpx.MockTransport(handler), policy=policy) as client:
+            return await send_booking(client, "4711", "123", "BOOK_T")
+
+    if booked:
+        _, checkin = asyncio.run(scenario())
+        assert checkin.state is CheckinState.BOOKED and checkin.holds_place
+    else:
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(scenario())
+
+def test_circuit_breaker_backs_off():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=2, cooldown=5.0, clock=lambda: now[0])
+    policy = RequestPolicy(retries=0, breaker=breaker, clock=lambda: now[0])
+    sent = []
+    def send(timeout):
+        sent.append(timeout)
+        return httpx.Response(503)
+
+    policy.call("weekplan", send)
+    policy.call("weekplan", send)
+    assert breaker.wait_time() == 5.0
+    # The booking's deadline ends before the cooldown: it fails without touching the server
+    with pytest.raises(CircuitOpenError):
+        policy.call("checkin.evbk", send)
+    assert len(sent) == 2
+
+    # After the cooldown requests go out again, another failure backs off twice as long
+    now[0] = 5.0
+    policy.call("weekplan", send)
+    assert breaker.wait_time() == 10.0
+    now[0] = 15.0
+    assert policy.call("weekplan", lambda timeout: httpx.Response(200)).status_code == 200
+    assert breaker.failures == 0
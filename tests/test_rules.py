@@ -0,0 +1,101 @@
+import re
+import pytest
+from datetime import date, time, timedelta
+from benchmarks import fixtures
+from src.lessons import LessonIndex, index_parser, lessons_from_records
+from src.parser import parse_available_lessons_stream
+from src.rules import Rule, RuleMatcher, default_rules, load_rules
+
+RULES = '''
+[[rule]]
+name = "Dressur am Samstag"
+title = "Dressur Standard"
+weekdays = ["Sat"]
+earliest = "08:00"
+latest = "10:00"
+
+[[rule]]
+title = "^Springen"
+weekdays = ["Wed", "Thursday"]
+time = "09:00"
+priority = 2
+
+[[rule]]
+title = "Dressur"
+weekdays = [5]
+earliest = "10:00"
+latest = "12:00"
+priority = 1
+'''
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.toml"
+    path.write_text(RULES)
+    saturday, jumping, saturday_late = load_rules(str(path))
+    assert saturday.weekdays == {5}
+    assert jumping.weekdays == {2, 3}
+    assert jumping.earliest == jumping.latest
+    assert saturday.describe() == "Dressur am Samstag"
+    assert saturday_late.describe() == "'Dressur' Sat 10:00-12:00"
+
+def test_load_rules_rejects_invalid_entries(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('{"rule": [{"weekdays": ["Someday"]}]}')
+    with pytest.raises(ValueError, match="rule 1: invalid weekday"):
+        load_rules(str(path))
+    path.write_text('{"rule": [{"weekdays": ["Sat"], "earliest": "12:00", "latest": "09:00"}]}')
+    with pytest.raises(ValueError, match="latest is before earliest"):
+        load_rules(str(path))
+
+def test_default_rule_targets_saturdays_after_two_weeks():
+    """Same dates as the former hardcoded selection: Saturdays more than 14 days ahead, within six weeks."""
+    matcher = RuleMatcher(default_rules())
+    for today in (date(2025, 12, 1) + timedelta(days=n) for n in range(7)):
+        days_ahead = (5 - today.weekday()) % 7 or 7
+        expected = [today + timedelta(days=days_ahead, weeks=i) for i in range(6)]
+        assert list(matcher.targets(today)) == [d for d in expected if (d - today).days > 14]
+
+def test_by_week_fetches_each_week_once(tmp_path):
+    path = tmp_path / "rules.toml"
+    path.write_text(RULES)
+    matcher = RuleMatcher(load_rules(str(path)))
+    today = date(2025, 12, 1)
+    weeks = matcher.by_week(matcher.targets(today), today)
+
+    # Three rules on Wed/Thu/Sat, but one page per week
+    assert list(weeks) == [2, 3, 4, 5]
+    assert list(weeks[2]) == [date(2025, 12, 17), date(2025, 12, 18), date(2025, 12, 20)]
+    assert [r.priority for r in weeks[2][date(2025, 12, 20)]] == [0, 1]
+
+def test_match_evaluates_all_rules_in_one_pass(tmp_path):
+    path = tmp_path / "rules.toml"
+    path.write_text(RULES)
+    matcher = RuleMatcher(load_rules(str(path)))
+    lessons = index_parser(parse_available_lessons_stream)(fixtures.weekplan())
+    today = fixtures.WEEK_START - timedelta(weeks=3)
+
+    matches = matcher.match(lessons, matcher.by_week(matcher.targets(today), today)[3])
+    assert [(m.lesson.id, m.rule.priority) for m in matches] == [
+        (26113, 2),                         # Wed Springen 09:00
+        (26160, 2),                         # Thu Springen 09:00
+        (26238, 0), (26240, 0), (26246, 1), # Sat: both Dressur Standard, then the fallback
+    ]
+    # Every distinct title went through the patterns once
+    assert len(matcher._title_hits) == len({l.title for l in lessons if l.date in (date(2025, 12, 17), date(2025, 12, 18), date(2025, 12, 20))})
+
+def test_query_keeps_exactly_what_the_rules_match():
+    rules = [
+        Rule(re.compile("Dressur"), frozenset([5]), time(8), time(12), name="dressur"),
+        Rule(re.compile("Spring"), frozenset([2, 5]), time(16), time(20), priority=1, name="springen"),
+    ]
+    matcher = RuleMatcher(rules)
+    today = fixtures.WEEK_START - timedelta(days=20)
+    targets = {day: r for day, r in matcher.targets(today).items() if day < fixtures.WEEK_START + timedelta(days=7)}
+
+    page = fixtures.weekplan(1)
+    full = LessonIndex(lessons_from_records(parse_available_lessons_stream(page)))
+    pushed = LessonIndex(lessons_from_records(parse_available_lessons_stream(page, matcher.query(targets))))
+    assert matcher.match(full, targets)
+    assert matcher.match(pushed, targets) == matcher.match(full, targets)
+    # A superset of the matches (title and window are checked per rule set, not per date), far fewer than the page
+    assert len(matcher.match(full, targets)) <= len(pushed) < len(full) / 4
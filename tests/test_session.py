@@ -0,0 +1,57 @@
+import os
+import stat
+from unittest.mock import ANY, MagicMock
+from src.client import ReitbuchClient
+from src.session import SessionStore
+
+LOGGED_IN_PAGE = '<a href="logout.php">abmelden</a><input type="hidden" id="loginuid" name="loginuid" value="4711">'
+
+def test_store_roundtrip_and_expiry(tmp_path):
+    """Sessions are stored per user and expire after the TTL."""
+    now = [1000.0]
+    store = SessionStore(str(tmp_path / "session.json"), ttl=60, clock=lambda: now[0])
+
+    store.save("alice", "sess-a", "4711")
+    assert store.load("alice") == {'phpsessid': 'sess-a', 'loginuid': '4711', 'expires_at': 1060.0}
+    assert store.load("bob") is None
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+
+    now[0] = 1061.0
+    assert store.load("alice") is None
+
+def test_corrupt_store_is_ignored(tmp_path):
+    path = tmp_path / "session.json"
+    path.write_text("{not json")
+    assert SessionStore(str(path)).load("alice") is None
+
+def test_login_or_resume_skips_login_for_valid_session(tmp_path):
+    """A valid cached session costs one validation request and no login."""
+    store = SessionStore(str(tmp_path / "session.json"))
+    store.save("alice", "sess-a", "4711")
+
+    client = ReitbuchClient()
+    client.client.close()
+    client.client = MagicMock()
+    client.client.get.return_value = MagicMock(status_code=200, text=LOGGED_IN_PAGE)
+
+    assert client.login_or_resume("alice", "pw", store) == True
+    client.client.get.assert_called_once_with("/weekplan.php", timeout=ANY)
+    client.client.post.assert_not_called()
+    assert client.loginuid == "4711"
+
+def test_login_or_resume_logs_in_when_session_is_stale(tmp_path):
+    """A stale session falls back to a full login and caches the new session."""
+    store = SessionStore(str(tmp_path / "session.json"))
+    store.save("alice", "old", "1")
+
+    client = ReitbuchClient()
+    client.client.close()
+    client.client = MagicMock()
+    client.client.get.return_value = MagicMock(status_code=200, text='<form id="loginform"></form>')
+    client.client.post.return_value = MagicMock(status_code=200, text=LOGGED_IN_PAGE)
+    client.client.cookies.get.return_value = "new"
+
+    assert client.login_or_resume("alice", "pw", store) == True
+    client.client.post.assert_called_once()
+    assert store.load("alice")['phpsessid'] == "new"
+    assert store.load("alice")['loginuid'] == "4711"
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from argparse import Namespace
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from benchmarks.standin import StandinServer
+from src import runner
+from src.client import AsyncReitbuchClient
+from src.lessons import index_parser
+from src.parser import parse_available_lessons_stream
+from src.rules import RuleMatcher, default_rules
+from src.snipe import Sniper, parse_fire_time
+
+def make_client(responses):
+    client = MagicMock()
+    client.prepare_ajax = lambda command, params, boxid="chkinbox": {"command": command, "params": params}
+    client.send_ajax = AsyncMock(side_effect=responses)
+    client.ping = AsyncMock()
+    return client
+
+def test_parse_fire_time():
+    now = datetime(2025, 12, 1, 23, 30)
+    assert parse_fire_time(None, now) == datetime(2025, 12, 2, 0, 0).timestamp()
+    assert parse_fire_time("23:59:59.5", now) == datetime(2025, 12, 1, 23, 59, 59, 500000).timestamp()
+    # Already passed today -> tomorrow
+    assert parse_fire_time("22:00", now) == datetime(2025, 12, 2, 22, 0).timestamp()
+    assert parse_fire_time("2025-12-24T00:00:00+00:00", now) == 1766534400.0
+
+def test_parse_fire_time_with_offset():
+    now = datetime(2025, 12, 1, 23, 30, tzinfo=timezone.utc)
+    # 01:30 at +02:00 already, so midnight there is the next one
+    assert parse_fire_time("00:00+02:00", now) == datetime(2025, 12, 2, 22, 0, tzinfo=timezone.utc).timestamp()
+    assert parse_fire_time("23:45:00.5+00:00", now) == datetime(2025, 12, 1, 23, 45, 0, 500000, tzinfo=timezone.utc).timestamp()
+    # Local (naive) now works as well
+    assert parse_fire_time("00:00+02:00") > datetime.now().timestamp()
+
+def test_sniper_retries_until_definitive_answer():
+    """Non-definitive responses are retried, the loop stops at the first definitive one."""
+    client = make_client(["Noch nicht freigegeben", "Noch nicht freigegeben", "Buchung erfolgreich"])
+    sniper = Sniper(client, "123", "4711", max_attempts=5, retry_interval=0)
+
+    attempts = asyncio.run(sniper.fire())
+    assert [a.outcome for a in attempts] == ["pending", "pending", "success"]
+    assert all(a.latency >= 0 for a in attempts)
+    assert sniper.payload["params"]["step"] == "EVBK"
+    assert sniper.payload["params"]["next"] == "BOOK_T"
+
+def test_sniper_is_bounded():
+    client = make_client(["?"] * 3)
+    attempts = asyncio.run(Sniper(client, "123", "4711", max_attempts=3, retry_interval=0).fire())
+    assert len(attempts) == 3
+
+def test_sniper_waits_with_keepalive_pings():
+    """The connection is pinged while waiting, and the request is not sent before the instant."""
+    client = make_client(["Buchung erfolgreich"])
+    sniper = Sniper(client, "123", "4711", keepalive_interval=0.02, warm_window=1.0, quiet_period=0.01)
+
+    fire_at = sniper.clock() + 0.08
+    attempts = asyncio.run(sniper.run(fire_at))
+    assert client.ping.await_count >= 2
+    assert attempts[0].offset >= 0
+    assert attempts[0].outcome == "success"
+
+def test_snipe_fires_the_action_of_its_pre():
+    """A full lesson is sniped with BOOK_W; once we hold a place there is nothing to fire."""
+    async def snipe(server, target):
+        async with AsyncReitbuchClient(server.url) as client:
+            await client.login("alice", "pw")
+            args = Namespace(book=True, report=None, snipe_attempts=3, snipe_interval=0.01,
+                             no_calibrate=True, calibration_samples=5, fire_at=time.time())
+            await runner.snipe(client, index_parser(parse_available_lessons_stream), RuleMatcher(default_rules()),
+                               target.date, server.state.today, args)
+
+    with StandinServer(capacity=1) as server:
+        with server.state.lock:
+            target = next(e for e in server.state.week(2) if e.title == "Dressur Standard" and e.start == "09:00")
+            target.participants.append("ben")
+        asyncio.run(snipe(server, target))
+        assert target.waiting_list == ["alice"]
+        # Already on the waiting list: returns without booking again (or exiting)
+        asyncio.run(snipe(server, target))
+        assert target.waiting_list == ["alice"]
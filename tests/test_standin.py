@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+import pytest
+from benchmarks.standin import StandinServer
+from src.booking import CHECKIN_COMMAND, booking_params, check_pre, classify_evbk, pre_params
+from src.client import AsyncReitbuchClient, ReitbuchClient
+from src.parser import parse_available_lessons_stream, parse_participants
+
+@pytest.fixture
+def server():
+    with StandinServer(capacity=2, waitlist_capacity=1) as server:
+        yield server
+
+def contested_lesson(lessons):
+    return next(l for l in lessons if l['title'] == "Dressur Standard" and l['is_bookable'])
+
+def test_login_and_book_against_standin(server):
+    """The real client can log in, parse the weekplan and book against the stand-in."""
+    client = ReitbuchClient(base_url=server.url)
+    assert client.login("alice", "pw") == True
+    assert client.loginuid is not None
+
+    lessons = parse_available_lessons_stream(client.get_weekly_plan(2))
+    lesson = contested_lesson(lessons)
+
+    pre = check_pre(client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson['id'])))
+    assert pre.next_param == "BOOK_T"
+    response = client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, lesson['id'], "BOOK_T"))
+    assert classify_evbk(response) == "success"
+    assert check_pre(client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson['id']))).booked
+
+    details = parse_participants(client.get_event_details_ajax(lesson['id'], client.loginuid))
+    assert details['participants'] == ["1 alice"]
+    client.close()
+
+def test_capacity_and_waiting_list(server):
+    """Concurrent users fill the lesson, then the waiting list."""
+    async def book(user, event_id):
+        async with AsyncReitbuchClient(base_url=server.url) as client:
+            await client.login(user, "pw")
+            pre = check_pre(await client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, event_id)))
+            if not pre.next_param:
+                return pre.status_msg
+            return classify_evbk(await client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, event_id, pre.next_param)))
+
+    async def scenario():
+        with server.state.lock:
+            event_id = next(e.id for e in server.state.week(2) if e.title == "Dressur Standard")
+        results = []
+        for user in ("a", "b", "c", "d"):
+            results.append(await book(user, str(event_id)))
+        return results
+
+    assert asyncio.run(scenario()) == ["success", "success", "waitlisted", "Deadline passed"]
+
+def test_window_and_competitors():
+    """Before the window opens nothing is bookable; competitors take the slots right after."""
+    with StandinServer(capacity=1, competitors=3, competitor_spread=0.0) as server:
+        client = ReitbuchClient(base_url=server.url)
+        client.login("alice", "pw")
+
+        lessons = parse_available_lessons_stream(client.get_weekly_plan(1))
+        lesson = contested_lesson(lessons)
+        # Window already open (lesson < 21 days away): the competitors took the only slot
+        pre = check_pre(client.ajax_request(CHECKIN_COMMAND, pre_params(client.loginuid, lesson['id'])))
+        assert pre.next_param == "BOOK_W"
+
+        lessons = parse_available_lessons_stream(client.get_weekly_plan(6))
+        lesson = contested_lesson(lessons)
+        response = client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, lesson['id'], "BOOK_T"))
+        assert classify_evbk(response) == "pending"
+        client.close()
+
+def test_failure_injection_and_clock_offset():
+    with StandinServer(failure_rate=1.0, clock_offset=30.0) as server:
+        client = ReitbuchClient(base_url=server.url)
+        with pytest.raises(httpx.HTTPStatusError):
+            client.get_weekly_plan(0)
+        client.close()
+
+    with StandinServer(clock_offset=30.0) as server:
+        client = ReitbuchClient(base_url=server.url)
+        calibration = client.calibrate(samples=2, interval=0)
+        assert 28 < calibration.offset < 32
+        client.close()
+
+def test_compressed_conditional_weekplans():
+    """With compression and ETags an unchanged weekplan costs a 304 without body; a booking forces a full fetch."""
+    with StandinServer(compress=True, validators=True) as server:
+        client = ReitbuchClient(base_url=server.url, conditional=True)
+        client.login("alice", "pw")
+
+        sent = server.bytes_sent
+        first = client.get_weekly_plan(2)
+        page_bytes = server.bytes_sent - sent
+        assert page_bytes < len(first.encode()) / 4 # gzip
+
+        sent = server.bytes_sent
+        assert client.get_weekly_plan(2) is first
+        assert server.bytes_sent == sent and client.validators.not_modified == 1
+
+        lesson = contested_lesson(parse_available_lessons_stream(first))
+        client.ajax_request(CHECKIN_COMMAND, booking_params(client.loginuid, lesson['id'], "BOOK_T"))
+        assert client.get_weekly_plan(2) != first
+        assert client.validators.not_modified == 1
+        client.close()
@@ -0,0 +1,20 @@
+import os
+import pytest
+from benchmarks.startup import BUDGETS, CASES, deferred_imports, interpreter_start, measure
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_startup_defers_heavy_modules(case):
+    """--help and a bad --date exit without importing the network side; a plain run not bs4 or sqlite3."""
+    assert deferred_imports(case) == []
+
+# Wall-clock budgets depend on the machine's load: by default a run only has to stay within
+# a generous multiple of them, the budgets themselves are checked when asked for
+# (REITBUCH_TIMING_TESTS=1 python -m pytest tests/test_startup.py)
+BUDGET_SLACK = 1 if os.environ.get("REITBUCH_TIMING_TESTS") else 3
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_startup_within_budget(case):
+    budget = BUDGET_SLACK * BUDGETS[case]
+    base = interpreter_start(runs=3)
+    overhead = measure(case, runs=3) - base
+    assert overhead <= budget, f"{case}: {overhead * 1000:.0f}ms over interpreter start, budget {budget * 1000:.0f}ms"
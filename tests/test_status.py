@@ -0,0 +1,62 @@
+import asyncio
+from benchmarks import fixtures
+from src.status import fetch_statuses
+
+class DetailsClient:
+    """Answers showeventdetails after a per-event delay and tracks the requests in flight."""
+
+    def __init__(self, delays, fail=()):
+        self.delays = delays
+        self.fail = fail
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested = []
+
+    async def get_event_details_ajax(self, event_id, login_uid):
+        self.requested.append(event_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[event_id])
+            if event_id in self.fail:
+                raise RuntimeError("HTTP 503")
+            return fixtures.load("eventdetails.html")
+        finally:
+            self.in_flight -= 1
+
+def test_statuses_stream_in_completion_order():
+    client = DetailsClient({"1": 0.3, "2": 0.0, "3": 0.01, "4": 0.0})
+
+    async def collect():
+        return [status async for status in fetch_statuses(client, ["1", "2", "3", "2", "4"], "4711", concurrency=2)]
+
+    statuses = asyncio.run(collect())
+    # Duplicates are fetched once, and the fast events do not wait for the slow one
+    assert sorted(client.requested) == ["1", "2", "3", "4"]
+    assert [s.event_id for s in statuses][-1] == "1"
+    assert client.max_in_flight == 2
+    assert statuses[0].participants[0] == "1 Anna B."
+    assert statuses[0].waiting_list == ["1 Julia M.", "2 Hannah R."]
+
+def test_status_errors_do_not_stop_other_events():
+    client = DetailsClient({"1": 0.0, "2": 0.01}, fail={"1"})
+
+    async def collect():
+        return [status async for status in fetch_statuses(client, ["1", "2"], "4711")]
+
+    failed, ok = asyncio.run(collect())
+    assert (failed.event_id, str(failed.error)) == ("1", "HTTP 503")
+    assert ok.error is None and len(ok.participants) == 6
+
+def test_stopping_early_cancels_pending_fetches():
+    client = DetailsClient({"1": 0.0, "2": 5.0, "3": 5.0})
+
+    async def first():
+        statuses = fetch_statuses(client, ["1", "2", "3"], "4711")
+        status = await anext(statuses)
+        await statuses.aclose()
+        await asyncio.sleep(0)
+        return status
+
+    assert asyncio.run(asyncio.wait_for(first(), 2)).event_id == "1"
+    assert client.in_flight == 0
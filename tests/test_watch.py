@@ -0,0 +1,55 @@
+import asyncio
+from datetime import timedelta
+from benchmarks.standin import StandinServer
+from src.client import AsyncReitbuchClient
+from src.lessons import index_parser
+from src.parser import parse_available_lessons_stream
+from src.rules import RuleMatcher, default_rules
+from src.watch import Watcher, poll_interval
+
+def test_poll_interval_adapts_to_distance():
+    assert poll_interval(3 * 86400, 5, 600) == 600
+    assert poll_interval(3600, 5, 600) == 30
+    assert poll_interval(60, 5, 600) == 5
+
+def test_watcher_wakes_up_for_window_opening():
+    watcher = Watcher(None, RuleMatcher(default_rules()), None, min_interval=5, max_interval=600)
+    now = 1_000_000.0
+    # Lesson in 10 days, its window opens in 2 seconds
+    assert watcher._next_interval(now, [(now + 10 * 86400, now + 2, None)]) == 2.05
+    assert watcher._next_interval(now, [(now + 10 * 86400, now - 1, None)]) == 600
+    # Window opened a minute ago, and such lessons take five minutes to fill
+    assert watcher._next_interval(now, [(now + 10 * 86400, now - 60, 300)]) == 5
+
+def test_watcher_books_place_that_frees_up():
+    """Unchanged pages are not parsed again; a cancellation is noticed and booked in the next round."""
+    with StandinServer(capacity=1, waitlist_capacity=0) as server:
+        today = server.state.today
+        saturday = today - timedelta(days=today.weekday()) + timedelta(weeks=2, days=5)
+        with server.state.lock:
+            event = next(e for e in server.state.week(2) if e.date == saturday and e.title == "Dressur Standard" and e.start == "09:00")
+            event.participants.append("bob")
+
+        events = []
+
+        async def scenario():
+            async with AsyncReitbuchClient(base_url=server.url) as client:
+                await client.login("alice", "pw")
+                watcher = Watcher(client, RuleMatcher(default_rules()), index_parser(parse_available_lessons_stream),
+                                  book=True, only=saturday, on_event=events.append)
+                await watcher.poll()
+                await watcher.poll()
+                # Same page twice: fetched twice, parsed once, reported once
+                assert (watcher.weekplans.fetches, watcher.weekplans.parses) == (2, 1)
+                assert [e.status for e in events] == ["Deadline passed"]
+
+                with server.state.lock:
+                    event.participants.remove("bob")
+                await watcher.poll()
+                return watcher
+
+        watcher = asyncio.run(scenario())
+        assert [e.status for e in events] == ["Deadline passed", "Booking SUCCESSFUL"]
+        assert events[-1].lesson.id == event.id
+        assert watcher.held == {saturday}
+        assert event.participants == ["alice"]